@@ -1,22 +1,47 @@
+import asyncio
+import logging
 import os
-import sqlite3
-from datetime import datetime
+import time
 from pathlib import Path
 
 from dotenv import load_dotenv
 from langchain_mistralai import ChatMistralAI
 from langchain_classic.schema import HumanMessage
 
+from tools.answer_cache import get_answer_cache
+from tools.reflection_store import get_reflection_store
+from tools.tracing import llm_usage, span
+
 from .InHouseSearch_agent import IHouseRAGAgent
 from .WebScraper_agent import WebSearchAgent
-from .Summarizer_agent import SummarizerAgent
+from .Summarizer_agent import STREAM_INTERRUPTED_MARKER, StreamFailure, SummarizerAgent
 from .Introspection_Agent import IntrospectionAgent
+from .executor import run_blocking, run_coroutine
+from .intent_router import LocalIntentClassifier, Plan, parse_plan
 
 DB_PATH = Path(__file__).resolve().parent / "aqualens.db"
 
+logger = logging.getLogger(__name__)
+
+# Stand-in output for an agent the plan did not ask for
+SKIPPED_OUTPUT = "[Not needed for this query]"
+
+# Paraphrases at least this similar to an earlier query reuse its answer
+ANSWER_CACHE_THRESHOLD = float(os.getenv("AQUAINFO_ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("AQUAINFO_ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("AQUAINFO_ANSWER_CACHE_SIZE", "512"))
+
+# Outputs containing these markers came from a failed LLM call and are not cached
+FAILURE_MARKERS = ("unavailable due to rate limit or error", "Summary unavailable from model",
+                   STREAM_INTERRUPTED_MARKER)
+
+
+async def _skipped():
+    return SKIPPED_OUTPUT
+
 
 class CoordinatorAgent:
-    def __init__(self):
+    def __init__(self, speculative=True, answer_cache=True):
         load_dotenv()
         api_key = os.getenv("MISTRALAI_API_KEY") or os.getenv("MISTRAL_API_KEY")
         if not api_key:
@@ -35,13 +60,33 @@ class CoordinatorAgent:
         self.sum = SummarizerAgent()
         self.introspector = IntrospectionAgent()
 
+        # Simple questions are routed locally; only ambiguous ones go to the LLM intent analyzer.
+        # With speculative=True the async path starts the local RAG retrieval while the LLM
+        # decides; the billed RAG LLM call and web search never start before the plan asks for them.
+        self.router = LocalIntentClassifier(embedder=self.rag.query_embedder)
+        self.speculative = speculative
+
         # Track last interaction for feedback loop
         self.last_query = None
         self.last_rag = None
         self.last_web = None
         self.last_reasoning = None
-
-        self._init_db()
+        self.last_timings = {}
+        self.last_plan = None
+
+        # Reflections are embedded with the shared model and ranked by relevance to each query
+        self.reflections = get_reflection_store(DB_PATH, embedder=self.rag.query_embedder)
+
+        # Paraphrased questions are answered from memory until the TTL expires or the corpus changes.
+        # The cache is shared process-wide, so sessions answer each other's paraphrases.
+        self.answer_cache = get_answer_cache(
+            self.rag.query_embedder,
+            f"{self.rag.persist_directory}::{self.rag.vstore.collection_name}",
+            threshold=ANSWER_CACHE_THRESHOLD,
+            ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+            max_entries=ANSWER_CACHE_MAX_ENTRIES,
+            version_fn=self.rag.corpus_version,
+        ) if answer_cache else None
 
     def _extract_content(self, resp):
         """Normalize content extraction from Mistral responses."""
@@ -53,35 +98,18 @@ class CoordinatorAgent:
                 return first.content
         return str(resp)
 
-    # ------------------ DATABASE INIT ------------------
-    def _init_db(self):
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS reflections (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            reflection TEXT,
-            created_at TEXT
-        )
-        """)
-        conn.commit()
-        conn.close()
-
-    # ------------------ GET RECENT REFLECTIONS ------------------
-    def _load_reflections(self):
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute("SELECT reflection FROM reflections ORDER BY id DESC LIMIT 3")
-        rows = cur.fetchall()
-        conn.close()
-        return [r[0] for r in rows]
+    # ------------------ GET RELEVANT REFLECTIONS ------------------
+    def _load_reflections(self, query=None):
+        if query is None:
+            return self.reflections.recent(3)
+        return self.reflections.relevant(query, k=3)
 
     # ------------------ INTENT ANALYSIS ------------------
-    def _analyze_intent(self, query):
-        reflections = self._load_reflections()
+    def _intent_prompt(self, query):
+        reflections = self._load_reflections(query)
         ref_prompt = "\n".join(reflections)
 
-        prompt = f"""
+        return f"""
 You are the Intent Analyzer.
 
 Past reflections to guide you:
@@ -96,25 +124,42 @@ Decide what tasks are needed. Always respond as JSON like:
 }}
 """
 
+    def _analyze_intent(self, query):
+        prompt = self._intent_prompt(query)
+
         # Call Mistral chat; handle both list and single message return types
         try:
-            resp = self.client.invoke([HumanMessage(content=prompt)])
+            with span("intent.llm", prompt_chars=len(prompt)) as llm_span:
+                resp = self.client.invoke([HumanMessage(content=prompt)])
+                llm_span.set(**llm_usage(resp))
             return self._extract_content(resp)
         except Exception as e:
             return f"[Intent Analyzer unavailable due to rate limit or error: {e}]"
 
-    # ------------------ MAIN ORCHESTRATION ------------------
-    def run(self, query: str):
-        plan = self._analyze_intent(query)
+    async def _aanalyze_intent(self, query):
+        prompt = await run_blocking(self._intent_prompt, query)
 
-        # For simplicity: always call both
-        rag_out = self.rag.run(query)
-        web_out = self.web.run(query)
+        try:
+            with span("intent.llm", prompt_chars=len(prompt)) as llm_span:
+                resp = await self.client.ainvoke([HumanMessage(content=prompt)])
+                llm_span.set(**llm_usage(resp))
+            return self._extract_content(resp)
+        except Exception as e:
+            return f"[Intent Analyzer unavailable due to rate limit or error: {e}]"
+
+    # ------------------ ROUTING ------------------
+    def _plan_llm(self, query) -> Plan:
+        return parse_plan(self._analyze_intent(query)) or Plan("unknown", source="default")
 
-        reflections = self._load_reflections()
+    async def _aplan_llm(self, query) -> Plan:
+        return parse_plan(await self._aanalyze_intent(query)) or Plan("unknown", source="default")
+
+    # ------------------ REASONING ------------------
+    def _reasoning_prompt(self, query, rag_out, web_out):
+        reflections = self._load_reflections(query)
         combined_ref = "\n".join(reflections)
 
-        reasoning_prompt = f"""
+        return f"""
 Past improvement guidelines:
 {combined_ref}
 
@@ -129,29 +174,254 @@ Web Output:
 Provide structured reasoning for the summarizer:
 """
 
+    def _reason(self, query, rag_out, web_out):
+        reasoning_prompt = self._reasoning_prompt(query, rag_out, web_out)
+
         try:
-            reasoning_resp = self.client.invoke([HumanMessage(content=reasoning_prompt)])
-            reasoning = self._extract_content(reasoning_resp)
+            with span("reasoning.llm", prompt_chars=len(reasoning_prompt)) as llm_span:
+                reasoning_resp = self.client.invoke([HumanMessage(content=reasoning_prompt)])
+                llm_span.set(**llm_usage(reasoning_resp))
+            return self._extract_content(reasoning_resp)
         except Exception as e:
-            reasoning = f"[Reasoning step unavailable due to rate limit or error: {e}]"
+            return f"[Reasoning step unavailable due to rate limit or error: {e}]"
 
-        final = self.sum.summarize(
+    async def _areason(self, query, rag_out, web_out):
+        reasoning_prompt = await run_blocking(self._reasoning_prompt, query, rag_out, web_out)
+
+        try:
+            with span("reasoning.llm", prompt_chars=len(reasoning_prompt)) as llm_span:
+                reasoning_resp = await self.client.ainvoke([HumanMessage(content=reasoning_prompt)])
+                llm_span.set(**llm_usage(reasoning_resp))
+            return self._extract_content(reasoning_resp)
+        except Exception as e:
+            return f"[Reasoning step unavailable due to rate limit or error: {e}]"
+
+    # ------------------ MAIN ORCHESTRATION ------------------
+    def run(self, query: str):
+        with span("coordinator.run", query_chars=len(query)):
+            return self._run(query)
+
+    def _run(self, query: str):
+        timings = {}
+        started = time.perf_counter()
+
+        def timed(stage, func, *args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                with span(f"stage.{stage}"):
+                    return func(*args, **kwargs)
+            finally:
+                timings[stage] = time.perf_counter() - t0
+
+        cached = self._from_cache(query, timings, started)
+        if cached is not None:
+            return cached.answer
+
+        plan = timed("route", self.router.classify, query)
+        if plan is None:
+            plan = timed("intent", self._plan_llm, query)
+
+        # Only run the agents the plan asks for
+        rag_out = timed("rag", self.rag.run, query) if plan.needs("RAG") else SKIPPED_OUTPUT
+        web_out = timed("web", self.web.run, query) if plan.needs("WEB") else SKIPPED_OUTPUT
+
+        reasoning = timed("reasoning", self._reason, query, rag_out, web_out)
+
+        final = timed(
+            "summarize",
+            self.sum.summarize,
+            query=query,
+            rag_output=rag_out,
+            web_output=web_out,
+            reasoning_output=reasoning
+        )
+        timings["total"] = time.perf_counter() - started
+
+        self._remember(query, plan, rag_out, web_out, reasoning, timings)
+        self._to_cache(query, final)
+        return final
+
+    async def arun(self, query: str, return_timings: bool = False):
+        """
+        Async orchestration: the agents the plan needs run concurrently, so the
+        fan-out costs roughly the slowest branch instead of the sum.
+
+        Returns the final answer, or (answer, per-stage timings in seconds) when
+        ``return_timings`` is set. Timings are also kept in ``self.last_timings``.
+        """
+        with span("coordinator.arun", query_chars=len(query)):
+            return await self._arun(query, return_timings)
+
+    async def _arun(self, query: str, return_timings: bool):
+        timings = {}
+        started = time.perf_counter()
+
+        cached = await run_blocking(self._from_cache, query, timings, started)
+        if cached is not None:
+            return (cached.answer, timings) if return_timings else cached.answer
+
+        plan, rag_out, web_out, reasoning = await self._aprepare(query, timings)
+
+        t0 = time.perf_counter()
+        with span("stage.summarize"):
+            final = await self.sum.asummarize(
+                query=query,
+                rag_output=rag_out,
+                web_output=web_out,
+                reasoning_output=reasoning
+            )
+        timings["summarize"] = time.perf_counter() - t0
+        timings["total"] = time.perf_counter() - started
+
+        self._remember(query, plan, rag_out, web_out, reasoning, timings)
+        await run_blocking(self._to_cache, query, final)
+        return (final, timings) if return_timings else final
+
+    def run_stream(self, query: str):
+        """
+        Streaming orchestration: prepares everything like ``arun``, then yields the
+        summary chunk by chunk so the UI can render before the answer is complete.
+        ``self.last_timings`` gains a 'first_token' entry once the stream ends.
+        """
+        with span("coordinator.run_stream", query_chars=len(query)):
+            yield from self._run_stream(query)
+
+    def _run_stream(self, query: str):
+        timings = {}
+        started = time.perf_counter()
+
+        cached = self._from_cache(query, timings, started)
+        if cached is not None:
+            timings["first_token"] = timings["total"]
+            yield cached.answer
+            return
+
+        plan, rag_out, web_out, reasoning = run_coroutine(self._aprepare(query, timings))
+
+        t0 = time.perf_counter()
+        chunks = []
+        failed = False
+        for chunk in self.sum.summarize_stream(
             query=query,
             rag_output=rag_out,
             web_output=web_out,
             reasoning_output=reasoning
+        ):
+            timings.setdefault("first_token", time.perf_counter() - started)
+            failed = failed or isinstance(chunk, StreamFailure)
+            chunks.append(chunk)
+            yield chunk
+        timings["summarize"] = time.perf_counter() - t0
+        timings["total"] = time.perf_counter() - started
+
+        self._remember(query, plan, rag_out, web_out, reasoning, timings)
+        # Only reached when the stream was consumed to the end; interrupted or fallback answers are not cached
+        if not failed:
+            self._to_cache(query, "".join(chunks))
+
+    async def _aprepare(self, query, timings):
+        """
+        Everything before summarisation: routing, the agent fan-out and reasoning.
+
+        Queries the local router can classify skip the intent LLM call and every
+        agent they do not need. For ambiguous queries the LLM intent call runs
+        while the local RAG retrieval starts speculatively (unless ``speculative``
+        is off) and is dropped if the plan rejects it. The RAG answer (a billed
+        Mistral call) and the web search (a billed SerpAPI call) cannot be taken
+        back once sent, so they only run after the plan asks for them.
+        """
+        async def timed(stage, coro):
+            t0 = time.perf_counter()
+            try:
+                with span(f"stage.{stage}"):
+                    return await coro
+            finally:
+                timings[stage] = time.perf_counter() - t0
+
+        plan = await timed("route", run_blocking(self.router.classify, query))
+
+        if plan is None and not self.speculative:
+            plan = await timed("intent", self._aplan_llm(query))
+
+        t_fan_out = time.perf_counter()
+        retrieval = None
+        if plan is None:
+            retrieval = asyncio.ensure_future(self.rag.aretrieve(query))
+            plan = await timed("intent", self._aplan_llm(query))
+            if not plan.needs("RAG"):
+                retrieval.cancel()
+
+        # A speculative retrieval overlapped the intent call, so "rag" then times only what is left of it
+        async def rag_branch():
+            results = await (retrieval if retrieval is not None else self.rag.aretrieve(query))
+            return await self.rag.aanswer(query, results)
+
+        rag_out, web_out = await asyncio.gather(
+            timed("rag", rag_branch()) if plan.needs("RAG") else _skipped(),
+            timed("web", self.web.arun(query)) if plan.needs("WEB") else _skipped(),
         )
+        if retrieval is not None and not plan.needs("RAG"):
+            # Let the rejected speculative retrieval unwind
+            await asyncio.gather(retrieval, return_exceptions=True)
+        timings["fan_out"] = time.perf_counter() - t_fan_out
+
+        reasoning = await timed("reasoning", self._areason(query, rag_out, web_out))
+        return plan, rag_out, web_out, reasoning
+
+    # ------------------ ANSWER CACHE ------------------
+    def _from_cache(self, query, timings, started):
+        """Serve a paraphrase of an earlier question from the answer cache; None on a miss."""
+        if self.answer_cache is None:
+            return None
+
+        t0 = time.perf_counter()
+        with span("answer_cache.lookup") as cache_span:
+            try:
+                cached = self.answer_cache.lookup(query, variant=self._answer_variant(query))
+            except Exception as e:
+                logger.warning("Answer cache lookup failed: %s", e)
+                cached = None
+            cache_span.set(cache_hit=cached is not None)
+        timings["cache"] = time.perf_counter() - t0
+        if cached is None:
+            return None
+
+        timings["total"] = time.perf_counter() - started
+        self._remember(query, cached.plan, cached.rag_output, cached.web_output, cached.reasoning, timings)
+        return cached
+
+    @staticmethod
+    def _answer_variant(query):
+        """What besides its meaning shapes the answer: the summary length asked for ("2 line summary")."""
+        return SummarizerAgent._detect_requested_lines(query)
+
+    def _to_cache(self, query, final):
+        if self.answer_cache is None:
+            return
+        outputs = (final, self.last_rag, self.last_web, self.last_reasoning)
+        if not final or any(marker in str(out) for out in outputs for marker in FAILURE_MARKERS):
+            return
+        try:
+            self.answer_cache.store(query, final, self.last_rag, self.last_web, self.last_reasoning,
+                                    plan=self.last_plan, variant=self._answer_variant(query))
+        except Exception as e:
+            logger.warning("Answer cache store failed: %s", e)
 
+    def _remember(self, query, plan, rag_out, web_out, reasoning, timings):
         # Save last interaction for feedback
+        self.last_plan = plan
         self.last_query = query
         self.last_rag = rag_out
         self.last_web = web_out
         self.last_reasoning = reasoning
-
-        return final
+        self.last_timings = timings
 
     # ------------------ FEEDBACK LOOP ------------------
     def handle_feedback(self, feedback: str):
+        with span("feedback"):
+            self._handle_feedback(feedback)
+
+    def _handle_feedback(self, feedback: str):
         reflection = self.introspector.generate_reflection(
             query=self.last_query,
             rag_output=self.last_rag,
@@ -160,11 +430,9 @@ Provide structured reasoning for the summarizer:
             feedback=feedback
         )
 
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO reflections (reflection, created_at) VALUES (?, ?)",
-            (reflection, datetime.now().isoformat())
-        )
-        conn.commit()
-        conn.close()
+        self.reflections.add(reflection, query=self.last_query, feedback=feedback)
+
+        # Never serve an answer the user was unhappy with again
+        if self.answer_cache is not None and self.last_query and feedback != "positive":
+            self.answer_cache.invalidate(self.last_query)
+
@@ -1,22 +1,40 @@
+import logging
 import os
 from pathlib import Path
 from langchain_mistralai import ChatMistralAI
 from dotenv import load_dotenv
 
-from tools.rag_tool import RAGRetriever, VectorStore, EmbeddingManager
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_classic.text_splitter import RecursiveCharacterTextSplitter
-import uuid
+from tools.RAG_tool import (
+    get_embedding_manager, get_embedding_service, get_vector_store, get_retriever, get_reranker, ingest_once,
+)
+from tools.context_packing import DEFAULT_CONTEXT_TOKEN_BUDGET, ContextPacker, TokenCounter
+from tools.ingestion import IngestionManifest, make_chunk_id
+from tools.ingest_pipeline import IngestionPipeline
+from tools.tracing import llm_usage, span
+from .executor import run_blocking
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
 class IHouseRAGAgent:
-    def __init__(self, model_name="mistral-large-latest", top_k=5, pdf_directory=None, rebuild=False):
+    def __init__(self, model_name="mistral-large-latest", top_k=5, pdf_directory=None, rebuild=False,
+                 ingest_workers=None, retrieval_mode="hybrid", rerank=None, rerank_candidates=50,
+                 rerank_budget_ms=None, context_token_budget=None):
         """
         Fully self-contained RAG agent.
         Processes PDFs, generates embeddings, stores in vector store, retrieves, and answers.
+        retrieval_mode is "dense", "sparse" (BM25) or "hybrid" (both, fused by reciprocal rank).
+        With rerank, rerank_candidates chunks are retrieved and a cross-encoder keeps the best top_k,
+        trimming the candidates to fit rerank_budget_ms. Both default to the AQUAINFO_RERANK and
+        AQUAINFO_RERANK_BUDGET_MS env vars.
+        Retrieved chunks are merged, deduplicated and packed into context_token_budget tokens
+        (AQUAINFO_CONTEXT_TOKENS, default 3000) before they go into the prompt.
         """
         self.top_k = top_k
+        self.retrieval_mode = retrieval_mode
+        self.ingest_workers = ingest_workers
         project_root = Path(__file__).resolve().parent.parent
         self.pdf_directory = Path(pdf_directory) if pdf_directory else project_root / "data"
         self.persist_directory = project_root / "data" / "vector_store"
@@ -35,10 +53,34 @@ class IHouseRAGAgent:
             temperature=0.2
         )
 
-        # Initialize embedding manager and vector store
-        self.embedder = EmbeddingManager()
-        self.vstore = VectorStore(persist_directory=str(self.persist_directory))
-        self.retriever = RAGRetriever(self.vstore, self.embedder)
+        # Shared embedding manager and vector store (loaded once per process)
+        self.embedder = get_embedding_manager()
+        # Query-time embeddings from every session go through one micro-batching queue
+        self.query_embedder = get_embedding_service()
+        self.vstore = get_vector_store(persist_directory=self.persist_directory)
+        self.retriever = get_retriever(persist_directory=self.persist_directory)
+
+        # Optional cross-encoder re-ranking of a wider candidate set
+        if rerank is None:
+            rerank = os.getenv("AQUAINFO_RERANK", "0").lower() in ("1", "true", "yes")
+        if rerank_budget_ms is None and os.getenv("AQUAINFO_RERANK_BUDGET_MS"):
+            rerank_budget_ms = float(os.getenv("AQUAINFO_RERANK_BUDGET_MS"))
+        self.rerank_candidates = rerank_candidates
+        self.rerank_budget_ms = rerank_budget_ms
+        self.reranker = None
+        if rerank:
+            try:
+                self.reranker = get_reranker()
+            except Exception as e:
+                logger.warning("Re-ranking disabled, cross-encoder unavailable: %s", e)
+
+        # Merge overlapping chunks, drop near-duplicates and fit the context into a token budget
+        if context_token_budget is None:
+            context_token_budget = int(os.getenv("AQUAINFO_CONTEXT_TOKENS", DEFAULT_CONTEXT_TOKEN_BUDGET))
+        fallback_tokenizer = getattr(getattr(self.embedder, "model", None), "tokenizer", None)
+        self.packer = ContextPacker(TokenCounter(fallback_tokenizer), token_budget=context_token_budget)
+        # Resolve the tokenizer here rather than on the first query
+        self.packer.token_counter.load()
 
         # System prompt for context-grounded answers
         self.system_prompt = (
@@ -48,69 +90,126 @@ class IHouseRAGAgent:
             "If context lacks information, say so clearly."
         )
 
-        # Process PDFs and store embeddings if vector store is empty or rebuild requested
-        existing = self.vstore.collection.count()
-        if rebuild or existing == 0:
-            self._process_pdfs_to_vectorstore()
-        else:
-            print(f"Vector store already populated with {existing} docs — skipping rebuild.")
+        # Ingest new/changed PDFs and drop chunks of deleted ones (no-op when nothing changed).
+        # The store is shared, so this runs once per process, serialized across sessions.
+        ingest_once(lambda: self._process_pdfs_to_vectorstore(rebuild=rebuild), self.vstore.collection_name,
+                    self.persist_directory, force=rebuild)
 
-    def _process_pdfs_to_vectorstore(self):
-        """Load PDFs, split into chunks, generate embeddings, store in vector store"""
-        print("Processing PDFs and generating embeddings...")
+    def _process_pdfs_to_vectorstore(self, rebuild=False):
+        """Incrementally load PDFs, split into chunks, generate embeddings, store in vector store"""
         pdf_dir = Path(self.pdf_directory)
-        all_documents = []
-
-        # Load PDFs
-        pdf_files = list(pdf_dir.glob("**/*.pdf"))
-        print(f"Found {len(pdf_files)} PDFs to process")
-        for pdf_file in pdf_files:
-            try:
-                loader = PyPDFLoader(str(pdf_file))
-                docs = loader.load()
-                for doc in docs:
-                    doc.metadata['source_file'] = pdf_file.name
-                    doc.metadata['file_type'] = 'pdf'
-                all_documents.extend(docs)
-            except Exception as e:
-                print(f"Error loading {pdf_file.name}: {e}")
+        manifest = IngestionManifest(self.persist_directory, self.vstore.collection_name)
+
+        # A populated collection without a manifest was built with random ids; start clean
+        if rebuild or (not manifest.exists and self.vstore.count() > 0):
+            self.vstore.reset()
+            manifest.clear()
+
+        pdf_files = sorted(pdf_dir.glob("**/*.pdf"))
+        plan = manifest.plan(pdf_files, pdf_dir)
+        if plan.is_empty:
+            manifest.save()
+            logger.info("Vector store up to date (%d PDFs unchanged, %d chunks) — skipping ingestion.",
+                        plan.unchanged, self.vstore.count())
+            return
 
-        # Split into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000, chunk_overlap=200, length_function=len, separators=["\n\n", "\n", " ", ""]
+        logger.info("Ingesting %d new/changed PDFs, removing %d, %d unchanged",
+                    len(plan.to_ingest), len(plan.removed), plan.unchanged)
+
+        # Remove chunks of deleted files and the previous version of changed files
+        changed = [pending.relpath for pending in plan.to_ingest]
+        self.vstore.delete_documents(manifest.stale_chunk_ids(plan.removed + changed))
+        for relpath in plan.removed:
+            manifest.forget(relpath)
+
+        def make_ids(pending, chunks):
+            return [
+                make_chunk_id(pending.file_hash, chunk.metadata.get('page', 0), chunk.metadata['start_index'])
+                for chunk in chunks
+            ]
+
+        def on_file_done(pending, ids):
+            manifest.record(pending, ids)
+            # Persist as we go so an interrupted ingest resumes where it stopped
+            manifest.save()
+
+        pipeline = IngestionPipeline(self.embedder, self.vstore, workers=self.ingest_workers)
+        stats = pipeline.run(
+            plan.to_ingest,
+            make_ids=make_ids,
+            on_file_done=on_file_done,
+            on_file_failed=lambda pending, error: manifest.forget(pending.relpath),
+            path_of=lambda pending: pending.path,
         )
-        chunks = text_splitter.split_documents(all_documents)
-        print(f"Split {len(all_documents)} documents into {len(chunks)} chunks")
+        logger.info(stats.report())
 
-        # If nothing to embed, skip adding to vector store to avoid empty errors
-        if not chunks:
-            print("No chunks generated from PDFs; skipping vector store population.")
-            return
+        manifest.save()
+        self.vstore.save_sparse_index()
+        logger.info("Ingestion complete. Total chunks in collection: %d", self.vstore.count())
 
-        # Generate embeddings
-        texts = [chunk.page_content for chunk in chunks]
-        embeddings = self.embedder.generate_embeddings(texts)
+    def corpus_version(self) -> str | None:
+        """Version of the ingested corpus; changes whenever PDFs are added, changed or removed."""
+        return IngestionManifest.read_version(self.persist_directory, self.vstore.collection_name)
 
-        # Add to vector store
-        ids = [str(uuid.uuid4()) for _ in chunks]
-        metadatas = [dict(chunk.metadata) for chunk in chunks]
-        self.vstore.add_documents(chunks, embeddings)
-        print("PDF processing and embedding generation complete.")
-
-    def run(self, query: str) -> str:
-        """Retrieve docs from vector store, feed to LLM, return answer."""
-        results = self.retriever.retrieve(query, top_k=self.top_k)
-        context = "\n\n".join([doc["content"] for doc in results]) if results else ""
+    def _build_prompt(self, query: str, results) -> str | None:
+        """Assemble the context-grounded prompt; None when nothing was retrieved."""
+        with span("rag.pack", chunks=len(results or [])) as pack_span:
+            packed = self.packer.pack(results or [])
+            pack_span.set(packed_chunks=len(packed.chunks), tokens=packed.tokens)
+        if packed.input_chunks:
+            logger.debug(packed.summary())
+        context = packed.text
 
         if not context:
-            return "No relevant documents found in the knowledge base."
+            return None
 
-        final_prompt = (
+        return (
             f"{self.system_prompt}\n\n"
             f"### CONTEXT:\n{context}\n\n"
             f"### USER QUESTION:\n{query}\n\n"
             f"### ANSWER (detailed and context-grounded):"
         )
 
-        response = self.llm.invoke(final_prompt)
+    def retrieve(self, query: str, where: dict | None = None, where_document: dict | None = None):
+        """Top-k chunks for the prompt, re-ranked by the cross-encoder when enabled; optional metadata / text filters."""
+        filters = {"where": where, "where_document": where_document}
+        if self.reranker is None:
+            return self.retriever.retrieve(query, top_k=self.top_k, mode=self.retrieval_mode, **filters)
+
+        candidates = self.retriever.retrieve(
+            query, top_k=max(self.rerank_candidates, self.top_k), mode=self.retrieval_mode, **filters
+        )
+        return self.reranker.rerank(query, candidates, top_k=self.top_k, latency_budget_ms=self.rerank_budget_ms)
+
+    def run(self, query: str) -> str:
+        """Retrieve docs from vector store, feed to LLM, return answer."""
+        results = self.retrieve(query)
+        final_prompt = self._build_prompt(query, results)
+
+        if final_prompt is None:
+            return "No relevant documents found in the knowledge base."
+
+        with span("rag.llm", prompt_chars=len(final_prompt)) as llm_span:
+            response = self.llm.invoke(final_prompt)
+            llm_span.set(**llm_usage(response))
+        return response.content
+
+    async def arun(self, query: str) -> str:
+        """Async version of ``run``: retrieval and prompt packing on the shared executor, native async LLM call."""
+        return await self.aanswer(query, await self.aretrieve(query))
+
+    async def aretrieve(self, query: str):
+        """Local retrieval only (no LLM call) on the shared executor; cheap enough to start speculatively."""
+        return await run_blocking(self.retrieve, query)
+
+    async def aanswer(self, query: str, results) -> str:
+        """Pack already retrieved chunks into the prompt and make the billed LLM call."""
+        final_prompt = await run_blocking(self._build_prompt, query, results)
+
+        if final_prompt is None:
+            return "No relevant documents found in the knowledge base."
+
+        with span("rag.llm", prompt_chars=len(final_prompt)) as llm_span:
+            response = await self.llm.ainvoke(final_prompt)
+            llm_span.set(**llm_usage(response))
         return response.content
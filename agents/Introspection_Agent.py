@@ -1,9 +1,11 @@
 from mistralai import Mistral
 from dotenv import load_dotenv
 import os
-import sqlite3
 import json
 
+from tools.reflection_store import get_reflection_store
+from tools.tracing import llm_usage, span
+
 
 class IntrospectionAgent:
     def __init__(self, db_path="memory.db"):
@@ -18,25 +20,7 @@ class IntrospectionAgent:
         self.client = Mistral(api_key=api_key)
 
         self.db_path = db_path
-        self._init_db()
-
-    def _init_db(self):
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
-
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS reflections (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                query TEXT,
-                answer TEXT,
-                feedback TEXT,
-                reflection TEXT,
-                score INTEGER
-            )
-        """)
-
-        conn.commit()
-        conn.close()
+        self.store = get_reflection_store(db_path)
 
     def generate_reflection(
         self,
@@ -78,10 +62,12 @@ class IntrospectionAgent:
         }}
         """
 
-        response = self.client.chat.complete(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        with span("introspection.llm", model=self.model) as llm_span:
+            response = self.client.chat.complete(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}]
+            )
+            llm_span.set(**llm_usage(response))
 
         message = response.choices[0].message
         return message["content"] if isinstance(message, dict) else message.content
@@ -91,16 +77,7 @@ class IntrospectionAgent:
         reflection = data["reflection"]
         score = data["score"]
 
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
-
-        cur.execute("""
-            INSERT INTO reflections (query, answer, feedback, reflection, score)
-            VALUES (?, ?, ?, ?, ?)
-        """, (query, answer, feedback, reflection, score))
-
-        conn.commit()
-        conn.close()
+        self.store.add(reflection, query=query, answer=answer, feedback=feedback, score=score)
 
         return reflection, score
 
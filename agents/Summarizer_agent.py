@@ -1,14 +1,27 @@
 # backend/agents/summarizer_agent.py
 # Summarizer Agent: uses Mistral LLM to generate real summaries
 
+import logging
 import os
 from dotenv import load_dotenv
 from mistralai import Mistral
 import re
+from typing import Iterator
+
+from tools.tracing import llm_usage, span
 
 # Read API key from environment variable
 MISTRAL_MODEL_NAME = "mistral-small-latest"
 
+logger = logging.getLogger(__name__)
+
+# Appended when the stream breaks after part of the answer was shown
+STREAM_INTERRUPTED_MARKER = "[Summary stream interrupted"
+
+
+class StreamFailure(str):
+    """A ``summarize_stream`` chunk reporting a failed LLM call (fallback text or interruption notice)"""
+
 
 class SummarizerAgent:
     def __init__(self):
@@ -34,7 +47,112 @@ class SummarizerAgent:
         Uses real LLM to generate a bilingual structured summary.
         Maintains backward compatibility with previous call signatures.
         """
+        messages, requested_lines, inhouse_content, web_content = self._build_messages(
+            query, rag_output, web_output, reasoning_output, inhouse_text, web_text, plan
+        )
 
+        try:
+            with span("summarize.llm", model=MISTRAL_MODEL_NAME, stream=False) as llm_span:
+                response = self.client.chat.complete(
+                    model=MISTRAL_MODEL_NAME,
+                    messages=messages,
+                )
+                llm_span.set(**llm_usage(response))
+            return self._finalize(response, requested_lines)
+        except Exception as e:
+            return self._fallback(e, inhouse_content, web_content)
+
+    async def asummarize(
+        self,
+        query: str,
+        rag_output: str = None,
+        web_output=None,
+        reasoning_output: str = None,
+        inhouse_text: str = None,
+        web_text: str = None,
+        plan=None,
+    ) -> str:
+        """Async version of ``summarize`` using the SDK's native async client."""
+        messages, requested_lines, inhouse_content, web_content = self._build_messages(
+            query, rag_output, web_output, reasoning_output, inhouse_text, web_text, plan
+        )
+
+        try:
+            with span("summarize.llm", model=MISTRAL_MODEL_NAME, stream=False) as llm_span:
+                response = await self.client.chat.complete_async(
+                    model=MISTRAL_MODEL_NAME,
+                    messages=messages,
+                )
+                llm_span.set(**llm_usage(response))
+            return self._finalize(response, requested_lines)
+        except Exception as e:
+            return self._fallback(e, inhouse_content, web_content)
+
+    def summarize_stream(
+        self,
+        query: str,
+        rag_output: str = None,
+        web_output=None,
+        reasoning_output: str = None,
+        inhouse_text: str = None,
+        web_text: str = None,
+        plan=None,
+    ) -> Iterator[str]:
+        """
+        Streaming version of ``summarize``: yields text chunks as Mistral produces them.
+        A requested N-line limit is applied incrementally and ends the stream early.
+        If the LLM call fails, the last chunk is a StreamFailure, so callers can
+        tell a partial or fallback answer from a complete one.
+        """
+        messages, requested_lines, inhouse_content, web_content = self._build_messages(
+            query, rag_output, web_output, reasoning_output, inhouse_text, web_text, plan
+        )
+        limiter = SentenceLimiter(requested_lines)
+        emitted = 0
+
+        try:
+            with span("summarize.llm", model=MISTRAL_MODEL_NAME, stream=True) as llm_span:
+                stream = self.client.chat.stream(
+                    model=MISTRAL_MODEL_NAME,
+                    messages=messages,
+                )
+                try:
+                    for event in stream:
+                        text = limiter.feed(self._delta_text(event))
+                        if text:
+                            emitted += len(text)
+                            yield text
+                        if limiter.done:
+                            break
+                finally:
+                    # Stop downloading tokens we are not going to show
+                    close = getattr(stream, "close", None)
+                    if close:
+                        close()
+                    llm_span.set(chars=emitted)
+            logger.info("Streamed summary (%d chars).", emitted)
+        except Exception as e:
+            if emitted:
+                yield StreamFailure(f"\n\n{STREAM_INTERRUPTED_MARKER}: {e}]")
+            else:
+                yield StreamFailure(self._fallback(e, inhouse_content, web_content))
+
+    @staticmethod
+    def _delta_text(event) -> str:
+        """Extract the text delta from a streaming event (attr or dict depending on SDK version)."""
+        data = event.data if hasattr(event, "data") else event
+        choices = data["choices"] if isinstance(data, dict) else data.choices
+        if not choices:
+            return ""
+        delta = choices[0]["delta"] if isinstance(choices[0], dict) else choices[0].delta
+        content = delta.get("content") if isinstance(delta, dict) else delta.content
+        if isinstance(content, list):
+            # Content may arrive as a list of typed chunks
+            return "".join(getattr(part, "text", "") or "" for part in content)
+        return content or ""
+
+    def _build_messages(self, query, rag_output, web_output, reasoning_output, inhouse_text, web_text, plan):
+        """Build the chat messages; also returns the line limit and the merged inputs for the fallback."""
         # Heuristic: if user explicitly asks for N lines/sentences, keep it tight.
         requested_lines = self._detect_requested_lines(query)
 
@@ -89,34 +207,34 @@ class SummarizerAgent:
         - Output English 
         """
 
-        try:
-            response = self.client.chat.complete(
-                model=MISTRAL_MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-            )
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+        return messages, requested_lines, inhouse_content, web_content
 
-            # Response object may expose message as attr or dict depending on SDK version
-            message = response.choices[0].message
-            text = message["content"] if isinstance(message, dict) else message.content
-            final_text = self._enforce_line_limit(text, requested_lines)
-            print(f"[SummarizerAgent] Generated summary ({len(final_text)} chars).")
-            return final_text
-        except Exception as e:
-            # Safe fallback summary to avoid blank UI if the LLM call fails
-            fallback = [
-                "Summary unavailable from model; showing combined context instead.",
-                f"Reason: {e}",
-                "",
-                "Context from internal docs:",
-                inhouse_content or "(none)",
-                "",
-                "Context from web search:",
-                web_content or "(none)",
-            ]
-            return "\n".join(fallback)
+    def _finalize(self, response, requested_lines: int) -> str:
+        # Response object may expose message as attr or dict depending on SDK version
+        message = response.choices[0].message
+        text = message["content"] if isinstance(message, dict) else message.content
+        final_text = self._enforce_line_limit(text, requested_lines)
+        logger.info("Generated summary (%d chars).", len(final_text))
+        return final_text
+
+    @staticmethod
+    def _fallback(error: Exception, inhouse_content: str, web_content: str) -> str:
+        # Safe fallback summary to avoid blank UI if the LLM call fails
+        fallback = [
+            "Summary unavailable from model; showing combined context instead.",
+            f"Reason: {error}",
+            "",
+            "Context from internal docs:",
+            inhouse_content or "(none)",
+            "",
+            "Context from web search:",
+            web_content or "(none)",
+        ]
+        return "\n".join(fallback)
 
     @staticmethod
     def _detect_requested_lines(query: str) -> int:
@@ -139,3 +257,43 @@ class SummarizerAgent:
         trimmed = " ".join(sentences[:max_lines]).strip()
         return trimmed or text
 
+
+class SentenceLimiter:
+    """
+    Incremental version of ``SummarizerAgent._enforce_line_limit``.
+
+    Feed streamed text in; it passes text through until the Nth sentence
+    terminator followed by whitespace, then reports ``done`` so the caller can
+    stop the stream. A limit of 0 passes everything through.
+    """
+
+    def __init__(self, max_sentences: int):
+        self.max_sentences = max_sentences
+        self.sentences = 0
+        self.done = False
+        self._prev = ""
+        self._started = False
+
+    def feed(self, text: str) -> str:
+        if self.done or not text:
+            return ""
+        if not self.max_sentences or self.max_sentences <= 0:
+            return text
+
+        if not self._started:
+            # Match the non-streaming version, which strips leading whitespace
+            text = text.lstrip()
+            if not text:
+                return ""
+            self._started = True
+
+        out = []
+        for ch in text:
+            if ch.isspace() and self._prev in (".", "!", "?"):
+                self.sentences += 1
+                if self.sentences >= self.max_sentences:
+                    self.done = True
+                    break
+            out.append(ch)
+            self._prev = ch
+        return "".join(out)
@@ -1,5 +1,6 @@
 from typing import Dict, Any, List
 from tools.web_search_tool import WebSearchTool
+from .executor import run_blocking
 
 
 class WebSearchAgent:
@@ -9,7 +10,15 @@ class WebSearchAgent:
 
     def run(self, query: str) -> Dict[str, Any]:
         raw_results: List[Dict[str, str]] = self.tool.search(query)
+        return self._format(query, raw_results)
 
+    async def arun(self, query: str) -> Dict[str, Any]:
+        # SerpAPI has no async client; keep the blocking HTTP call off the event loop
+        raw_results: List[Dict[str, str]] = await run_blocking(self.tool.search, query)
+        return self._format(query, raw_results)
+
+    @staticmethod
+    def _format(query: str, raw_results: List[Dict[str, str]]) -> Dict[str, Any]:
         summary_lines = [f"Web search results for: '{query}'"]
         for idx, res in enumerate(raw_results, start=1):
             summary_lines.append(
@@ -0,0 +1,51 @@
+"""
+Shared async plumbing for the agents.
+
+Blocking SDK calls (SerpAPI, SentenceTransformer, Chroma) are pushed onto one
+bounded thread pool so the event loop stays free, and synchronous callers such
+as the Streamlit script run coroutines on a single long-lived background loop
+(async HTTP clients must not be shared across event loops).
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_BLOCKING_WORKERS = int(os.getenv("AQUAINFO_BLOCKING_WORKERS", "8"))
+
+_lock = threading.Lock()
+_executor = None
+_loop = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the process-wide pool used for blocking calls."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_BLOCKING_WORKERS, thread_name_prefix="aquainfo-blocking")
+        return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking function on the shared pool and await its result (in the caller's context, so spans nest)."""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="aquainfo-event-loop", daemon=True).start()
+        return _loop
+
+
+def run_coroutine(coro):
+    """Run a coroutine to completion from synchronous code on the shared background loop."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
@@ -0,0 +1,157 @@
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TASKS = ("RAG", "WEB")
+DEFAULT_TASKS = ["RAG", "WEB"]
+
+# Cues that the answer lives in the in-house water-quality corpus
+RAG_KEYWORDS = [
+    "document", "report", "pdf", "guideline", "standard", "regulation", "according to",
+    "in-house", "internal", "our data", "corpus", "drinking water", "water quality", "potable",
+    "contaminant", "contaminants", "contamination", "pollution", "polluted", "pollutant", "pollutants",
+    "nitrate", "nitrite", "coliform", "e. coli", "e.coli",
+    "turbidity", "chlorine", "chloramine", "lead", "arsenic", "fluoride", "pfas", "thm",
+    "trihalomethane", "mg/l", "ppm", "ph", "hardness", "treatment", "filtration", "disinfection",
+    "boil", "groundwater", "well water", "aquifer", "wastewater", "sampling", "maximum acceptable",
+]
+
+# Cues that the answer needs live / recent information from the web
+WEB_KEYWORDS = [
+    "latest", "recent", "recently", "news", "today", "yesterday", "this week", "this month",
+    "this year", "current", "currently", "now", "update", "updated", "announced", "breaking",
+    "outbreak", "advisory", "boil water notice", "near me", "price", "cost of", "buy", "website",
+    "who is", "trend", "2023", "2024", "2025", "2026",
+]
+
+# Labeled examples for the nearest-centroid fallback
+LABELED_EXAMPLES: Dict[str, List[str]] = {
+    "RAG": [
+        "what are the safest ways to drink water",
+        "how should drinking water be treated before consumption",
+        "what is the maximum acceptable concentration of nitrate",
+        "explain the health effects of lead in drinking water",
+        "how does chlorination disinfect water",
+        "what does the report say about groundwater sampling",
+        "summarize the guidelines for microbiological water quality",
+    ],
+    "WEB": [
+        "latest news on water contamination",
+        "are there any boil water advisories today",
+        "what happened in the recent flint water crisis update",
+        "current price of a home water filter",
+        "which companies announced new water purification technology this year",
+    ],
+    "RAG+WEB": [
+        "compare the guidelines for nitrate with recent measurements in ontario",
+        "how do current pfas regulations compare with the standards in our documents",
+        "is the water in toronto safe to drink right now and what do the guidelines say",
+        "recent arsenic findings and their health effects",
+    ],
+}
+
+
+@dataclass
+class Plan:
+    """Which agents to run for a query, and who decided it"""
+    intent: str
+    tasks: List[str] = field(default_factory=lambda: list(DEFAULT_TASKS))
+    source: str = "default"
+
+    def needs(self, task: str) -> bool:
+        return task in self.tasks
+
+
+def parse_plan(text: str) -> Optional[Plan]:
+    """Parse the intent analyzer's JSON answer; None if it is missing or malformed."""
+    if not text:
+        return None
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+
+    tasks = data.get("tasks")
+    if not isinstance(tasks, list):
+        return None
+    tasks = [t.strip().upper() for t in tasks if isinstance(t, str) and t.strip().upper() in TASKS]
+    if not tasks:
+        return None
+    return Plan(intent=str(data.get("intent", "")), tasks=sorted(set(tasks), key=TASKS.index), source="llm")
+
+
+class LocalIntentClassifier:
+    """
+    Cheap routing without an LLM round trip.
+
+    Keyword rules decide the obvious cases. If an embedding manager is given,
+    a nearest-centroid classifier over LABELED_EXAMPLES handles the rest when
+    it is confident. Otherwise ``classify`` returns None and the caller asks
+    the LLM.
+    """
+
+    _rag_pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, RAG_KEYWORDS)) + r")\b")
+    _web_pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, WEB_KEYWORDS)) + r")\b")
+
+    def __init__(self, embedder=None, min_similarity: float = 0.45, min_margin: float = 0.05):
+        self.embedder = embedder
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self._labels: List[str] = []
+        self._centroids: Optional[np.ndarray] = None
+
+    def _classify_keywords(self, query: str) -> Optional[Plan]:
+        q = query.lower()
+        rag_hits = len(self._rag_pattern.findall(q))
+        web_hits = len(self._web_pattern.findall(q))
+
+        if rag_hits and web_hits:
+            return Plan("domain question needing recent information", ["RAG", "WEB"], "local")
+        if rag_hits:
+            return Plan("water-quality knowledge question", ["RAG"], "local")
+        if web_hits:
+            return Plan("recent / live information", ["WEB"], "local")
+        return None
+
+    def _ensure_centroids(self):
+        if self._centroids is not None:
+            return
+        labels, centroids = [], []
+        for label, examples in LABELED_EXAMPLES.items():
+            vectors = np.asarray(self.embedder.generate_embeddings(examples), dtype=np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+            centroid = vectors.mean(axis=0)
+            labels.append(label)
+            centroids.append(centroid / (np.linalg.norm(centroid) + 1e-12))
+        self._labels = labels
+        self._centroids = np.vstack(centroids)
+
+    def _classify_centroid(self, query: str) -> Optional[Plan]:
+        self._ensure_centroids()
+        vector = np.asarray(self.embedder.generate_embeddings([query])[0], dtype=np.float32)
+        vector /= np.linalg.norm(vector) + 1e-12
+        scores = self._centroids @ vector
+        order = np.argsort(scores)[::-1]
+        best, second = scores[order[0]], scores[order[1]]
+        if best < self.min_similarity or best - second < self.min_margin:
+            return None
+        label = self._labels[order[0]]
+        return Plan(f"nearest example group: {label}", label.split("+"), "local")
+
+    def classify(self, query: str) -> Optional[Plan]:
+        plan = self._classify_keywords(query)
+        if plan is None and self.embedder is not None:
+            try:
+                plan = self._classify_centroid(query)
+            except Exception as e:
+                logger.warning("Centroid intent classifier unavailable: %s", e)
+        return plan
@@ -0,0 +1,6 @@
+"""
+Offline benchmarks for the AquaInfo retrieval stack. Run modules with ``python -m benchmarks.<name>``.
+
+``python -m benchmarks.suite`` covers ingest, embedding, retrieval and the full agent pipeline
+against recorded LLM responses (benchmarks.fakes) and writes JSON results for comparison across commits.
+"""
@@ -0,0 +1,131 @@
+"""
+Write throughput and memory of VectorStore.add_documents.
+
+Each mode writes the same synthetic chunks (random unit vectors, text of
+chunk size) into a fresh collection, in a fresh interpreter so peak memory
+is measured cleanly:
+  - lists: the previous write path - every embedding converted to a Python
+    list and every metadata dict copied up front, then written in chunks of
+    the client's max batch size (a single call fails above it)
+  - bulk: VectorStore.add_documents, which streams bounded upserts of NumPy
+    slices
+
+Reported: rows/s, extra peak RSS over the prepared input, and, for bulk, the
+row count after writing everything a second time (deterministic ids upsert,
+so it must not grow).
+
+Usage:
+    python -m benchmarks.bulk_upsert
+    python -m benchmarks.bulk_upsert --rows 100000 --modes bulk
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Executed in a child interpreter so each mode's peak RSS is its own.
+PROBE = r"""
+import json, resource, shutil, sys, tempfile, time
+import numpy as np
+from langchain_core.documents import Document
+from tools.RAG_tool import VectorStore
+
+mode, rows, dim, text_chars = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4])
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+def peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+rng = np.random.default_rng(0)
+embeddings = rng.standard_normal((rows, dim), dtype=np.float32)
+embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+words = "nitrate lead arsenic coliform chlorine turbidity hardness fluoride water well sample limit".split()
+documents = []
+for i in range(rows):
+    text = " ".join(words[(i + j) % len(words)] for j in range(text_chars // 8))[:text_chars]
+    documents.append(Document(page_content=f"{i} {text}", metadata={"source_file": f"doc{i // 500}.pdf",
+                                                                   "page": (i // 5) % 100, "start_index": i % 5 * 800}))
+
+workdir = tempfile.mkdtemp(prefix="bulk_bench_")
+store = VectorStore(collection_name="bulk_bench", persist_directory=workdir)
+store.sparse_index  # build the (empty) BM25 index outside the timed region
+baseline = rss_mb()
+
+t0 = time.perf_counter()
+if mode == "lists":
+    ids = [f"row_{i}" for i in range(rows)]
+    metadatas, texts, vectors = [], [], []
+    for i, (doc, embedding) in enumerate(zip(documents, embeddings)):
+        metadata = dict(doc.metadata)
+        metadata["doc_index"] = i
+        metadata["content_length"] = len(doc.page_content)
+        metadatas.append(metadata)
+        texts.append(doc.page_content)
+        vectors.append(embedding.tolist())
+    step = store.client.get_max_batch_size()
+    for start in range(0, rows, step):
+        store.collection.upsert(ids=ids[start:start + step], embeddings=vectors[start:start + step],
+                                metadatas=metadatas[start:start + step], documents=texts[start:start + step])
+        store.sparse_index.add(ids[start:start + step], texts[start:start + step])
+    seconds = time.perf_counter() - t0
+    rerun_count = None
+else:
+    stats = store.add_documents(documents, embeddings)
+    seconds = time.perf_counter() - t0
+    store.add_documents(documents, embeddings)
+    rerun_count = store.collection.count()
+
+print("__RESULT__" + json.dumps({
+    "rows_per_s": rows / seconds, "seconds": seconds, "extra_peak_mb": peak_mb() - baseline,
+    "count": store.collection.count() if rerun_count is None else rerun_count,
+    "rerun_count": rerun_count,
+}))
+shutil.rmtree(workdir, ignore_errors=True)
+"""
+
+
+def run_mode(mode: str, args) -> Dict[str, float]:
+    env = dict(os.environ, PYTHONPATH=str(PROJECT_ROOT))
+    proc = subprocess.run([sys.executable, "-c", PROBE, mode, str(args.rows), str(args.dim), str(args.text_chars)],
+                          cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Probe failed for {mode}:\n{proc.stderr[-2000:]}")
+    line = next(l for l in proc.stdout.splitlines() if l.startswith("__RESULT__"))
+    return json.loads(line[len("__RESULT__"):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384, help="embedding dimension (all-MiniLM-L6-v2: 384)")
+    parser.add_argument("--text-chars", type=int, default=1000, help="characters per chunk")
+    parser.add_argument("--modes", default="lists,bulk", help="comma-separated: lists, bulk")
+    parser.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = parser.parse_args()
+
+    results = {mode: run_mode(mode, args) for mode in args.modes.split(",") if mode.strip()}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.rows} rows, dim {args.dim}, {args.text_chars} chars per chunk")
+    print(f"{'':<8}{'seconds':>9}{'rows/s':>9}{'extra peak MB':>15}{'rows after rerun':>18}")
+    for mode, r in results.items():
+        rerun = "-" if r["rerun_count"] is None else str(r["rerun_count"])
+        print(f"{mode:<8}{r['seconds']:>9.1f}{r['rows_per_s']:>9.0f}{r['extra_peak_mb']:>15.0f}{rerun:>18}")
+
+
+if __name__ == "__main__":
+    main()
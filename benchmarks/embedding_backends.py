@@ -0,0 +1,159 @@
+"""
+Parity and speed of the EmbeddingManager backends (torch, onnx, onnx-int8).
+
+For every backend this reports:
+  - cold load: a fresh interpreter importing tools.RAG_tool and loading the model
+  - single-query latency (p50 / p95 of one short text per call)
+  - bulk throughput (texts/s embedding stored chunks, or synthetic text if the store is empty)
+  - parity: cosine similarity of every vector against the torch backend
+
+The process exits with status 1 if any backend's minimum cosine is below
+--min-cosine (0.99 by default), so it doubles as the parity check.
+
+Usage:
+    python -m benchmarks.embedding_backends
+    python -m benchmarks.embedding_backends --backends torch,onnx-int8 --threads 4 --texts 1000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from tools.RAG_tool import DEFAULT_MODEL_NAME, EMBEDDING_BACKENDS, EmbeddingManager
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Executed in a child interpreter so every load is a real cold start.
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from tools.RAG_tool import EmbeddingManager
+manager = EmbeddingManager(sys.argv[1], backend=sys.argv[2], threads=int(sys.argv[3]) or None)
+manager.model.encode(["warm"])
+print("__RESULT__" + json.dumps({"cold_load_s": time.perf_counter() - t0}))
+"""
+
+QUERIES = [
+    "what is the maximum acceptable concentration of nitrate in drinking water",
+    "E. coli detected in a private well",
+    "how does chlorination disinfect water",
+    "health effects of lead from old pipes",
+    "THM limits in treated water",
+    "is boiling water enough to remove arsenic",
+]
+
+
+def cold_load(model_name: str, backend: str, threads: int) -> float:
+    env = dict(os.environ, PYTHONPATH=str(PROJECT_ROOT))
+    proc = subprocess.run([sys.executable, "-c", PROBE, model_name, backend, str(threads or 0)],
+                          cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Cold-load probe failed for {backend}:\n{proc.stderr[-2000:]}")
+    line = next(l for l in proc.stdout.splitlines() if l.startswith("__RESULT__"))
+    return json.loads(line[len("__RESULT__"):])["cold_load_s"]
+
+
+def corpus_texts(n: int, seed: int) -> List[str]:
+    """Stored chunks if the vector store has any, otherwise synthetic water-quality text"""
+    try:
+        from tools.RAG_tool import get_vector_store
+
+        collection = get_vector_store().collection
+        if collection.count():
+            texts = collection.get(limit=n, include=["documents"])["documents"]
+            if texts:
+                return [t for t in texts if t][:n]
+    except Exception as e:
+        print(f"Vector store unavailable, using synthetic text: {e}")
+    rng = random.Random(seed)
+    words = " ".join(QUERIES).split()
+    return [" ".join(rng.choices(words, k=rng.randint(20, 180))) for _ in range(n)]
+
+
+def measure(manager: EmbeddingManager, texts: List[str], repeat: int) -> Dict[str, float]:
+    model = manager.model
+    model.encode(QUERIES[:2])  # warm-up
+    latencies = []
+    for _ in range(repeat):
+        for query in QUERIES:
+            t0 = time.perf_counter()
+            model.encode([query])
+            latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+
+    t0 = time.perf_counter()
+    vectors = np.asarray(model.encode(texts, batch_size=32), dtype=np.float32)
+    bulk_s = time.perf_counter() - t0
+    return {
+        "query_ms_p50": statistics.median(latencies),
+        "query_ms_p95": latencies[int(0.95 * (len(latencies) - 1))],
+        "bulk_texts_per_s": len(texts) / bulk_s,
+        "vectors": vectors,
+    }
+
+
+def cosine_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1) + 1e-12)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--backends", default=",".join(EMBEDDING_BACKENDS), help="comma-separated backends")
+    parser.add_argument("--threads", type=int, default=0, help="ONNX intra-op threads (0 = onnxruntime default)")
+    parser.add_argument("--texts", type=int, default=500, help="texts in the bulk run")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the query set for latency")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="parity threshold against torch")
+    parser.add_argument("--no-cold", action="store_true", help="skip the cold-load subprocess measurement")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = parser.parse_args()
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    if "torch" not in backends:
+        backends.insert(0, "torch")  # parity reference
+    texts = corpus_texts(args.texts, args.seed)
+
+    results = {}
+    for backend in backends:
+        # In-process load first: exports / quantizes the ONNX graph if needed, so cold load measures loading only
+        manager = EmbeddingManager(args.model, backend=backend, threads=args.threads or None)
+        results[backend] = measure(manager, texts, args.repeat)
+        results[backend]["cold_load_s"] = None if args.no_cold else cold_load(args.model, backend, args.threads)
+
+    reference = results["torch"]["vectors"]
+    failed = []
+    for backend, r in results.items():
+        cosines = cosine_rows(r.pop("vectors"), reference)
+        r["cosine_min"] = float(cosines.min())
+        r["cosine_mean"] = float(cosines.mean())
+        if r["cosine_min"] < args.min_cosine:
+            failed.append(backend)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{len(texts)} bulk texts, threads={args.threads or 'default'}")
+        print(f"{'':<11}{'cold s':>8}{'query p50':>11}{'query p95':>11}{'bulk/s':>9}{'cos min':>9}{'cos mean':>10}")
+        for backend, r in results.items():
+            cold = f"{r['cold_load_s']:.2f}" if r["cold_load_s"] is not None else "-"
+            print(f"{backend:<11}{cold:>8}{r['query_ms_p50']:>11.2f}{r['query_ms_p95']:>11.2f}"
+                  f"{r['bulk_texts_per_s']:>9.0f}{r['cosine_min']:>9.4f}{r['cosine_mean']:>10.4f}")
+
+    if failed:
+        print(f"PARITY FAILED (cosine < {args.min_cosine}): {', '.join(failed)}")
+        sys.exit(1)
+    print(f"Parity OK: every backend >= {args.min_cosine} cosine against torch")
+
+
+if __name__ == "__main__":
+    main()
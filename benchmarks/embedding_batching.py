@@ -0,0 +1,105 @@
+"""
+Length-bucketed batching versus fixed-size batches for embedding the corpus.
+
+The baseline is ``model.encode(texts, batch_size=N)``: SentenceTransformer
+sorts by character length and cuts fixed batches of N texts. The bucketed runs
+use EmbeddingManager's scheduler (sort by token length, cap padded tokens per
+batch) with each --caps value. For every run this reports texts/s, tokens/s,
+padding efficiency (real tokens / computed positions) and the largest
+difference from the baseline vectors.
+
+Texts are the chunks already in the vector store (the PDF corpus), or
+synthetic text of mixed length if the store is empty.
+
+Usage:
+    python -m benchmarks.embedding_batching
+    python -m benchmarks.embedding_batching --backend onnx --caps 2048,4096,8192 --texts 2000
+"""
+
+import argparse
+import json
+import time
+from typing import Dict
+
+import numpy as np
+
+from benchmarks.embedding_backends import corpus_texts
+from tools.RAG_tool import DEFAULT_MODEL_NAME, EMBEDDING_BACKENDS, EmbeddingManager
+from tools.embedding_batcher import LengthBucketedEncoder
+
+
+def fixed_batch_padding(lengths: np.ndarray, char_lengths: np.ndarray, batch_size: int) -> int:
+    """Positions computed by fixed batches over a longest-characters-first order"""
+    order = np.argsort(-char_lengths, kind="stable")
+    batches = np.array_split(order, range(batch_size, len(order), batch_size))
+    return sum(len(batch) * int(lengths[batch].max()) for batch in batches)
+
+
+def run(args) -> Dict[str, Dict[str, float]]:
+    manager = EmbeddingManager(args.model, backend=args.backend)
+    model = manager.model
+    texts = corpus_texts(args.texts, args.seed)
+    lengths = LengthBucketedEncoder(model).token_lengths(texts)
+    tokens = int(lengths.sum())
+    print(f"{len(texts)} texts, {tokens} tokens (min {lengths.min()}, median {int(np.median(lengths))}, "
+          f"max {lengths.max()}), backend={args.backend}")
+    model.encode(texts[:8], batch_size=8, show_progress_bar=False)  # warm-up
+
+    results = {}
+    best = None
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        reference = np.asarray(model.encode(texts, batch_size=args.batch_size, show_progress_bar=False), dtype=np.float32)
+        seconds = time.perf_counter() - t0
+        best = seconds if best is None else min(best, seconds)
+    padded = fixed_batch_padding(lengths, np.array([len(t) for t in texts]), args.batch_size)
+    results[f"fixed {args.batch_size}"] = {
+        "seconds": best, "texts_per_s": len(texts) / best, "tokens_per_s": tokens / best,
+        "padding_efficiency": tokens / padded, "batches": -(-len(texts) // args.batch_size),
+        "speedup": 1.0, "max_abs_diff": 0.0,
+    }
+
+    out = np.empty((len(texts), model.get_sentence_embedding_dimension()), dtype=np.float32)
+    for cap in args.caps:
+        encoder = LengthBucketedEncoder(model, max_batch_tokens=cap)
+        best_stats = None
+        for _ in range(args.repeat):
+            encoder.encode(texts, out=out)
+            if best_stats is None or encoder.last_stats.seconds < best_stats.seconds:
+                best_stats = encoder.last_stats
+        results[f"bucketed {cap}"] = {
+            "seconds": best_stats.seconds, "texts_per_s": len(texts) / best_stats.seconds,
+            "tokens_per_s": best_stats.tokens_per_s, "padding_efficiency": best_stats.padding_efficiency,
+            "batches": best_stats.batches, "speedup": best / best_stats.seconds,
+            "max_abs_diff": float(np.abs(out - reference).max()),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--backend", choices=EMBEDDING_BACKENDS, default="torch")
+    parser.add_argument("--texts", type=int, default=1000, help="texts to embed")
+    parser.add_argument("--batch-size", type=int, default=32, help="baseline fixed batch size")
+    parser.add_argument("--caps", type=lambda s: [int(c) for c in s.split(",") if c.strip()],
+                        default=[1024, 4096, 16384], help="comma-separated padded-token caps")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per configuration (best is reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = parser.parse_args()
+
+    results = run(args)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'':<16}{'seconds':>9}{'texts/s':>9}{'tokens/s':>10}{'padding':>9}{'batches':>9}{'speedup':>9}{'max diff':>10}")
+    for label, r in results.items():
+        print(f"{label:<16}{r['seconds']:>9.2f}{r['texts_per_s']:>9.0f}{r['tokens_per_s']:>10.0f}"
+              f"{r['padding_efficiency']:>9.0%}{r['batches']:>9}{r['speedup']:>8.2f}x{r['max_abs_diff']:>10.1e}")
+
+
+if __name__ == "__main__":
+    main()
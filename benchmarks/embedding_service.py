@@ -0,0 +1,131 @@
+"""
+Load test for the micro-batching EmbeddingService.
+
+N simulated users (one thread each, like Streamlit sessions) each embed a
+stream of distinct single queries back to back. Each user count runs twice:
+  - direct: every user calls the shared EmbeddingManager itself, one
+    single-item forward pass per request (what each session did before)
+  - service: every user goes through one EmbeddingService, which batches
+    the requests that arrive together
+
+Reported per run: p50 / p99 request latency, throughput and, for the service,
+the average number of requests that shared a forward pass. The embedding
+cache is off so every request really reaches the model.
+
+Usage:
+    python -m benchmarks.embedding_service
+    python -m benchmarks.embedding_service --users 1,4,16,64 --requests 50 --wait-ms 2
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import threading
+import time
+from typing import Dict, List
+
+from tools.RAG_tool import DEFAULT_MODEL_NAME, EMBEDDING_BACKENDS, EmbeddingManager
+from tools.embedding_service import DEFAULT_MAX_WAIT_MS, EmbeddingService
+
+TOPICS = ["nitrate", "lead", "arsenic", "E. coli", "chlorine", "fluoride", "turbidity", "hardness"]
+TEMPLATES = [
+    "what is the limit for {} in drinking water (user {} request {})",
+    "health effects of {} exposure, question {} / {}",
+    "how do I test my well for {}? session {} query {}",
+]
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def load(embed, users: int, requests: int) -> Dict[str, float]:
+    """Run ``users`` threads of ``requests`` sequential single-query calls"""
+    latencies: List[float] = []
+    errors = []
+    lock = threading.Lock()
+    start_gate = threading.Barrier(users + 1)
+
+    def user(index: int):
+        own = []
+        start_gate.wait()
+        for i in range(requests):
+            text = TEMPLATES[i % len(TEMPLATES)].format(TOPICS[(index + i) % len(TOPICS)], index, i)
+            t0 = time.perf_counter()
+            try:
+                embed([text])
+            except Exception as e:
+                errors.append(repr(e))
+                continue
+            own.append((time.perf_counter() - t0) * 1000)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=user, args=(u,)) for u in range(users)]
+    for thread in threads:
+        thread.start()
+    start_gate.wait()
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - t0
+
+    return {
+        "p50_ms": statistics.median(latencies) if latencies else float("nan"),
+        "p99_ms": percentile(latencies, 0.99) if latencies else float("nan"),
+        "requests_per_s": len(latencies) / wall,
+        "errors": len(errors),
+    }
+
+
+def run(args) -> Dict[str, Dict[str, Dict[str, float]]]:
+    manager = EmbeddingManager(args.model, backend=args.backend)
+    manager.generate_embeddings(["warm up"])
+
+    results: Dict[str, Dict[str, Dict[str, float]]] = {"direct": {}, "service": {}}
+    for users in args.users:
+        results["direct"][str(users)] = load(manager.generate_embeddings, users, args.requests)
+
+        service = EmbeddingService(manager, max_wait_ms=args.wait_ms, max_batch_texts=args.max_batch)
+        r = load(service.generate_embeddings, users, args.requests)
+        r["requests_per_batch"] = service.stats()["requests_per_batch"]
+        service.close()
+        results["service"][str(users)] = r
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--backend", choices=EMBEDDING_BACKENDS, default="torch")
+    parser.add_argument("--users", type=lambda s: [int(u) for u in s.split(",") if u.strip()],
+                        default=[1, 2, 4, 8, 16, 32], help="comma-separated concurrent user counts")
+    parser.add_argument("--requests", type=int, default=30, help="sequential requests per user")
+    parser.add_argument("--wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS, help="service batching window")
+    parser.add_argument("--max-batch", type=int, default=64, help="service texts per forward pass")
+    parser.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = parser.parse_args()
+
+    # The manager prints a line per call; keep the table readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = run(args)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.requests} requests per user, service window {args.wait_ms:g} ms")
+    print(f"{'users':>6}  {'direct p50':>10}{'p99':>9}{'req/s':>8}  {'service p50':>11}{'p99':>9}{'req/s':>8}"
+          f"{'req/batch':>10}{'errors':>8}")
+    for users in args.users:
+        d, s = results["direct"][str(users)], results["service"][str(users)]
+        print(f"{users:>6}  {d['p50_ms']:>10.1f}{d['p99_ms']:>9.1f}{d['requests_per_s']:>8.0f}"
+              f"  {s['p50_ms']:>11.1f}{s['p99_ms']:>9.1f}{s['requests_per_s']:>8.0f}{s['requests_per_batch']:>10.1f}"
+              f"{d['errors'] + s['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
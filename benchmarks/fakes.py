@@ -0,0 +1,185 @@
+"""
+Offline stand-ins for the external services the agents call.
+
+  - RecordedLLM replays recorded responses, chosen by a marker in the prompt,
+    after a configurable latency
+  - FakeChatMistralAI and FakeMistral put it behind the two client APIs the
+    agents use (langchain's ``invoke`` / ``ainvoke`` and the mistralai SDK's
+    ``chat.complete`` / ``complete_async`` / ``stream``)
+  - web searches are answered by tools.web_search_tool.FixtureBackend, the
+    SerpAPI stand-in, with its own latency
+
+``offline_agents()`` patches all of them into the agent modules, so a real
+CoordinatorAgent runs without API keys or network access.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+from unittest import mock
+
+DEFAULT_RECORDING_PATH = Path(__file__).resolve().parent / "data" / "recorded_llm.json"
+
+
+def prompt_text(messages: Any) -> str:
+    """Flatten a prompt (string, langchain messages or SDK message dicts) into one string"""
+    if isinstance(messages, str):
+        return messages
+    parts = []
+    for message in messages:
+        content = message.get("content") if isinstance(message, dict) else getattr(message, "content", message)
+        parts.append(content if isinstance(content, str) else str(content))
+    return "\n".join(parts)
+
+
+class RecordedLLM:
+    """
+    Replays recorded LLM responses
+
+    The recording is a JSON file with a ``responses`` list of
+    ``{"name", "match", "response", "latency_ms"}`` entries and a ``default``
+    entry. The first entry whose ``match`` occurs in the prompt answers it.
+    Each call sleeps ``latency_ms`` (or the recorded latency when None) to
+    stand in for the round trip, and is counted per entry name.
+    """
+
+    def __init__(self, path=DEFAULT_RECORDING_PATH, latency_ms: Optional[float] = 0.0):
+        """
+        Args:
+            path: Recording file
+            latency_ms: Simulated latency of every call; None replays each entry's recorded latency
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.responses: List[Dict[str, Any]] = data["responses"]
+        self.default: Dict[str, Any] = data["default"]
+        self.latency_ms = latency_ms
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, prompt: str) -> Dict[str, Any]:
+        entry = next((e for e in self.responses if e["match"] in prompt), self.default)
+        with self._lock:
+            self.calls[entry["name"]] = self.calls.get(entry["name"], 0) + 1
+        return entry
+
+    def _delay_s(self, entry: Dict[str, Any]) -> float:
+        latency_ms = entry.get("latency_ms", 0.0) if self.latency_ms is None else self.latency_ms
+        return latency_ms / 1000
+
+    def reply(self, messages: Any) -> str:
+        entry = self._entry(prompt_text(messages))
+        delay = self._delay_s(entry)
+        if delay:
+            time.sleep(delay)
+        return entry["response"]
+
+    async def areply(self, messages: Any) -> str:
+        entry = self._entry(prompt_text(messages))
+        delay = self._delay_s(entry)
+        if delay:
+            await asyncio.sleep(delay)
+        return entry["response"]
+
+    def reply_stream(self, messages: Any) -> Iterator[str]:
+        """The reply word by word; the latency is paid before the first chunk"""
+        text = self.reply(messages)
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + " "
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls.clear()
+
+
+class FakeChatMistralAI:
+    """langchain_mistralai.ChatMistralAI stand-in: ``invoke`` / ``ainvoke`` return an AIMessage"""
+
+    def __init__(self, llm: RecordedLLM, **kwargs):
+        self.llm = llm
+        self.model_name = kwargs.get("model_name") or kwargs.get("model")
+
+    def invoke(self, messages, *args, **kwargs):
+        from langchain_core.messages import AIMessage
+
+        return AIMessage(content=self.llm.reply(messages))
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        from langchain_core.messages import AIMessage
+
+        return AIMessage(content=await self.llm.areply(messages))
+
+
+def _completion(text: str):
+    message = SimpleNamespace(role="assistant", content=text)
+    return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")])
+
+
+def _stream_event(text: str):
+    choice = SimpleNamespace(index=0, delta=SimpleNamespace(content=text), finish_reason=None)
+    return SimpleNamespace(data=SimpleNamespace(choices=[choice]))
+
+
+class _FakeChat:
+    def __init__(self, llm: RecordedLLM):
+        self.llm = llm
+
+    def complete(self, model=None, messages=None, **kwargs):
+        return _completion(self.llm.reply(messages))
+
+    async def complete_async(self, model=None, messages=None, **kwargs):
+        return _completion(await self.llm.areply(messages))
+
+    def stream(self, model=None, messages=None, **kwargs):
+        return (_stream_event(chunk) for chunk in self.llm.reply_stream(messages))
+
+
+class FakeMistral:
+    """mistralai.Mistral stand-in exposing the ``chat`` endpoints the agents use"""
+
+    def __init__(self, llm: RecordedLLM, api_key: Optional[str] = None, **kwargs):
+        self.chat = _FakeChat(llm)
+
+
+@contextmanager
+def offline_agents(llm: RecordedLLM, web_backend=None):
+    """
+    Patch the agent modules to use ``llm`` and ``web_backend`` instead of Mistral and SerpAPI
+
+    Args:
+        llm: Recorded responses for every LLM call
+        web_backend: ``fetch(params)`` backend for web searches; defaults to
+            FixtureBackend over data/fixtures/web_search.json. Searches bypass
+            the on-disk web cache so every run pays the backend latency.
+    """
+    import agents.Coordinator_agent
+    import agents.InHouseSearch_agent
+    import agents.Introspection_Agent
+    import agents.Summarizer_agent
+    import agents.WebScraper_agent
+    from tools.web_search_tool import FixtureBackend, WebSearchTool
+
+    backend = web_backend or FixtureBackend()
+
+    def chat_model(*args, **kwargs):
+        return FakeChatMistralAI(llm, **kwargs)
+
+    def sdk_client(*args, **kwargs):
+        return FakeMistral(llm, **kwargs)
+
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.dict(os.environ, {"MISTRALAI_API_KEY": os.getenv("MISTRALAI_API_KEY") or "offline"}))
+        stack.enter_context(mock.patch.object(agents.Coordinator_agent, "ChatMistralAI", chat_model))
+        stack.enter_context(mock.patch.object(agents.InHouseSearch_agent, "ChatMistralAI", chat_model))
+        stack.enter_context(mock.patch.object(agents.Summarizer_agent, "Mistral", sdk_client))
+        stack.enter_context(mock.patch.object(agents.Introspection_Agent, "Mistral", sdk_client))
+        stack.enter_context(mock.patch.object(agents.WebScraper_agent, "WebSearchTool",
+                                              lambda: WebSearchTool(backend=backend, use_cache=False)))
+        yield
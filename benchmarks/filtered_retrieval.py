@@ -0,0 +1,167 @@
+"""
+Latency of metadata-filtered retrieval versus unfiltered retrieval.
+
+The stored chunks are copied (``--replicas`` jittered copies) into a Chroma
+collection and a NumPy collection. For each backend and filter, reported:
+  - selectivity: share of the stored chunks passing the filter
+  - first: the first query with the filter, which resolves it (later
+    queries reuse the cached selection)
+  - dense p50 / p95: VectorStore.query with the filter pushed down
+  - bm25 p50: VectorStore.sparse_query restricted to the passing chunks
+  - ratio: filtered dense p50 over the unfiltered one (<= 1 means no slower)
+  - overlap@k: share of the exact filtered top-k (NumPy) each backend returns
+Every returned chunk is checked against the filter.
+
+Filters: the smallest and the largest source PDF, a page range, the small
+source with the page range, and a document-text ``$contains``.
+
+Usage:
+    python -m benchmarks.filtered_retrieval
+    python -m benchmarks.filtered_retrieval --replicas 10 --queries 200 --backends numpy
+"""
+
+import argparse
+import json
+import shutil
+import statistics
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.hnsw_recall import make_queries, percentile
+from benchmarks.numpy_store import COLLECTION, build_stores
+
+
+def make_filters(store) -> Dict[str, Dict[str, Any]]:
+    """Filters over the stored metadata: smallest / largest source, pages 10-40, small source + pages, a text match"""
+    page = store.collection.get(include=["metadatas"])
+    sizes = Counter(m.get("source_file") for m in page["metadatas"] if m)
+    smallest, largest = min(sizes, key=sizes.get), max(sizes, key=sizes.get)
+    pages = {"$and": [{"page": {"$gte": 10}}, {"page": {"$lte": 40}}]}
+    return {
+        "none": {},
+        "small source": {"where": {"source_file": smallest}},
+        "large source": {"where": {"source_file": largest}},
+        "pages 10-40": {"where": pages},
+        "source + pages": {"where": {"$and": [{"source_file": smallest}, *pages["$and"]]}},
+        "text contains": {"where_document": {"$contains": "water"}},
+    }
+
+
+def passes(metadata: Dict[str, Any], document: str, where: Dict[str, Any] | None, where_document) -> bool:
+    """Reference check for the filters used here"""
+    if where_document and where_document["$contains"] not in (document or ""):
+        return False
+    clauses = (where or {}).get("$and", [where] if where else [])
+    for clause in clauses:
+        (key, condition), = clause.items()
+        value = metadata.get(key)
+        if isinstance(condition, dict):
+            (operator, bound), = condition.items()
+            if value is None or not {"$gte": value >= bound, "$lte": value <= bound}[operator]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def timed(fn, repeat: int) -> List[float]:
+    latencies = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        fn(i)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return latencies
+
+
+def run(args) -> Dict[str, Dict[str, Dict[str, float]]]:
+    from tools.RAG_tool import VectorStore
+
+    variants = [(backend, "float32") for backend in args.backends.split(",") if backend.strip()]
+    if ("numpy", "float32") not in variants:
+        variants.append(("numpy", "float32"))  # exact reference for overlap@k
+    workdir = Path(tempfile.mkdtemp(prefix="filtered_bench_"))
+    try:
+        matrix = build_stores(workdir, args.replicas, args.jitter, args.seed, variants=variants)
+        stores = {backend: VectorStore(collection_name=COLLECTION, persist_directory=str(workdir / f"{backend}-{dtype}"),
+                                       backend=backend) for backend, dtype in variants}
+        reference = stores["numpy"]
+        filters = make_filters(reference)
+        documents = reference.collection.get(include=["documents"])["documents"]
+        texts = make_queries(documents, args.queries, 8, args.seed)
+
+        rng = np.random.default_rng(args.seed)
+        picks = matrix[rng.integers(0, len(matrix), args.queries)]
+        vectors = picks + rng.normal(0, args.jitter, picks.shape).astype(np.float32)
+
+        exact = {label: [reference.query(v[None, :], args.k, **f)["ids"][0] for v in vectors]
+                 for label, f in filters.items()}
+        results: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for backend, store in stores.items():
+            if backend not in args.backends.split(","):
+                continue
+            store.sparse_index  # load the BM25 index outside the timed region
+            store.query(vectors[:1], args.k)  # warm-up
+            results[backend] = {}
+            for label, f in filters.items():
+                t0 = time.perf_counter()
+                store.query(vectors[:1], args.k, **f)
+                first_ms = (time.perf_counter() - t0) * 1000
+                selectivity = len(store.matching_ids(**f)) / len(matrix) if f else 1.0
+                found = []
+                dense = timed(lambda i: found.append(store.query(vectors[i][None, :], args.k, **f)), len(vectors))
+                bm25 = timed(lambda i: store.sparse_query([texts[i % len(texts)]], args.k, **f), len(vectors))
+                for result in found:
+                    for metadata, document in zip(result["metadatas"][0], result["documents"][0]):
+                        if not passes(metadata, document, f.get("where"), f.get("where_document")):
+                            raise AssertionError(f"{backend} returned a chunk outside the filter '{label}'")
+                overlap = sum(len(set(r["ids"][0]) & set(e)) for r, e in zip(found, exact[label]))
+                expected = sum(len(e) for e in exact[label])
+                results[backend][label] = {
+                    "selectivity": selectivity,
+                    "first_ms": first_ms,
+                    "dense_ms_p50": statistics.median(dense),
+                    "dense_ms_p95": percentile(dense, 0.95),
+                    "bm25_ms_p50": statistics.median(bm25),
+                    "overlap": overlap / expected if expected else 1.0,
+                }
+            unfiltered = results[backend]["none"]["dense_ms_p50"]
+            for r in results[backend].values():
+                r["ratio"] = r["dense_ms_p50"] / unfiltered
+        return {"rows": len(matrix), "results": results}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="chroma,numpy", help="comma-separated: chroma, numpy")
+    parser.add_argument("--replicas", type=int, default=1, help="copies of the corpus to store (jittered)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="noise added to replicated / query vectors")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = parser.parse_args()
+
+    report = run(args)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['rows']} chunks, {args.queries} queries, k={args.k}")
+    print(f"{'':<24}{'selectivity':>12}{'first':>8}{'dense p50':>11}{'dense p95':>11}{'ratio':>7}{'bm25 p50':>10}"
+          f"{f'overlap@{args.k}':>12}")
+    for backend, rows in report["results"].items():
+        for label, r in rows.items():
+            print(f"{backend + ' ' + label:<24}{r['selectivity']:>12.3f}{r['first_ms']:>8.1f}{r['dense_ms_p50']:>11.2f}"
+                  f"{r['dense_ms_p95']:>11.2f}{r['ratio']:>7.2f}{r['bm25_ms_p50']:>10.2f}{r['overlap']:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Recall versus latency of Chroma HNSW settings against exact search.
+
+The stored chunk embeddings are loaded from the vector store and indexed
+into a throwaway collection for every (M, ef_construction, ef_search)
+combination. Queries are embedded spans of random chunks. Ground truth is
+exact brute-force cosine top-k over the same vectors with NumPy, whose
+latency is reported as the baseline.
+
+Usage:
+    python -m benchmarks.hnsw_recall
+    python -m benchmarks.hnsw_recall --m 8,16,32 --ef-construction 100,200 --ef-search 10,50,100,200 --k 10
+"""
+
+import argparse
+import json
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from tools.RAG_tool import DEFAULT_MODEL_NAME, get_embedding_manager, get_vector_store, normalize_rows
+from tools.hnsw_config import HNSWConfig
+
+
+def int_list(text: str) -> List[int]:
+    return [int(item) for item in text.split(",") if item.strip()]
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def load_corpus(limit: int):
+    """Ids, unit-length embeddings and documents of the stored chunks"""
+    collection = get_vector_store().collection
+    total = min(collection.count(), limit) if limit else collection.count()
+    if total == 0:
+        raise SystemExit("The collection is empty; ingest the PDFs first (e.g. start the RAG agent once).")
+    ids, vectors, documents = [], [], []
+    for offset in range(0, total, 5000):
+        page = collection.get(limit=min(5000, total - offset), offset=offset, include=["embeddings", "documents"])
+        ids.extend(page["ids"])
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        documents.extend(page["documents"])
+    return ids, normalize_rows(np.vstack(vectors)), documents
+
+
+def make_queries(documents: List[str], n_queries: int, span_words: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    queries = []
+    for index in rng.sample(range(len(documents)), len(documents)):
+        words = (documents[index] or "").split()
+        if len(words) >= span_words * 2:
+            start = rng.randrange(0, len(words) - span_words)
+            queries.append(" ".join(words[start:start + span_words]))
+        if len(queries) == n_queries:
+            break
+    return queries
+
+
+def run(args) -> Dict[str, Dict[str, float]]:
+    import chromadb
+
+    ids, matrix, documents = load_corpus(args.limit)
+    queries = make_queries(documents, args.queries, args.span_words, args.seed)
+    query_vectors = get_embedding_manager(args.embedding_model).generate_embeddings(queries)
+    print(f"{len(ids)} vectors (dim {matrix.shape[1]}), {len(queries)} queries, k={args.k}")
+
+    # Exact top-k: one matrix product per query
+    truth, exact_ms = [], []
+    for vector in query_vectors:
+        t0 = time.perf_counter()
+        scores = matrix @ vector
+        top = np.argpartition(-scores, args.k - 1)[:args.k]
+        top = top[np.argsort(-scores[top])]
+        exact_ms.append((time.perf_counter() - t0) * 1000)
+        truth.append({ids[i] for i in top})
+
+    results = {"exact": {
+        "build_s": 0.0, "recall": 1.0,
+        "query_ms_p50": statistics.median(exact_ms), "query_ms_p95": percentile(exact_ms, 0.95),
+    }}
+
+    workdir = tempfile.mkdtemp(prefix="hnsw_bench_")
+    try:
+        client = chromadb.PersistentClient(path=workdir)
+        page_size = min(client.get_max_batch_size(), 5000)
+        for m in args.m:
+            for ef_construction in args.ef_construction:
+                for ef_search in args.ef_search:
+                    # One build per setting: Chroma applies a modified ef_search only when the index is next loaded
+                    config = HNSWConfig(max_neighbors=m, ef_construction=ef_construction, ef_search=ef_search)
+                    name = f"bench_m{m}_efc{ef_construction}_efs{ef_search}"
+                    collection = client.create_collection(name, configuration=config.to_configuration())
+                    t0 = time.perf_counter()
+                    for offset in range(0, len(ids), page_size):
+                        collection.add(ids=ids[offset:offset + page_size], embeddings=matrix[offset:offset + page_size])
+                    build_s = time.perf_counter() - t0
+
+                    collection.query(query_embeddings=query_vectors[:1], n_results=args.k, include=[])  # warm-up
+                    hits, latencies = 0, []
+                    for vector, relevant in zip(query_vectors, truth):
+                        t0 = time.perf_counter()
+                        found = collection.query(query_embeddings=vector[None, :], n_results=args.k, include=[])
+                        latencies.append((time.perf_counter() - t0) * 1000)
+                        hits += len(relevant.intersection(found["ids"][0]))
+                    results[f"M={m} efC={ef_construction} efS={ef_search}"] = {
+                        "build_s": build_s,
+                        "recall": hits / (args.k * len(query_vectors)),
+                        "query_ms_p50": statistics.median(latencies),
+                        "query_ms_p95": percentile(latencies, 0.95),
+                    }
+                    client.delete_collection(name)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--m", type=int_list, default=int_list("8,16,32"), help="comma-separated HNSW M values")
+    parser.add_argument("--ef-construction", type=int_list, default=int_list("100,200"))
+    parser.add_argument("--ef-search", type=int_list, default=int_list("10,50,100,200"))
+    parser.add_argument("--k", type=int, default=10, help="neighbours compared with exact search (recall@k)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=0, help="use at most this many stored vectors (0 = all)")
+    parser.add_argument("--embedding-model", default=DEFAULT_MODEL_NAME, help="model the collection was embedded with")
+    parser.add_argument("--span-words", type=int, default=12, help="words per generated query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = parser.parse_args()
+
+    results = run(args)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'':<26}{'build s':>9}{f'recall@{args.k}':>11}{'query p50':>11}{'query p95':>11}")
+    for label, r in results.items():
+        print(f"{label:<26}{r['build_s']:>9.2f}{r['recall']:>11.3f}{r['query_ms_p50']:>11.2f}{r['query_ms_p95']:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
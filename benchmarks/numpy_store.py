@@ -0,0 +1,163 @@
+"""
+Embedded NumPy vector store versus Chroma.
+
+The stored chunks (ids, embeddings, documents, metadata) are copied into a
+throwaway Chroma collection and into NumPy collections with float32 and
+float16 vectors. ``--replicas`` tiles the corpus with jittered copies to
+test larger stores. Each backend is then opened in a fresh interpreter that
+reports:
+  - load: seconds to import the backend and open the store, and to answer
+    the first query
+  - query latency p50 / p95 for single-vector top-k queries
+  - RSS once the queries have run
+  - overlap@k: share of the exact top-k ids each backend returns (NumPy
+    float32 is the exact reference)
+
+Queries are jittered copies of random stored vectors, so no embedding model
+is needed.
+
+Usage:
+    python -m benchmarks.numpy_store
+    python -m benchmarks.numpy_store --replicas 20 --queries 500 --k 10
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+from benchmarks.hnsw_recall import load_corpus, percentile
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+COLLECTION = "numpy_bench"
+# (backend, vector dtype) combinations compared
+VARIANTS = (("chroma", "float32"), ("numpy", "float32"), ("numpy", "float16"))
+
+# Executed in a child interpreter so load time and RSS belong to one backend.
+PROBE = r"""
+import json, statistics, sys, time
+t0 = time.perf_counter()
+import numpy as np
+from tools.RAG_tool import VectorStore
+
+backend, directory, queries_path, k = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+store = VectorStore(collection_name="numpy_bench", persist_directory=directory, backend=backend)
+queries = np.load(queries_path)
+store.query(queries[:1], k)
+load_s = time.perf_counter() - t0
+
+latencies, ids = [], []
+for vector in queries:
+    t1 = time.perf_counter()
+    result = store.query(vector[None, :], k)
+    latencies.append((time.perf_counter() - t1) * 1000)
+    ids.append(result["ids"][0])
+print("__RESULT__" + json.dumps({"load_s": load_s, "latencies_ms": latencies, "rss_mb": rss_mb(), "ids": ids}))
+"""
+
+
+def build_stores(workdir: Path, replicas: int, jitter: float, seed: int, variants=VARIANTS) -> np.ndarray:
+    """Write the (tiled) corpus into ``workdir/<backend>-<dtype>`` for every variant; returns the stored matrix"""
+    from tools.RAG_tool import VectorStore, normalize_rows
+
+    ids, matrix, documents = load_corpus(0)
+    metadatas = get_metadatas(ids)
+    rng = np.random.default_rng(seed)
+    copies = [matrix]
+    for _ in range(replicas - 1):
+        copies.append(normalize_rows(matrix + rng.normal(0, jitter, matrix.shape).astype(np.float32)))
+    all_ids = [f"{doc_id}#{r}" for r in range(replicas) for doc_id in ids]
+    stacked = np.vstack(copies)
+
+    for backend, dtype in variants:
+        os.environ["AQUAINFO_VECTOR_DTYPE"] = dtype
+        store = VectorStore(collection_name=COLLECTION, persist_directory=str(workdir / f"{backend}-{dtype}"),
+                            backend=backend)
+        store.bulk_upsert(all_ids, stacked, documents=documents * replicas, metadatas=metadatas * replicas)
+    os.environ.pop("AQUAINFO_VECTOR_DTYPE", None)
+    return stacked
+
+
+def get_metadatas(ids):
+    from tools.RAG_tool import get_vector_store
+
+    found = {}
+    for start in range(0, len(ids), 5000):
+        found.update(get_vector_store().get_documents(ids[start:start + 5000]))
+    return [found[doc_id][1] for doc_id in ids]
+
+
+def run_backend(backend: str, directory: Path, queries_path: Path, k: int) -> Dict:
+    env = dict(os.environ, PYTHONPATH=str(PROJECT_ROOT))
+    proc = subprocess.run([sys.executable, "-c", PROBE, backend, str(directory), str(queries_path), str(k)],
+                          cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Probe failed for {backend}:\n{proc.stderr[-2000:]}")
+    line = next(l for l in proc.stdout.splitlines() if l.startswith("__RESULT__"))
+    return json.loads(line[len("__RESULT__"):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replicas", type=int, default=1, help="copies of the corpus to store (jittered)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="noise added to replicated / query vectors")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="numpy_store_bench_"))
+    try:
+        matrix = build_stores(workdir, args.replicas, args.jitter, args.seed)
+        rng = np.random.default_rng(args.seed + 1)
+        picks = matrix[rng.integers(0, len(matrix), args.queries)]
+        queries = picks + rng.normal(0, args.jitter, picks.shape).astype(np.float32)
+        queries_path = workdir / "queries.npy"
+        np.save(queries_path, queries)
+
+        raw = {}
+        for backend, dtype in VARIANTS:
+            raw[f"{backend} {dtype}"] = run_backend(backend, workdir / f"{backend}-{dtype}", queries_path, args.k)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    exact = raw["numpy float32"]["ids"]
+    results = {}
+    for label, r in raw.items():
+        overlap = sum(len(set(a) & set(b)) for a, b in zip(r["ids"], exact)) / (args.k * len(exact))
+        results[label] = {
+            "load_s": r["load_s"],
+            "query_ms_p50": percentile(r["latencies_ms"], 0.5),
+            "query_ms_p95": percentile(r["latencies_ms"], 0.95),
+            "rss_mb": r["rss_mb"],
+            "overlap": overlap,
+        }
+
+    if args.json:
+        print(json.dumps({"rows": len(matrix), "dim": matrix.shape[1], "results": results}, indent=2))
+        return
+
+    print(f"{len(matrix)} vectors (dim {matrix.shape[1]}), {args.queries} queries, k={args.k}")
+    print(f"{'':<16}{'load s':>8}{'query p50':>11}{'query p95':>11}{'RSS MB':>9}{f'overlap@{args.k}':>12}")
+    for label, r in results.items():
+        print(f"{label:<16}{r['load_s']:>8.2f}{r['query_ms_p50']:>11.2f}{r['query_ms_p95']:>11.2f}"
+              f"{r['rss_mb']:>9.0f}{r['overlap']:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Recall@k versus added latency for cross-encoder re-ranking.
+
+Queries are generated from the ingested corpus itself: a span of words is cut
+from a random chunk and that chunk is the single relevant answer. For each
+latency budget the benchmark retrieves the candidate set, re-ranks it and
+reports recall@k next to the milliseconds the re-rank stage added on top of
+plain top-k retrieval.
+
+Usage:
+    python -m benchmarks.rerank
+    python -m benchmarks.rerank --queries 200 --candidates 50 --budgets none,100,50,20 --mode hybrid
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+from tools.RAG_tool import DEFAULT_MODEL_NAME, RETRIEVAL_MODES, get_reranker, get_retriever
+from tools.reranker import DEFAULT_RERANKER_MODEL
+
+
+def make_queries(retriever, n_queries: int, span_words: int, seed: int) -> List[Tuple[str, str]]:
+    """(query, relevant chunk id) pairs cut from random chunks of the collection"""
+    collection = retriever.vector_store.collection
+    total = collection.count()
+    if total == 0:
+        raise SystemExit("The collection is empty; ingest the PDFs first (e.g. start the RAG agent once).")
+
+    rng = random.Random(seed)
+    queries = []
+    for offset in rng.sample(range(total), min(n_queries * 3, total)):
+        page = collection.get(limit=1, offset=offset, include=["documents"])
+        words = (page["documents"][0] or "").split()
+        if len(words) < span_words * 2:
+            continue
+        start = rng.randrange(0, len(words) - span_words)
+        queries.append((" ".join(words[start:start + span_words]), page["ids"][0]))
+        if len(queries) == n_queries:
+            break
+    return queries
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run(args) -> Dict[str, Dict[str, float]]:
+    retriever = get_retriever(args.embedding_model)
+    reranker = get_reranker(args.model)
+    queries = make_queries(retriever, args.queries, args.span_words, args.seed)
+    print(f"{len(queries)} queries, k={args.k}, {args.candidates} candidates, mode={args.mode}")
+
+    results = {}
+
+    # Baseline: plain top-k retrieval
+    hits, latencies = 0, []
+    for query, relevant in queries:
+        t0 = time.perf_counter()
+        docs = retriever.retrieve(query, top_k=args.k, mode=args.mode)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        hits += any(doc['id'] == relevant for doc in docs)
+    baseline_ms = statistics.median(latencies)
+    results["no rerank"] = {
+        "recall": hits / len(queries), "retrieve_ms": baseline_ms, "added_ms_p50": 0.0, "added_ms_p95": 0.0,
+        "scored": 0.0,
+    }
+
+    # Candidate recall: the ceiling any re-ranker can reach
+    candidate_sets = []
+    for query, relevant in queries:
+        t0 = time.perf_counter()
+        candidates = retriever.retrieve(query, top_k=args.candidates, mode=args.mode)
+        candidate_sets.append((candidates, (time.perf_counter() - t0) * 1000))
+    ceiling = sum(any(doc['id'] == relevant for doc in c) for (c, _), (_, relevant) in zip(candidate_sets, queries))
+    print(f"recall@{args.candidates} of the candidate set (upper bound): {ceiling / len(queries):.3f}")
+
+    for budget in args.budgets:
+        label = "rerank" if budget is None else f"rerank {budget:g}ms"
+        hits, added, scored = 0, [], []
+        for (query, relevant), (candidates, retrieve_ms) in zip(queries, candidate_sets):
+            t0 = time.perf_counter()
+            docs = reranker.rerank(query, candidates, top_k=args.k, latency_budget_ms=budget)
+            rerank_ms = (time.perf_counter() - t0) * 1000
+            # Added latency = wider retrieval + re-ranking - plain top-k retrieval
+            added.append(retrieve_ms + rerank_ms - baseline_ms)
+            scored.append(reranker.last_scored)
+            hits += any(doc['id'] == relevant for doc in docs)
+        results[label] = {
+            "recall": hits / len(queries),
+            "retrieve_ms": statistics.median(ms for _, ms in candidate_sets),
+            "added_ms_p50": statistics.median(added),
+            "added_ms_p95": percentile(added, 0.95),
+            "scored": statistics.mean(scored),
+        }
+    return results
+
+
+def parse_budgets(text: str):
+    return [None if item.strip().lower() == "none" else float(item) for item in text.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=100, help="number of generated queries")
+    parser.add_argument("--k", type=int, default=5, help="chunks that go into the prompt")
+    parser.add_argument("--candidates", type=int, default=50, help="candidates retrieved for re-ranking")
+    parser.add_argument("--budgets", type=parse_budgets, default=parse_budgets("none,100,50,20"),
+                        help="comma-separated latency budgets in ms ('none' = unlimited)")
+    parser.add_argument("--mode", choices=RETRIEVAL_MODES, default="hybrid", help="first-stage retrieval mode")
+    parser.add_argument("--model", default=DEFAULT_RERANKER_MODEL, help="cross-encoder model")
+    parser.add_argument("--embedding-model", default=DEFAULT_MODEL_NAME, help="model the collection was embedded with")
+    parser.add_argument("--span-words", type=int, default=12, help="words per generated query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = parser.parse_args()
+
+    results = run(args)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'':<16}{f'recall@{args.k}':>10}{'retrieve ms':>13}{'added p50':>11}{'added p95':>11}{'scored':>8}")
+    for label, r in results.items():
+        print(f"{label:<16}{r['recall']:>10.3f}{r['retrieve_ms']:>13.1f}"
+              f"{r['added_ms_p50']:>11.1f}{r['added_ms_p95']:>11.1f}{r['scored']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
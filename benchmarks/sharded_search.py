@@ -0,0 +1,168 @@
+"""
+Sharded fan-out search versus one collection.
+
+The stored chunks are copied ``--replicas`` times (jittered vectors, each
+copy under its own source file names) into one unsharded collection and into
+a ShardedVectorStore with ``--shards`` hash buckets. Each configuration is
+opened in a fresh interpreter, which reports:
+  - load: seconds to open the store(s) and answer the first query
+  - query latency p50 / p95 for single-vector top-k queries
+  - RSS once the queries have run
+  - overlap@k with the unsharded top-k (searched shards only hold part of
+    the corpus when not all are active, so overlap drops accordingly)
+
+Configurations: the single collection, every shard active, half of the
+shards, and one shard.
+
+Usage:
+    python -m benchmarks.sharded_search
+    python -m benchmarks.sharded_search --replicas 10 --shards 8 --backend numpy
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.hnsw_recall import load_corpus, percentile
+from benchmarks.numpy_store import get_metadatas
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+COLLECTION = "shard_bench"
+
+# Executed in a child interpreter so load time and RSS belong to one configuration.
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import numpy as np
+from tools.RAG_tool import VectorStore
+from tools.sharded_store import ShardedVectorStore
+
+directory, backend, shards, active, queries_path, k = sys.argv[1:7]
+shards, k = int(shards), int(k)
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+if active == "single":
+    store = VectorStore(collection_name="shard_bench", persist_directory=directory + "/single", backend=backend)
+else:
+    store = ShardedVectorStore(collection_name="shard_bench", persist_directory=directory + "/sharded", strategy="hash",
+                               num_shards=shards, backend=backend, active_shards=active.split(",") if active else None)
+queries = np.load(queries_path)
+store.query(queries[:1], k)
+load_s = time.perf_counter() - t0
+
+latencies, ids = [], []
+for vector in queries:
+    t1 = time.perf_counter()
+    result = store.query(vector[None, :], k)
+    latencies.append((time.perf_counter() - t1) * 1000)
+    ids.append(result["ids"][0])
+print("__RESULT__" + json.dumps({"load_s": load_s, "latencies_ms": latencies, "rss_mb": rss_mb(), "ids": ids}))
+"""
+
+
+def build(workdir: Path, args) -> np.ndarray:
+    """Write the replicated corpus into the single and the sharded store; returns the stored matrix"""
+    from langchain_core.documents import Document
+    from tools.RAG_tool import VectorStore, normalize_rows
+    from tools.sharded_store import ShardedVectorStore
+
+    ids, matrix, texts = load_corpus(0)
+    metadatas = get_metadatas(ids)
+    rng = np.random.default_rng(args.seed)
+    documents, all_ids, copies = [], [], []
+    for r in range(args.replicas):
+        copies.append(matrix if r == 0 else
+                      normalize_rows(matrix + rng.normal(0, args.jitter, matrix.shape).astype(np.float32)))
+        for doc_id, text, metadata in zip(ids, texts, metadatas):
+            stem = Path(metadata.get("source_file", "doc")).stem
+            documents.append(Document(page_content=text or "", metadata={**metadata, "source_file": f"{stem}_r{r}.pdf"}))
+            all_ids.append(f"{doc_id}#{r}")
+    stacked = np.vstack(copies)
+
+    VectorStore(collection_name=COLLECTION, persist_directory=str(workdir / "single"),
+                backend=args.backend).add_documents(documents, stacked, ids=all_ids)
+    sharded = ShardedVectorStore(collection_name=COLLECTION, persist_directory=str(workdir / "sharded"),
+                                 strategy="hash", num_shards=args.shards, backend=args.backend)
+    sharded.add_documents(documents, stacked, ids=all_ids)
+    sharded.close()
+    return stacked
+
+
+def run_config(workdir: Path, args, active: str, queries_path: Path) -> Dict:
+    env = dict(os.environ, PYTHONPATH=str(PROJECT_ROOT))
+    proc = subprocess.run([sys.executable, "-c", PROBE, str(workdir), args.backend, str(args.shards), active,
+                           str(queries_path), str(args.k)], cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Probe failed for '{active}':\n{proc.stderr[-2000:]}")
+    line = next(l for l in proc.stdout.splitlines() if l.startswith("__RESULT__"))
+    return json.loads(line[len("__RESULT__"):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replicas", type=int, default=4, help="copies of the corpus to store (jittered)")
+    parser.add_argument("--shards", type=int, default=4, help="hash buckets")
+    parser.add_argument("--backend", default="chroma", help="VectorStore backend: chroma or numpy")
+    parser.add_argument("--jitter", type=float, default=0.02, help="noise added to replicated / query vectors")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="shard_bench_"))
+    try:
+        matrix = build(workdir, args)
+        with open(workdir / "sharded" / f"{COLLECTION}.shards.json", encoding="utf-8") as f:
+            names: List[str] = sorted(json.load(f)["shards"])
+        rng = np.random.default_rng(args.seed + 1)
+        picks = matrix[rng.integers(0, len(matrix), args.queries)]
+        np.save(workdir / "queries.npy", picks + rng.normal(0, args.jitter, picks.shape).astype(np.float32))
+
+        # "" opens every shard; a comma-separated list makes only those shards active
+        configs = {"single collection": "single", f"all {len(names)} shards": ""}
+        if len(names) >= 4:
+            configs[f"{len(names) // 2} shards active"] = ",".join(names[:len(names) // 2])
+        configs["1 shard active"] = names[0]
+        raw = {label: run_config(workdir, args, active, workdir / "queries.npy") for label, active in configs.items()}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    reference = raw["single collection"]["ids"]
+    results = {}
+    for label, r in raw.items():
+        overlap = sum(len(set(a) & set(b)) for a, b in zip(r["ids"], reference)) / (args.k * len(reference))
+        results[label] = {
+            "load_s": r["load_s"],
+            "query_ms_p50": percentile(r["latencies_ms"], 0.5),
+            "query_ms_p95": percentile(r["latencies_ms"], 0.95),
+            "rss_mb": r["rss_mb"],
+            "overlap": overlap,
+        }
+
+    if args.json:
+        print(json.dumps({"rows": len(matrix), "backend": args.backend, "results": results}, indent=2))
+        return
+
+    print(f"{len(matrix)} chunks ({args.backend}), {args.queries} queries, k={args.k}")
+    print(f"{'':<20}{'load s':>8}{'query p50':>11}{'query p95':>11}{'RSS MB':>9}{f'overlap@{args.k}':>12}")
+    for label, r in results.items():
+        print(f"{label:<20}{r['load_s']:>8.2f}{r['query_ms_p50']:>11.2f}{r['query_ms_p95']:>11.2f}"
+              f"{r['rss_mb']:>9.0f}{r['overlap']:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
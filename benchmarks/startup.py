@@ -0,0 +1,124 @@
+"""
+Cold-start benchmark for tools/RAG_tool.py.
+
+Each measurement runs in a fresh interpreter and records:
+  - import time and RSS right after ``import tools.RAG_tool``
+  - time and RSS until a retriever is ready to serve its first query
+
+Usage:
+    python -m benchmarks.startup                 # current working tree
+    python -m benchmarks.startup --rev baseline  # also measure a git revision (e.g. before the lazy registry)
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Executed in a child interpreter so every run is a real cold start.
+PROBE = r"""
+import json, os, sys, time
+
+def rss_mb():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+t0 = time.perf_counter()
+import tools.RAG_tool as rag_tool
+t_import = time.perf_counter() - t0
+rss_import = rss_mb()
+
+if hasattr(rag_tool, "get_retriever"):
+    rag_tool.get_retriever()
+else:
+    rag_tool.rag_retriever
+t_ready = time.perf_counter() - t0
+rss_ready = rss_mb()
+
+print("__RESULT__" + json.dumps({
+    "import_s": t_import,
+    "import_rss_mb": rss_import,
+    "ready_s": t_ready,
+    "ready_rss_mb": rss_ready,
+}))
+"""
+
+
+def _run_probe(root: Path) -> dict:
+    env = dict(os.environ, PYTHONPATH=str(root))
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=root, env=env, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"Probe failed in {root}:\n{proc.stderr[-2000:]}")
+    line = next(l for l in proc.stdout.splitlines() if l.startswith("__RESULT__"))
+    result = json.loads(line[len("__RESULT__"):])
+    result["process_wall_s"] = wall
+    return result
+
+
+def measure(root: Path, repeat: int) -> dict:
+    runs = [_run_probe(root) for _ in range(repeat)]
+    return {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+
+def measure_revision(rev: str, repeat: int) -> dict:
+    """Measure a git revision in a temporary worktree so the working tree is untouched."""
+    with tempfile.TemporaryDirectory() as tmp:
+        worktree = Path(tmp) / "wt"
+        subprocess.run(["git", "worktree", "add", "--detach", str(worktree), rev],
+                       cwd=PROJECT_ROOT, check=True, capture_output=True)
+        try:
+            return measure(worktree, repeat)
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", str(worktree)],
+                           cwd=PROJECT_ROOT, capture_output=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rev", help="git revision to compare against (measured in a temporary worktree)")
+    parser.add_argument("--repeat", type=int, default=3, help="cold starts per measurement (median is reported)")
+    parser.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = parser.parse_args()
+
+    results = {}
+    if args.rev:
+        results[args.rev] = measure_revision(args.rev, args.repeat)
+    results["working tree"] = measure(PROJECT_ROOT, args.repeat)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'':<16}{'import s':>10}{'import MB':>11}{'ready s':>10}{'ready MB':>10}{'wall s':>9}")
+    for label, r in results.items():
+        print(f"{label:<16}{r['import_s']:>10.2f}{r['import_rss_mb']:>11.0f}"
+              f"{r['ready_s']:>10.2f}{r['ready_rss_mb']:>10.0f}{r['process_wall_s']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,482 @@
+"""
+Offline benchmark suite for the whole retrieval and agent stack.
+
+Runs without API keys or network access: every Mistral call is answered by
+benchmarks.fakes.RecordedLLM and web searches by the SerpAPI fixture
+backend, each with a configurable latency. Stages:
+  - ingest: PDFs parsed, split, embedded and written into a throwaway store
+    (pages/s, chunks/s, vectors/s, embedding tokens/s)
+  - embedding: bulk texts/s and tokens/s, single-query latency
+  - retrieval: dense, sparse and hybrid latency p50 / p95 / p99 with
+    recall@k and MRR over a labeled query set
+  - e2e: CoordinatorAgent.run latency per stage (route, intent, rag, web,
+    reasoning, summarize, total) and LLM / web calls per query
+
+The labeled queries are hand-written paraphrased questions in
+benchmarks/data/labeled_queries.json, each labeled with the PDF pages that
+answer it; a page is found when any of its chunks is retrieved, so the
+labels survive re-chunking. The questions share little wording with the
+text, so recall@k and MRR compare dense and sparse retrieval fairly.
+``--labels`` swaps in another set (pages or chunk ids).
+
+``--span-queries N`` additionally scores N word spans of random stored
+chunks, labeled with every chunk containing the span, under
+"retrieval_spans". Spans are exact lexical matches and favour sparse and
+hybrid retrieval; use them as a sanity check, not to compare modes.
+``--save-labels`` freezes the generated spans for reuse with ``--labels``.
+Embedding and retrieval bypass the embedding cache.
+
+Results carry the git commit and environment; ``--output`` writes them as
+JSON and ``--compare`` diffs them against an earlier file, flagging metrics
+that got worse by more than ``--threshold``.
+
+Usage:
+    python -m benchmarks.suite
+    python -m benchmarks.suite --stages retrieval,e2e --output bench.json
+    python -m benchmarks.suite --compare bench.json --fail-on-regression
+    python -m benchmarks.suite --stages retrieval --span-queries 200
+    python -m benchmarks.suite --llm-latency-ms recorded --web-latency-ms 400 --stages e2e
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+from benchmarks.fakes import DEFAULT_RECORDING_PATH, RecordedLLM, offline_agents
+from benchmarks.hnsw_recall import percentile
+from tools.RAG_tool import DEFAULT_MODEL_NAME, RETRIEVAL_MODES
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_LABELS_PATH = Path(__file__).resolve().parent / "data" / "labeled_queries.json"
+STAGES = ("ingest", "embedding", "retrieval", "e2e")
+# CoordinatorAgent.last_timings keys in pipeline order
+E2E_STAGES = ("cache", "route", "intent", "rag", "web", "reasoning", "summarize", "total")
+
+# One query per route: RAG only, web only, both, and one the keyword rules leave to the classifier / LLM
+E2E_QUERIES = [
+    "what is the maximum acceptable concentration of nitrate in drinking water",
+    "latest news from water utilities this week",
+    "how do current pfas regulations compare with the guidelines in our documents",
+    "is it fine to use what comes out of my kitchen tap for baby formula",
+]
+
+
+def latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    return {
+        "ms_p50": statistics.median(latencies_ms),
+        "ms_p95": percentile(latencies_ms, 0.95),
+        "ms_p99": percentile(latencies_ms, 0.99),
+    }
+
+
+def stored_chunks(store):
+    """Ids, documents and metadatas of every stored chunk"""
+    collection = store.collection
+    ids, documents, metadatas = [], [], []
+    total = collection.count()
+    for offset in range(0, total, 5000):
+        page = collection.get(limit=5000, offset=offset, include=["documents", "metadatas"])
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        metadatas.extend(meta or {} for meta in page["metadatas"])
+    return ids, documents, metadatas
+
+
+def load_labels(path, ids: List[str], metadatas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Labeled queries from a JSON file, each relevant passage resolved to the stored chunk ids it covers
+
+    Entries carry "relevant" (chunk ids, one passage each) and / or "relevant_pages" ({"source_file", "page"}
+    objects, pages 0-based as in the chunk metadata, all chunks of a page one passage). Queries whose
+    passages are not in the store are dropped.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    by_page: Dict[tuple, List[str]] = {}
+    for doc_id, metadata in zip(ids, metadatas):
+        by_page.setdefault((metadata.get("source_file"), metadata.get("page")), []).append(doc_id)
+
+    labels, missing = [], []
+    for entry in entries:
+        relevant = [[doc_id] for doc_id in entry.get("relevant", [])]
+        relevant.extend(by_page[key] for key in ((page["source_file"], page["page"])
+                                                 for page in entry.get("relevant_pages", [])) if key in by_page)
+        if relevant:
+            labels.append({"query": entry["query"], "relevant": relevant})
+        else:
+            missing.append(entry["query"])
+    if missing:
+        print(f"{len(missing)} labeled queries skipped, their pages are not in the store", file=sys.stderr)
+    if not labels:
+        raise SystemExit(f"None of the labeled queries in {path} match the stored documents.")
+    return labels
+
+
+def make_labels(ids: List[str], documents: List[str], n_queries: int, span_words: int, seed: int) -> List[Dict[str, Any]]:
+    """Word spans of random chunks, each labeled with every chunk containing it"""
+    rng = random.Random(seed)
+    labels = []
+    for index in rng.sample(range(len(documents)), len(documents)):
+        words = (documents[index] or "").split()
+        if len(words) < span_words * 2:
+            continue
+        start = rng.randrange(0, len(words) - span_words)
+        query = " ".join(words[start:start + span_words])
+        relevant = [doc_id for doc_id, document in zip(ids, documents) if query in " ".join((document or "").split())]
+        labels.append({"query": query, "relevant": relevant or [ids[index]]})
+        if len(labels) == n_queries:
+            break
+    return labels
+
+
+# ------------------ STAGES ------------------
+def bench_ingest(manager, args) -> Dict[str, Any]:
+    from tools.ingest_pipeline import IngestionPipeline
+    from tools.RAG_tool import VectorStore
+
+    pdfs = sorted(Path(args.pdf_dir).glob("**/*.pdf"))[:args.ingest_files or None]
+    if not pdfs:
+        raise SystemExit(f"No PDFs found in {args.pdf_dir}")
+
+    workdir = Path(tempfile.mkdtemp(prefix="suite_ingest_"))
+    try:
+        store = VectorStore(collection_name="suite_ingest", persist_directory=str(workdir))
+        pipeline = IngestionPipeline(manager, store, workers=args.ingest_workers)
+        stats = pipeline.run(pdfs, make_ids=lambda path, chunks: [
+            f"{path.name}:{chunk.metadata.get('page', 0)}:{chunk.metadata['start_index']}" for chunk in chunks
+        ])
+        return {
+            "files": stats.files,
+            "pages": stats.pages,
+            "chunks": stats.chunks,
+            "wall_s": stats.wall_s,
+            "pages_per_s": stats.pages_per_s,
+            "chunks_per_s": stats.chunks_per_s,
+            "vectors_per_s": stats.vectors_per_s,
+            "embed_tokens_per_s": stats.embed_tokens_per_s,
+            "end_to_end_chunks_per_s": stats.chunks / stats.wall_s if stats.wall_s else 0.0,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_embedding(manager, documents: List[str], labels: List[Dict[str, Any]], args) -> Dict[str, Any]:
+    texts = [text for text in documents if text][:args.embed_texts]
+    queries = [label["query"] for label in labels]
+    manager.generate_embeddings(texts[:8])  # warm-up
+
+    t0 = time.perf_counter()
+    manager.generate_embeddings(texts)
+    bulk_s = time.perf_counter() - t0
+    tokens = manager.last_encode_stats.tokens
+
+    latencies = []
+    for query in queries:
+        t0 = time.perf_counter()
+        manager.generate_embeddings([query])
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return {
+        "texts": len(texts),
+        "texts_per_s": len(texts) / bulk_s,
+        "tokens_per_s": tokens / bulk_s,
+        **{f"query_{key}": value for key, value in latency_summary(latencies).items()},
+    }
+
+
+def bench_retrieval(store, manager, labels: List[Dict[str, Any]], args) -> Dict[str, Any]:
+    from tools.RAG_tool import RAGRetriever
+
+    retriever = RAGRetriever(store, manager)
+    store.sparse_index  # load the BM25 index outside the timed region
+    results = {}
+    for mode in args.modes.split(","):
+        retriever.retrieve(labels[0]["query"], top_k=args.k, mode=mode)  # warm-up
+        latencies, recall, reciprocal_ranks = [], 0.0, 0.0
+        for label in labels:
+            t0 = time.perf_counter()
+            found = retriever.retrieve(label["query"], top_k=args.k, mode=mode)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            found_ids = [doc["id"] for doc in found]
+            passages = [set(passage) for passage in label["relevant"]]
+            recall += sum(1 for passage in passages if passage.intersection(found_ids)) / len(passages)
+            rank = next((i for i, doc_id in enumerate(found_ids, start=1)
+                         if any(doc_id in passage for passage in passages)), None)
+            reciprocal_ranks += 1.0 / rank if rank else 0.0
+        results[mode] = {
+            **latency_summary(latencies),
+            f"recall@{args.k}": recall / len(labels),
+            "mrr": reciprocal_ranks / len(labels),
+        }
+    return results
+
+
+def bench_e2e(args) -> Dict[str, Any]:
+    from tools.web_search_tool import DEFAULT_FIXTURE_PATH, FixtureBackend
+
+    latency_ms = None if args.llm_latency_ms == "recorded" else float(args.llm_latency_ms)
+    llm = RecordedLLM(args.recording, latency_ms=latency_ms)
+    web = FixtureBackend(args.web_fixtures or DEFAULT_FIXTURE_PATH, latency_s=args.web_latency_ms / 1000)
+
+    with offline_agents(llm, web):
+        from agents.Coordinator_agent import CoordinatorAgent
+
+        t0 = time.perf_counter()
+        # Every query must run the full pipeline, so answers are not served from the cache
+        coordinator = CoordinatorAgent(answer_cache=False)
+        init_s = time.perf_counter() - t0
+        coordinator.run(E2E_QUERIES[0])  # warm-up
+        llm.reset_calls()
+        web.calls = 0
+
+        stages: Dict[str, List[float]] = {}
+        for i in range(args.e2e_runs):
+            coordinator.run(E2E_QUERIES[i % len(E2E_QUERIES)])
+            for stage, seconds in coordinator.last_timings.items():
+                stages.setdefault(stage, []).append(seconds * 1000)
+
+    return {
+        "runs": args.e2e_runs,
+        "init_s": init_s,
+        "llm_calls_per_query": sum(llm.calls.values()) / args.e2e_runs,
+        "web_calls_per_query": web.calls / args.e2e_runs,
+        "stages": {stage: {"runs": len(stages[stage]), **latency_summary(stages[stage])}
+                   for stage in sorted(stages, key=lambda s: E2E_STAGES.index(s) if s in E2E_STAGES else len(E2E_STAGES))},
+    }
+
+
+# ------------------ REPORTING ------------------
+def environment() -> Dict[str, Any]:
+    def git(*cmd):
+        proc = subprocess.run(["git", *cmd], cwd=PROJECT_ROOT, capture_output=True, text=True)
+        return proc.stdout.strip() if proc.returncode == 0 else None
+
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}/"))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = float(value)
+    return flat
+
+
+def direction(metric: str) -> int:
+    """+1 if higher is better, -1 if lower is better, 0 for counts and settings"""
+    leaf = metric.rsplit("/", 1)[-1]
+    if leaf.endswith("_per_s") or leaf.startswith(("recall", "mrr")):
+        return 1
+    if leaf.startswith("ms_") or "_ms_" in leaf or leaf.endswith("_s"):
+        return -1
+    return 0
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float,
+            min_delta_ms: float = 0.0) -> List[Dict[str, Any]]:
+    """
+    Metrics present in both result sets, with their relative change and whether it is a regression
+
+    Args:
+        current: Results of this run
+        baseline: Earlier results
+        threshold: Relative change in the wrong direction counted as a regression
+        min_delta_ms: Latencies must also have grown by this many milliseconds (ignores timer noise)
+    """
+    now, before = flatten(current["results"]), flatten(baseline["results"])
+    rows = []
+    for metric in sorted(now.keys() & before.keys()):
+        sign = direction(metric)
+        if not sign:
+            continue
+        old, new = before[metric], now[metric]
+        change = (new - old) / abs(old) if old else 0.0
+        regression = sign * change < -threshold
+        if "ms" in metric.rsplit("/", 1)[-1]:
+            regression = regression and new - old >= min_delta_ms
+        rows.append({"metric": metric, "baseline": old, "current": new, "change": change, "regression": regression})
+    return rows
+
+
+def setting_differences(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Settings that differ between two result sets; their metrics are not comparable"""
+    before = baseline.get("settings", {})
+    return [f"{key}: {before.get(key)} -> {value}" for key, value in current["settings"].items()
+            if key not in ("stages", "labels", "span_labels") and before.get(key) != value]
+
+
+def print_report(report: Dict[str, Any]):
+    env, results = report["environment"], report["results"]
+    print(f"commit {env['commit'] or '?'}{' (dirty)' if env['dirty'] else ''}, {env['cpus']} CPUs, "
+          f"model {report['settings']['model']}")
+    if "ingest" in results:
+        r = results["ingest"]
+        print(f"\ningest: {r['files']} PDFs, {r['pages']} pages, {r['chunks']} chunks in {r['wall_s']:.1f}s")
+        print(f"  {r['pages_per_s']:.1f} pages/s  {r['chunks_per_s']:.1f} chunks/s  {r['vectors_per_s']:.1f} vectors/s  "
+              f"{r['embed_tokens_per_s']:.0f} tokens/s")
+    if "embedding" in results:
+        r = results["embedding"]
+        print(f"\nembedding: {r['texts_per_s']:.1f} texts/s, {r['tokens_per_s']:.0f} tokens/s, "
+              f"query p50 {r['query_ms_p50']:.2f} ms / p95 {r['query_ms_p95']:.2f} ms")
+    k = report["settings"]["k"]
+    for key, title in (("retrieval", f"{report['settings']['labels']} labeled queries, {report['settings']['label_set']}"),
+                       ("retrieval_spans", f"{report['settings']['span_labels']} word-span queries, lexical")):
+        if key not in results:
+            continue
+        print(f"\n{key} ({title})")
+        print(f"{'':<10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{f'recall@{k}':>11}{'MRR':>7}")
+        for mode, r in results[key].items():
+            print(f"{mode:<10}{r['ms_p50']:>9.2f}{r['ms_p95']:>9.2f}{r['ms_p99']:>9.2f}{r[f'recall@{k}']:>11.3f}"
+                  f"{r['mrr']:>7.3f}")
+    if "e2e" in results:
+        r = results["e2e"]
+        settings = report["settings"]
+        print(f"\nCoordinatorAgent.run: {r['runs']} runs, LLM latency {settings['llm_latency_ms']} ms, web latency "
+              f"{settings['web_latency_ms']} ms, {r['llm_calls_per_query']:.1f} LLM / {r['web_calls_per_query']:.1f} web calls per query")
+        print(f"{'stage':<12}{'runs':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for stage, s in r["stages"].items():
+            print(f"{stage:<12}{s['runs']:>6}{s['ms_p50']:>10.1f}{s['ms_p95']:>10.1f}{s['ms_p99']:>10.1f}")
+
+
+def print_comparison(rows: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float, differences: List[str]):
+    print(f"\nversus {baseline['environment'].get('commit') or '?'} (regression: worse by more than {threshold:.0%})")
+    if differences:
+        print(f"warning: settings differ ({'; '.join(differences)})")
+    print(f"{'metric':<40}{'baseline':>12}{'current':>12}{'change':>11}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['metric']:<40}{row['baseline']:>12.3f}{row['current']:>12.3f}{row['change']:>+11.1%}{flag}")
+
+
+def run(args) -> Dict[str, Any]:
+    from tools.RAG_tool import EmbeddingManager, get_vector_store
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise SystemExit(f"Unknown stages {sorted(unknown)}; expected some of {STAGES}")
+
+    results: Dict[str, Any] = {}
+    labels: List[Dict[str, Any]] = []
+    span_labels: List[Dict[str, Any]] = []
+    # No embedding cache: cached vectors would make embedding and retrieval look free
+    manager = EmbeddingManager(args.model, cache=None) if set(stages) - {"e2e"} else None
+
+    if "ingest" in stages:
+        results["ingest"] = bench_ingest(manager, args)
+
+    if "embedding" in stages or "retrieval" in stages:
+        store = get_vector_store(persist_directory=args.persist_directory)
+        ids, documents, metadatas = stored_chunks(store)
+        if not ids:
+            raise SystemExit("The collection is empty; ingest the PDFs first (e.g. start the RAG agent once).")
+        labels = load_labels(args.labels, ids, metadatas)
+        if args.span_queries:
+            generated = make_labels(ids, documents, args.span_queries, args.span_words, args.seed)
+            if args.save_labels:
+                with open(args.save_labels, "w", encoding="utf-8") as f:
+                    json.dump(generated, f, indent=1)
+            span_labels = [{"query": label["query"], "relevant": [[doc_id] for doc_id in label["relevant"]]}
+                           for label in generated]
+        if "embedding" in stages:
+            results["embedding"] = bench_embedding(manager, documents, labels + span_labels, args)
+        if "retrieval" in stages:
+            results["retrieval"] = bench_retrieval(store, manager, labels, args)
+            if span_labels:
+                results["retrieval_spans"] = bench_retrieval(store, manager, span_labels, args)
+
+    if "e2e" in stages:
+        results["e2e"] = bench_e2e(args)
+
+    return {
+        "environment": environment(),
+        "settings": {"model": args.model, "k": args.k, "labels": len(labels), "label_set": Path(args.labels).name,
+                     "span_labels": len(span_labels), "stages": stages,
+                     "vector_backend": os.getenv("AQUAINFO_VECTOR_BACKEND", "chroma"),
+                     "llm_latency_ms": args.llm_latency_ms, "web_latency_ms": args.web_latency_ms},
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated: {', '.join(STAGES)}")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME, help="embedding model for ingest / embedding / retrieval")
+    parser.add_argument("--persist-directory", help="vector store searched by the retrieval stage (default data/vector_store)")
+    parser.add_argument("--pdf-dir", default=str(PROJECT_ROOT / "data"), help="PDFs for the ingest stage")
+    parser.add_argument("--ingest-files", type=int, default=0, help="ingest only the first N PDFs (0 = all)")
+    parser.add_argument("--ingest-workers", type=int, default=None, help="PDF parser processes")
+    parser.add_argument("--embed-texts", type=int, default=512, help="stored chunks embedded for throughput")
+    parser.add_argument("--labels", default=str(DEFAULT_LABELS_PATH), help="labeled queries JSON")
+    parser.add_argument("--span-queries", type=int, default=0,
+                        help="also score N word-span queries of stored chunks (lexical, favours sparse)")
+    parser.add_argument("--span-words", type=int, default=8, help="words per span query")
+    parser.add_argument("--save-labels", help="write the generated span queries to this file")
+    parser.add_argument("--modes", default=",".join(RETRIEVAL_MODES), help="retrieval modes measured")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--e2e-runs", type=int, default=20, help="CoordinatorAgent.run calls (cycling E2E_QUERIES)")
+    parser.add_argument("--recording", default=str(DEFAULT_RECORDING_PATH), help="recorded LLM responses")
+    parser.add_argument("--llm-latency-ms", default="0",
+                        help="simulated latency per LLM call, or 'recorded' for each response's recorded latency")
+    parser.add_argument("--web-fixtures", help="SerpAPI-shaped fixtures (default data/fixtures/web_search.json)")
+    parser.add_argument("--web-latency-ms", type=float, default=0.0, help="simulated latency per web search")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change counted as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="latency regressions must also be at least this many ms")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 on any regression")
+    parser.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = parser.parse_args()
+
+    # The agents and the pipeline print progress; keep stdout for the results
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args)
+
+    rows, baseline, differences = [], None, []
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold, args.min_delta_ms)
+        differences = setting_differences(report, baseline)
+        report["comparison"] = {"baseline_commit": baseline["environment"].get("commit"),
+                                "setting_differences": differences, "rows": rows}
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+        if baseline is not None:
+            print_comparison(rows, baseline, args.threshold, differences)
+
+    if args.fail_on_regression and any(row["regression"] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,9 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from agents.Coordinator_agent import CoordinatorAgent
+from tools.tracing import configure_logging
+
+configure_logging()
 
 # ---------------- INIT COORDINATOR ----------------
 # Create ONE instance for whole session (important)
@@ -14,11 +17,10 @@ if "coordinator" not in st.session_state:
     st.session_state["coordinator"] = CoordinatorAgent()
 
 
-def ai_agent(query: str) -> str:
-    """ Agentic function that calls Coordinator Agent """
+def ai_agent_stream(query: str):
+    """ Streaming variant: yields the answer chunk by chunk as the summarizer produces it """
     coordinator = st.session_state["coordinator"]
-    result = coordinator.run(query)
-    return result
+    yield from coordinator.run_stream(query)
 
 
 # ---------------- PAGE CONFIG ----------------
@@ -47,12 +49,12 @@ if prompt:
     st.session_state["messages"].append({"role": "user", "content": prompt})
     st.chat_message("user").markdown(prompt)
 
-    # Call AI Agent (Coordinator)
-    response = ai_agent(prompt)
+    # Call AI Agent (Coordinator) and render the answer as it streams in
+    with st.chat_message("assistant"):
+        response = st.write_stream(ai_agent_stream(prompt))
 
-    # Save + display assistant message
+    # Save assistant message
     st.session_state["messages"].append({"role": "assistant", "content": response})
-    st.chat_message("assistant").markdown(response)
 
     # ---------------- FEEDBACK SECTION ----------------
     st.write("### Provide Feedback on the Answer")
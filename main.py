@@ -1,4 +1,7 @@
 from agents.InHouseSearch_agent import IHouseRAGAgent
+from tools.tracing import configure_logging
+
+configure_logging()
 
 rag_agent = IHouseRAGAgent()
 
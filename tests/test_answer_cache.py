@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from tools.answer_cache import SemanticAnswerCache
+
+SHORT = "give me a 2 line summary of nitrate risks"
+LONG = "give me a 10 line summary of nitrate risks"
+
+
+class FakeEmbedder:
+    """Embeds every query onto the same direction, the worst case for near-identical wording"""
+    cache_namespace = "fake"
+
+    def generate_embeddings(self, texts):
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def store(cache, query, answer, variant=None):
+    cache.store(query, answer, "rag", "web", "reasoning", variant=variant)
+
+
+def test_paraphrase_with_same_variant_hits():
+    cache = SemanticAnswerCache(FakeEmbedder())
+    store(cache, "what are the risks of nitrate", "answer")
+    hit = cache.lookup("which risks does nitrate pose")
+    assert hit is not None and hit.answer == "answer"
+    assert cache.stats == {"hits": 1, "misses": 0, "entries": 1}
+
+
+def test_requested_line_count_is_never_shared():
+    cache = SemanticAnswerCache(FakeEmbedder())
+    store(cache, SHORT, "two lines", variant=2)
+    assert cache.lookup(LONG, variant=10) is None
+    assert cache.lookup("nitrate risks", variant=0) is None
+
+    store(cache, LONG, "ten lines", variant=10)
+    assert len(cache) == 2
+    assert cache.lookup(SHORT, variant=2).answer == "two lines"
+    assert cache.lookup(LONG, variant=10).answer == "ten lines"
+
+
+def test_coordinator_variant_is_the_requested_line_count():
+    coordinator = pytest.importorskip("agents.Coordinator_agent")
+    variant = coordinator.CoordinatorAgent._answer_variant
+    assert (variant(SHORT), variant(LONG), variant("nitrate risks")) == (2, 10, 0)
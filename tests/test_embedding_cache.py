@@ -0,0 +1,67 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from tools import embedding_cache
+from tools.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time() for the cache module"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: now[0])
+    return now
+
+
+def put(cache, *hashes):
+    cache.put_many("model", list(hashes), np.ones((len(hashes), 4), dtype=np.float32))
+
+
+def disk_hashes(path):
+    with sqlite3.connect(path) as conn:
+        return {row[0] for row in conn.execute("SELECT text_hash FROM embeddings")}
+
+
+def test_disk_tier_is_capped_least_recently_used_first(tmp_path, clock):
+    path = tmp_path / "cache.sqlite3"
+    cache = EmbeddingCache(path, max_disk_rows=10)
+    for i in range(10):
+        put(cache, f"h{i}")
+        clock[0] += 1
+    cache.clear_memory()
+    assert cache.get_many("model", ["h0"])[0] is not None  # disk hit refreshes h0
+    clock[0] += 1
+
+    put(cache, "h10")  # 11 rows > 10: prune down to 9
+    assert cache.stats["disk_rows"] == 9
+    assert disk_hashes(path) == {"h0", *(f"h{i}" for i in range(3, 11))}
+
+
+def test_memory_hits_count_as_use(tmp_path, clock):
+    path = tmp_path / "cache.sqlite3"
+    cache = EmbeddingCache(path, max_disk_rows=None)
+    put(cache, "old", "new")
+    clock[0] += 1
+    cache.get_many("model", ["old"])  # served from memory
+    clock[0] += 1
+    put(cache, "newest")
+
+    assert cache.prune(2) == 1
+    assert disk_hashes(path) == {"old", "newest"}
+
+
+def test_reopens_cache_written_without_last_used(tmp_path, clock):
+    path = tmp_path / "cache.sqlite3"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE embeddings (model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+                     "PRIMARY KEY (model, text_hash)) WITHOUT ROWID")
+        conn.execute("INSERT INTO embeddings VALUES ('model', 'legacy', ?)", (np.ones(4, np.float32).tobytes(),))
+
+    cache = EmbeddingCache(path, max_disk_rows=None)
+    put(cache, "fresh")
+    clock[0] += 1
+    assert cache.get_many("model", ["legacy"])[0] is not None
+    assert cache.prune(1) == 1
+    assert disk_hashes(path) == {"legacy"}
@@ -0,0 +1,38 @@
+import threading
+import time
+
+import pytest
+
+from tools.RAG_tool import ingest_once
+
+
+def test_concurrent_sessions_ingest_a_store_once(tmp_path):
+    runs, active, overlapped = [], [0], []
+
+    def ingest():
+        active[0] += 1
+        overlapped.append(active[0] > 1)
+        time.sleep(0.05)
+        runs.append(1)
+        active[0] -= 1
+
+    threads = [threading.Thread(target=ingest_once, args=(ingest, "docs", tmp_path)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(runs) == 1 and not any(overlapped)
+    assert ingest_once(ingest, "docs", tmp_path) is False
+    assert ingest_once(ingest, "docs", tmp_path, force=True) is True
+    assert ingest_once(ingest, "other", tmp_path) is True
+    assert len(runs) == 3
+
+
+def test_failed_ingest_is_retried(tmp_path):
+    def fail():
+        raise RuntimeError("parser crashed")
+
+    with pytest.raises(RuntimeError):
+        ingest_once(fail, "docs", tmp_path)
+    assert ingest_once(lambda: None, "docs", tmp_path) is True
@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+sentence_transformers = pytest.importorskip("sentence_transformers")
+
+from tools.onnx_embedder import OnnxSentenceEncoder
+from tools.RAG_tool import DEFAULT_MODEL_NAME
+
+# Any SentenceTransformer name or local path; the default is the model the RAG pipeline uses
+MODEL = os.getenv("AQUAINFO_PARITY_MODEL", DEFAULT_MODEL_NAME)
+MIN_COSINE = 0.99
+
+TEXTS = [
+    "What is the maximum acceptable concentration of nitrate in drinking water?",
+    "Lead can leach from old service lines into tap water, especially after long stagnation.",
+    "Turbidity",
+    "Groundwater near intensive agriculture often shows elevated nitrate and pesticide levels, "
+    "and private wells are rarely tested as frequently as municipal supplies. " * 6,
+    "E. coli in a drinking water sample indicates recent faecal contamination.",
+]
+
+
+@pytest.fixture(scope="module")
+def torch_vectors():
+    try:
+        model = sentence_transformers.SentenceTransformer(MODEL, device="cpu")
+    except Exception as e:
+        pytest.skip(f"embedding model {MODEL} unavailable: {e}")
+    return model.encode(TEXTS, normalize_embeddings=False, convert_to_numpy=True)
+
+
+@pytest.fixture(scope="module")
+def export_root(tmp_path_factory):
+    return tmp_path_factory.mktemp("onnx_models")
+
+
+def cosine_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+@pytest.mark.parametrize("quantized", [False, True], ids=["onnx", "onnx-int8"])
+def test_onnx_embeddings_match_torch(torch_vectors, export_root, quantized):
+    encoder = OnnxSentenceEncoder(MODEL, quantized=quantized, root=export_root)
+    vectors = encoder.encode(TEXTS)
+
+    assert vectors.shape == torch_vectors.shape
+    assert cosine_rows(vectors, torch_vectors).min() >= MIN_COSINE
+
+
+def test_single_text_matches_batch(torch_vectors, export_root):
+    encoder = OnnxSentenceEncoder(MODEL, root=export_root)
+    np.testing.assert_allclose(encoder.encode(TEXTS[0]), encoder.encode(TEXTS)[0], atol=1e-5)
@@ -0,0 +1,82 @@
+import json
+import threading
+
+import pytest
+
+from tools import web_cache
+from tools.web_cache import WebSearchCache, search_cache_key
+from tools.web_search_tool import FixtureBackend, WebSearchTool
+
+QUERY = "nitrate pollution in water"
+
+
+def make_tool(latency_s=0.0, ttl_seconds=60.0, fixtures=None):
+    backend = FixtureBackend(fixtures, latency_s=latency_s) if fixtures else FixtureBackend(latency_s=latency_s)
+    cache = WebSearchCache(path=None, ttl_seconds=ttl_seconds)
+    return WebSearchTool(backend=backend, cache=cache), backend, cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time() for the cache module"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(web_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_cache_key_normalizes_query_and_ignores_api_key():
+    base = {"engine": "google", "q": "Nitrate  Pollution in WATER", "num": 3, "hl": "en", "gl": "ca"}
+    assert search_cache_key(base) == search_cache_key({**base, "q": QUERY, "api_key": "secret"})
+    assert search_cache_key(base) != search_cache_key({**base, "num": 5})
+    assert search_cache_key(base) != search_cache_key({**base, "gl": "us"})
+    assert "secret" not in search_cache_key({**base, "api_key": "secret"})
+
+
+def test_repeated_search_is_served_from_cache():
+    tool, backend, cache = make_tool()
+    first = tool.search(QUERY)
+    assert tool.search("  NITRATE pollution in water ") == first
+    assert backend.calls == 1
+    assert cache.stats == {"hits": 1, "misses": 1, "coalesced": 0}
+
+
+def test_entries_expire_after_ttl(clock):
+    tool, backend, _ = make_tool(ttl_seconds=60.0)
+    tool.search(QUERY)
+    clock[0] += 59
+    tool.search(QUERY)
+    assert backend.calls == 1
+
+    clock[0] += 2
+    tool.search(QUERY)
+    assert backend.calls == 2
+
+
+def test_concurrent_identical_searches_share_one_fetch():
+    tool, backend, cache = make_tool(latency_s=0.2)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(tool.search(QUERY))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert backend.calls == 1
+    assert len(results) == 8 and all(result == results[0] for result in results)
+    assert cache.misses == 1
+    assert cache.coalesced + cache.hits == 7
+
+
+def test_error_responses_are_not_cached(tmp_path):
+    fixtures = tmp_path / "fixtures.json"
+    fixtures.write_text(json.dumps({"default": {"error": "quota exceeded"}}), encoding="utf-8")
+    tool, backend, _ = make_tool(fixtures=fixtures)
+    assert tool.search(QUERY) == []
+    tool.search(QUERY)
+    assert backend.calls == 2
@@ -1,43 +1,64 @@
+import logging
 import os
-from langchain_community.document_loaders import PyPDFLoader, PyMuPDFLoader
-from langchain_classic.text_splitter import RecursiveCharacterTextSplitter
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
+from typing import List, Dict, Any, Tuple, Callable
+
+import numpy as np
+from langchain_classic.text_splitter import RecursiveCharacterTextSplitter
+
+from tools.embedding_batcher import EncodeStats, LengthBucketedEncoder, default_max_batch_tokens
+from tools.embedding_cache import EmbeddingCache, text_hash
+from tools.embedding_service import EmbeddingService, default_max_wait_ms
+from tools.filtered_search import Partition, PartitionCache, filter_key
+from tools.hnsw_config import HNSWConfig, distance_to_similarity
+from tools.ingest_pipeline import iter_parsed_pdfs
+from tools.ingestion import make_content_chunk_id
+from tools.numpy_store import NUMPY_DTYPES, NumpyClient
+from tools.onnx_embedder import ONNX_BACKENDS, default_threads
+from tools.reranker import CrossEncoderReranker, DEFAULT_RERANKER_MODEL
+from tools.sparse_index import SparseIndex
+from tools.tracing import span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_BACKENDS = ("torch", *ONNX_BACKENDS)
+DEFAULT_COLLECTION_NAME = "pdf_documents"
+DEFAULT_PERSIST_DIRECTORY = Path(__file__).resolve().parent.parent / "data" / "vector_store"
+RETRIEVAL_MODES = ("dense", "sparse", "hybrid")
+# "chroma": HNSW index in ChromaDB; "numpy": exact search over a memory-mapped matrix (tools/numpy_store.py)
+VECTOR_BACKENDS = ("chroma", "numpy")
+# Rows per Chroma write: throughput is flat from 500 rows up to the client's limit, peak memory is not
+DEFAULT_WRITE_BATCH_SIZE = 1000
+# Reciprocal-rank fusion constant: 1 / (RRF_K + rank); 60 is the value from the original RRF paper
+RRF_K = 60
+
 
 ### Read all the pdf's inside the directory
-def process_all_pdfs(pdf_directory):
-    """Process all PDF files in a directory"""
+def process_all_pdfs(pdf_directory, workers=None):
+    """Process all PDF files in a directory, parsing them in parallel worker processes"""
     all_documents = []
     pdf_dir = Path(pdf_directory)
     
     # Find all PDF files recursively
     pdf_files = list(pdf_dir.glob("**/*.pdf"))
     
-    print(f"Found {len(pdf_files)} PDF files to process")
+    logger.info("Found %d PDF files to process", len(pdf_files))
     
-    for pdf_file in pdf_files:
-        print(f"\nProcessing: {pdf_file.name}")
-        try:
-            loader = PyPDFLoader(str(pdf_file))
-            documents = loader.load()
-            
-            # Add source information to metadata
-            for doc in documents:
-                doc.metadata['source_file'] = pdf_file.name
-                doc.metadata['file_type'] = 'pdf'
-            
-            all_documents.extend(documents)
-            print(f"  ✓ Loaded {len(documents)} pages")
-            
-        except Exception as e:
-            print(f"  ✗ Error: {e}")
+    for pdf_file, documents, _ in iter_parsed_pdfs(pdf_files, workers or os.cpu_count() or 1):
+        if isinstance(documents, Exception):
+            logger.error("Error loading %s: %s", pdf_file.name, documents)
+            continue
+        
+        all_documents.extend(documents)
+        logger.info("Loaded %d pages from %s", len(documents), pdf_file.name)
     
-    print(f"\nTotal documents loaded: {len(all_documents)}")
+    logger.info("Total documents loaded: %d", len(all_documents))
     return all_documents
 
-# Process all PDFs in the data directory
-all_pdf_documents = process_all_pdfs("./data")
-
-
 
 def split_documents(documents,chunk_size=1000,chunk_overlap=200):
     """Split documents into smaller chunks for better RAG performance"""
@@ -48,238 +69,954 @@ def split_documents(documents,chunk_size=1000,chunk_overlap=200):
         separators=["\n\n", "\n", " ", ""]
     )
     split_docs = text_splitter.split_documents(documents)
-    print(f"Split {len(documents)} documents into {len(split_docs)} chunks")
+    logger.info("Split %d documents into %d chunks", len(documents), len(split_docs))
     
     # Show example of a chunk
     if split_docs:
-        print(f"\nExample chunk:")
-        print(f"Content: {split_docs[0].page_content[:200]}...")
-        print(f"Metadata: {split_docs[0].metadata}")
+        logger.debug("Example chunk: %s... (metadata %s)", split_docs[0].page_content[:200], split_docs[0].metadata)
     
     return split_docs
 
-chunks=split_documents(all_pdf_documents)
-
 
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale every row to unit L2 length, in place"""
+    if matrix.size:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.maximum(norms, 1e-12).astype(matrix.dtype, copy=False)
+    return matrix
 
 
-import numpy as np
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
-import uuid
-from typing import List, Dict, Any, Tuple
-from sklearn.metrics.pairwise import cosine_similarity
-
 class EmbeddingManager:
     """Handles document embedding generation using SentenceTransformer"""
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, cache: EmbeddingCache | None = None,
+                 backend: str = "torch", threads: int | None = None, max_batch_tokens: int | None = None,
+                 normalize: bool = True):
         """
         Initialize the embedding manager
         
         Args:
             model_name: HuggingFace model name for sentence embeddings
+            cache: Optional embedding cache; only cache misses are sent through the model
+            backend: "torch" (SentenceTransformer), "onnx" or "onnx-int8" (ONNX Runtime, exported on first use)
+            threads: CPU threads for the ONNX backends (defaults to AQUAINFO_ONNX_THREADS)
+            max_batch_tokens: Padded tokens per forward pass (defaults to AQUAINFO_EMBED_BATCH_TOKENS)
+            normalize: Return unit-length vectors, so cosine, inner product and L2 rank identically
         """
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{backend}'; expected one of {EMBEDDING_BACKENDS}")
         self.model_name = model_name
+        self.backend = backend
+        self.threads = threads or default_threads()
+        self.cache = cache
+        # Cache key prefix: vectors are only reusable for the exact same model and backend
+        self.cache_namespace = model_name if backend == "torch" else f"{model_name}@{backend}"
+        self.max_batch_tokens = max_batch_tokens or default_max_batch_tokens()
+        self.normalize = normalize
         self.model = None
+        self.batcher = None
         self._load_model()
 
+    @property
+    def last_encode_stats(self):
+        """EncodeStats of the calling thread's most recent model pass (cache hits cost nothing and are not counted)"""
+        return self.batcher.last_stats
+
     def _load_model(self):
-        """Load the SentenceTransformer model"""
+        """Load the SentenceTransformer model (or its ONNX export)"""
         try:
-            print(f"Loading embedding model: {self.model_name}")
-            self.model = SentenceTransformer(self.model_name)
-            print(f"Model loaded successfully. Embedding dimension: {self.model.get_sentence_embedding_dimension()}")
+            logger.info("Loading embedding model: %s (%s)", self.model_name, self.backend)
+            if self.backend == "torch":
+                # Imported here so that importing this module does not pull in torch
+                from sentence_transformers import SentenceTransformer
+
+                self.model = SentenceTransformer(self.model_name)
+            else:
+                from tools.onnx_embedder import OnnxSentenceEncoder
+
+                self.model = OnnxSentenceEncoder(
+                    self.model_name, quantized=self.backend == "onnx-int8", threads=self.threads
+                )
+            self.batcher = LengthBucketedEncoder(self.model, max_batch_tokens=self.max_batch_tokens)
+            logger.info("Model loaded successfully. Embedding dimension: %d", self.model.get_sentence_embedding_dimension())
         except Exception as e:
-            print(f"Error loading model {self.model_name}: {e}")
+            logger.error("Error loading model %s: %s", self.model_name, e)
             raise
 
-    def generate_embeddings(self, texts: List[str]) -> np.ndarray:
+    def generate_embeddings(self, texts: List[str], out: np.ndarray | None = None) -> np.ndarray:
         """
         Generate embeddings for a list of texts
         
         Args:
             texts: List of text strings to embed
+            out: Optional preallocated (len(texts), dim) float32 or float16 array to write into
             
         Returns:
-            numpy array of embeddings with shape (len(texts), embedding_dim)
+            numpy array of embeddings with shape (len(texts), embedding_dim) (``out`` when given)
         """
         if not self.model:
             raise ValueError("Model not loaded")
-        
-        print(f"Generating embeddings for {len(texts)} texts...")
-        embeddings = self.model.encode(texts, show_progress_bar=True)
-        print(f"Generated embeddings with shape: {embeddings.shape}")
-        return embeddings
 
+        with span("embed", model=self.cache_namespace, texts=len(texts)) as embed_span:
+            if self.cache is None:
+                embeddings, stats = self._encode(texts, out=out)
+                embed_span.set(tokens=stats.tokens)
+                return normalize_rows(embeddings) if self.normalize else embeddings
+
+            hashes = [text_hash(text) for text in texts]
+            cached = self.cache.get_many(self.cache_namespace, hashes)
+
+            # Embed each distinct missing text once
+            miss_positions: Dict[str, List[int]] = {}
+            for i, (h, vector) in enumerate(zip(hashes, cached)):
+                if vector is None:
+                    miss_positions.setdefault(h, []).append(i)
+
+            if out is None:
+                out = np.empty((len(texts), self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+            for i, vector in enumerate(cached):
+                if vector is not None:
+                    out[i] = vector
+
+            if miss_positions:
+                miss_hashes = list(miss_positions)
+                # Encoded as float32 so the cache never stores reduced-precision vectors
+                new_vectors, stats = self._encode([texts[positions[0]] for positions in miss_positions.values()])
+                self.cache.put_many(self.cache_namespace, miss_hashes, new_vectors)
+                for h, vector in zip(miss_hashes, new_vectors):
+                    out[miss_positions[h]] = vector
+            else:
+                stats = self.batcher.last_stats = EncodeStats()
+
+            hits = len(texts) - sum(map(len, miss_positions.values()))
+            logger.debug("Embedding cache: %d/%d hits", hits, len(texts))
+            embed_span.set(cache_hits=hits, tokens=stats.tokens)
+            return normalize_rows(out) if self.normalize else out
 
-## initialize the embedding manager
+    def _encode(self, texts: List[str], out: np.ndarray | None = None) -> Tuple[np.ndarray, EncodeStats]:
+        """Run the model forward pass in length-bucketed batches; returns the embeddings and what they cost"""
+        embeddings = self.batcher.encode(texts, out=out)
+        # Read on the thread that encoded, so concurrent callers never see each other's stats
+        stats = self.batcher.last_stats
+        logger.debug(stats.summary())
+        return embeddings, stats
+
+
+@dataclass
+class WriteStats:
+    """Rows written by one VectorStore write call"""
+    rows: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_s(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def summary(self) -> str:
+        return f"{self.rows} rows in {self.batches} batches, {self.seconds:.2f}s, {self.rows_per_s:.0f} rows/s"
 
-embedding_manager=EmbeddingManager()
 
 class VectorStore:
-    """Manages document embeddings in a ChromaDB vector store"""
+    """Manages document embeddings in a ChromaDB (or embedded NumPy) vector store"""
     
-    def __init__(self, collection_name: str = "pdf_documents", persist_directory: str | None = None):
+    def __init__(self, collection_name: str = DEFAULT_COLLECTION_NAME, persist_directory: str | None = None,
+                 hnsw: HNSWConfig | None = None, migrate: bool = True, backend: str | None = None):
         """
         Initialize the vector store
         
         Args:
             collection_name: Name of the ChromaDB collection
             persist_directory: Directory to persist the vector store
+            hnsw: HNSW index parameters (defaults to HNSWConfig.from_env(): cosine space)
+            migrate: Rebuild an existing collection whose space / M / ef_construction differ from ``hnsw``
+            backend: "chroma" or "numpy" (defaults to AQUAINFO_VECTOR_BACKEND, else "chroma");
+                the NumPy store keeps float32 vectors unless AQUAINFO_VECTOR_DTYPE=float16
         """
         self.collection_name = collection_name
-        base_dir = Path(__file__).resolve().parent.parent  # project root
-        self.persist_directory = Path(persist_directory) if persist_directory else base_dir / "data" / "vector_store"
+        self.persist_directory = Path(persist_directory) if persist_directory else DEFAULT_PERSIST_DIRECTORY
+        self.backend = backend or os.getenv("AQUAINFO_VECTOR_BACKEND", "chroma")
+        if self.backend not in VECTOR_BACKENDS:
+            raise ValueError(f"Unknown vector backend '{self.backend}'; expected one of {VECTOR_BACKENDS}")
+        self.hnsw = hnsw or HNSWConfig.from_env()
+        self.migrate_on_mismatch = migrate
         self.client = None
         self.collection = None
+        self._sparse_index: SparseIndex | None = None
+        self._sparse_lock = threading.RLock()
+        self._max_batch_size: int | None = None
+        self._partitions = PartitionCache()
         self._initialize_store()
 
     def _initialize_store(self):
         """Initialize ChromaDB client and collection"""
+        if self.backend == "numpy":
+            self._initialize_numpy_store()
+            return
         try:
+            import chromadb
+
             # Create persistent ChromaDB client
             os.makedirs(self.persist_directory, exist_ok=True)
             self.client = chromadb.PersistentClient(path=str(self.persist_directory))
+            self._recover_migration()
             
             # Get or create collection
             self.collection = self.client.get_or_create_collection(
                 name=self.collection_name,
+                configuration=self.hnsw.to_configuration(),
                 metadata={"description": "PDF document embeddings for RAG"}
             )
-            print(f"Vector store initialized. Collection: {self.collection_name}")
-            print(f"Existing documents in collection: {self.collection.count()}")
+            self._apply_hnsw_config()
+            logger.info("Vector store initialized. Collection: %s (%s space), %d documents",
+                        self.collection_name, self.space, self.collection.count())
             
         except Exception as e:
-            print(f"Error initializing vector store: {e}")
+            logger.error("Error initializing vector store: %s", e)
             raise
 
-    def add_documents(self, documents: List[Any], embeddings: np.ndarray):
+    def _initialize_numpy_store(self):
+        """Open the NumPy collection, importing the Chroma collection of the same name on first use"""
+        dtype = os.getenv("AQUAINFO_VECTOR_DTYPE", "float32")
+        if dtype not in NUMPY_DTYPES:
+            raise ValueError(f"Unknown vector dtype '{dtype}'; expected one of {NUMPY_DTYPES}")
+        self.client = NumpyClient(self.persist_directory, dtype=dtype)
+        self.collection = self.client.get_or_create_collection(
+            name=self.collection_name,
+            metadata={"description": "PDF document embeddings for RAG"}
+        )
+        if self.collection.count() == 0 and (self.persist_directory / "chroma.sqlite3").exists():
+            self._import_chroma_collection()
+        logger.info("Vector store initialized. Collection: %s (numpy backend, %s), %d documents",
+                    self.collection_name, self.collection.dtype, self.collection.count())
+
+    def _import_chroma_collection(self):
+        """Copy ids, documents, metadata and embeddings from the Chroma collection into the NumPy one"""
+        import chromadb
+
+        client = chromadb.PersistentClient(path=str(self.persist_directory))
+        if self.collection_name not in {collection.name for collection in client.list_collections()}:
+            return
+        source = client.get_collection(self.collection_name)
+        total = source.count()
+        page_size = min(client.get_max_batch_size(), 5000)
+        for offset in range(0, total, page_size):
+            page = source.get(limit=page_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+            if not page["ids"]:
+                break
+            self.collection.upsert(ids=page["ids"], embeddings=np.asarray(page["embeddings"], dtype=np.float32),
+                                   documents=page["documents"], metadatas=page["metadatas"])
+            logger.info("Imported %d/%d from Chroma", min(offset + page_size, total), total)
+
+    # ------------------ INDEX CONFIGURATION ------------------
+    @property
+    def index_config(self) -> Dict[str, Any]:
+        """The collection's HNSW configuration as stored by Chroma"""
+        return dict((self.collection.configuration or {}).get("hnsw") or {})
+
+    @property
+    def space(self) -> str:
+        """Distance space the collection was built with"""
+        if self.backend == "numpy":
+            return "cosine"
+        return self.index_config.get("space", "l2")
+
+    @property
+    def _migration_name(self) -> str:
+        return f"{self.collection_name}__migrating"
+
+    def _apply_hnsw_config(self):
+        """Rebuild the collection if its build parameters differ, then apply the runtime ones in place"""
+        mismatches = self.hnsw.build_mismatches(self.index_config)
+        if mismatches:
+            current = {name: self.index_config.get(name) for name in mismatches}
+            if self.migrate_on_mismatch:
+                logger.info("Collection '%s' was built with %s; migrating", self.collection_name, current)
+                self.migrate()
+            else:
+                logger.warning("Collection '%s' was built with %s, not the configured HNSW parameters; "
+                               "pass migrate=True to rebuild it", self.collection_name, current)
+
+        # Persisted right away, but Chroma only applies it when the index is next loaded (i.e. before the first query here)
+        update = self.hnsw.runtime_update()["hnsw"]
+        if any(self.index_config.get(name, value) != value for name, value in update.items()):
+            self.collection.modify(configuration={"hnsw": update})
+            self.collection = self.client.get_collection(self.collection_name)
+
+    def _recover_migration(self):
+        """Finish or discard a migration that was interrupted"""
+        names = {collection.name for collection in self.client.list_collections()}
+        if self._migration_name not in names:
+            return
+        if self.collection_name in names:
+            # The copy never completed; the original is intact
+            self.client.delete_collection(self._migration_name)
+        else:
+            # Crashed between dropping the original and renaming the copy
+            self.client.get_collection(self._migration_name).modify(name=self.collection_name)
+
+    def migrate(self):
+        """
+        Copy every entry into a new collection built with ``self.hnsw`` and swap it in (Chroma backend)
+
+        Ids, documents, metadata and embeddings are preserved, so the ingestion
+        manifest and the BM25 index stay valid. Stored vectors are re-normalized
+        on the way.
+        """
+        if self.backend != "chroma":
+            raise RuntimeError("Only Chroma collections have an HNSW index to migrate")
+        source = self.collection
+        total = source.count()
+        target = self.client.create_collection(
+            name=self._migration_name,
+            configuration=self.hnsw.to_configuration(),
+            metadata=source.metadata or {"description": "PDF document embeddings for RAG"},
+        )
+        page_size = min(self.client.get_max_batch_size(), 5000)
+        for offset in range(0, total, page_size):
+            page = source.get(limit=page_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+            if not page["ids"]:
+                break
+            target.add(
+                ids=page["ids"],
+                embeddings=normalize_rows(np.asarray(page["embeddings"], dtype=np.float32)),
+                documents=page["documents"],
+                metadatas=page["metadatas"],
+            )
+            logger.info("Migrated %d/%d", min(offset + page_size, total), total)
+        self.client.delete_collection(self.collection_name)
+        target.modify(name=self.collection_name)
+        self.collection = self.client.get_collection(self.collection_name)
+        logger.info("Collection '%s' migrated to %s", self.collection_name, self.index_config)
+
+    @property
+    def sparse_index(self) -> SparseIndex:
+        """
+        BM25 index over the same chunks, persisted next to the collection
+
+        Loaded on first use. If it is missing or out of step with the
+        collection (e.g. a store built before the index existed, or an
+        interrupted ingest), it is rebuilt from the stored documents.
+        """
+        with self._sparse_lock:
+            if self._sparse_index is None:
+                suffix = ".bm25.npz" if self.backend == "chroma" else f".{self.backend}.bm25.npz"
+                index = SparseIndex(self.persist_directory / f"{self.collection_name}{suffix}")
+                if len(index) != self.collection.count():
+                    logger.info("Rebuilding BM25 index for collection '%s'...", self.collection_name)
+                    index.clear()
+                    total = self.collection.count()
+                    for offset in range(0, total, 5000):
+                        page = self.collection.get(limit=5000, offset=offset, include=["documents"])
+                        index.add(page["ids"], [doc or "" for doc in page["documents"]])
+                    index.save()
+                self._sparse_index = index
+            return self._sparse_index
+
+    def save_sparse_index(self):
+        """Persist pending BM25 index changes (call after an ingest)"""
+        if self._sparse_index is not None and self._sparse_index.dirty:
+            with self._sparse_lock:
+                self._sparse_index.save()
+
+    def count(self) -> int:
+        """Number of documents in the collection"""
+        return self.collection.count()
+
+    @property
+    def max_batch_size(self) -> int:
+        """Largest number of rows the Chroma client accepts in one write"""
+        if self._max_batch_size is None:
+            self._max_batch_size = self.client.get_max_batch_size()
+        return self._max_batch_size
+
+    def add_documents(self, documents: List[Any], embeddings: np.ndarray, ids: List[str] | None = None,
+                      batch_size: int | None = None) -> WriteStats:
         """
         Add documents and their embeddings to the vector store
         
         Args:
             documents: List of LangChain documents
-            embeddings: Corresponding embeddings for the documents
+            embeddings: Corresponding embeddings for the documents, shape (len(documents), dim)
+            ids: Optional deterministic ids (default: derived from source, position and content);
+                existing entries with the same id are overwritten
+            batch_size: Rows per write (default DEFAULT_WRITE_BATCH_SIZE, capped at the client's max batch size)
+
+        Returns:
+            WriteStats for the call
         """
         if len(documents) != len(embeddings):
             raise ValueError("Number of documents must match number of embeddings")
+        if ids is not None and len(ids) != len(documents):
+            raise ValueError("Number of ids must match number of documents")
         
-        print(f"Adding {len(documents)} documents to vector store...")
-        
-        # Prepare data for ChromaDB
-        ids = []
-        metadatas = []
-        documents_text = []
-        embeddings_list = []
+        logger.debug("Adding %d documents to vector store...", len(documents))
         
-        for i, (doc, embedding) in enumerate(zip(documents, embeddings)):
-            # Generate unique ID
-            doc_id = f"doc_{uuid.uuid4().hex[:8]}_{i}"
-            ids.append(doc_id)
-            
-            # Prepare metadata
-            metadata = dict(doc.metadata)
-            metadata['doc_index'] = i
-            metadata['content_length'] = len(doc.page_content)
-            metadatas.append(metadata)
-            
-            # Document content
-            documents_text.append(doc.page_content)
-            
-            # Embedding
-            embeddings_list.append(embedding.tolist())
-        
-        # Add to collection
+        if ids is None:
+            ids = [make_content_chunk_id(doc.metadata, doc.page_content) for doc in documents]
+
+        def metadata_of(i: int, doc) -> Dict[str, Any]:
+            return {**doc.metadata, 'doc_index': i, 'content_length': len(doc.page_content)}
+
         try:
-            self.collection.add(
-                ids=ids,
-                embeddings=embeddings_list,
-                metadatas=metadatas,
-                documents=documents_text
+            stats = self.bulk_upsert(
+                ids,
+                embeddings,
+                documents=lambda start, stop: [doc.page_content for doc in documents[start:stop]],
+                metadatas=lambda start, stop: [metadata_of(i, doc) for i, doc in
+                                               enumerate(documents[start:stop], start)],
+                batch_size=batch_size,
             )
-            print(f"Successfully added {len(documents)} documents to vector store")
-            print(f"Total documents in collection: {self.collection.count()}")
+            logger.info("Added %d documents to vector store (%s); %d in collection",
+                        len(documents), stats.summary(), self.collection.count())
+            return stats
             
         except Exception as e:
-            print(f"Error adding documents to vector store: {e}")
+            logger.error("Error adding documents to vector store: %s", e)
             raise
 
-vectorstore=VectorStore()
+    def bulk_upsert(self, ids: List[str], embeddings: np.ndarray,
+                    documents: Callable[[int, int], List[str]] | List[str],
+                    metadatas: Callable[[int, int], List[Dict[str, Any]]] | List[Dict[str, Any]] | None = None,
+                    batch_size: int | None = None) -> WriteStats:
+        """
+        Upsert rows in bounded batches, never larger than the client accepts
+
+        Embeddings are handed to Chroma as float32 NumPy slices (no per-row
+        Python lists). ``documents`` and ``metadatas`` may be callables
+        returning the rows of ``[start, stop)``, so only one batch of them
+        exists at a time.
+
+        Args:
+            ids: Row ids; rows with an existing id are replaced
+            embeddings: Array of shape (len(ids), dim)
+            documents: Texts, or a callable (start, stop) -> texts
+            metadatas: Metadata dicts, or a callable (start, stop) -> dicts
+            batch_size: Rows per write (default DEFAULT_WRITE_BATCH_SIZE, capped at the client's max batch size)
+
+        Returns:
+            WriteStats for the call
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.ndim != 2 or len(embeddings) != len(ids):
+            raise ValueError(f"Embeddings must have shape ({len(ids)}, dim), got {embeddings.shape}")
+        batch_size = min(batch_size or DEFAULT_WRITE_BATCH_SIZE, self.max_batch_size)
+
+        def rows(source, start, stop):
+            if source is None:
+                return None
+            return source(start, stop) if callable(source) else source[start:stop]
+
+        # Load (or rebuild) the BM25 index before the collection changes under it
+        sparse_index = self.sparse_index
+
+        stats = WriteStats()
+        started = time.perf_counter()
+        for start in range(0, len(ids), batch_size):
+            stop = min(start + batch_size, len(ids))
+            batch_ids = list(ids[start:stop])
+            batch_documents = rows(documents, start, stop)
+            # Upsert so re-ingesting a chunk with a known id replaces it instead of duplicating it
+            self.collection.upsert(
+                ids=batch_ids,
+                embeddings=embeddings[start:stop],
+                metadatas=rows(metadatas, start, stop),
+                documents=batch_documents,
+            )
+            with self._sparse_lock:
+                sparse_index.add(batch_ids, batch_documents)
+            stats.rows += stop - start
+            stats.batches += 1
+        stats.seconds = time.perf_counter() - started
+        self._partitions.clear()
+        return stats
+
+    def query(self, query_embeddings: np.ndarray, n_results: int = 5, where: Dict[str, Any] | None = None,
+              where_document: Dict[str, Any] | None = None, include: List[str] | None = None) -> Dict[str, Any]:
+        """
+        Nearest-neighbour search for one or more query embeddings in a single call
+        
+        Args:
+            query_embeddings: Array of shape (n_queries, embedding_dim)
+            n_results: Number of neighbours per query
+            where: Chroma metadata filter, applied inside the search (e.g. {"source_file": "report.pdf"})
+            where_document: Chroma document filter (e.g. {"$contains": "nitrate"})
+            include: Fields to return (default documents, metadatas and distances; ids always come back)
+            
+        Returns:
+            ChromaDB query result: dict of per-query lists ('ids', 'documents', 'metadatas', 'distances')
+        """
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        with span("vector.query", backend=self.backend, queries=len(query_embeddings), n_results=n_results,
+                  filtered=bool(where or where_document)) as query_span:
+            result = None
+            if (where or where_document) and self.backend == "chroma":
+                # Chroma evaluates the filter in SQLite on every call; a cached partition small enough to
+                # hold in memory is searched exactly here instead
+                partition = self._partition(where, where_document)
+                if partition.matrix is not None:
+                    result = self._query_partition(partition, query_embeddings, n_results)
+                    query_span.set(path="partition")
+                elif partition.selectivity >= 0.5:
+                    result = self._query_post_filtered(partition, query_embeddings, n_results)
+                    query_span.set(path="post_filter")
+            if result is None:
+                result = self.collection.query(
+                    query_embeddings=query_embeddings,
+                    n_results=n_results,
+                    where=where or None,
+                    where_document=where_document or None,
+                    **({"include": include} if include is not None else {}),
+                )
+            query_span.set(results=sum(len(row) for row in result["ids"]))
+            return result
+
+    def _partition(self, where: Dict[str, Any] | None, where_document: Dict[str, Any] | None) -> Partition:
+        """The cached partition for a filter, resolved against the collection on first use"""
+        key = filter_key(where, where_document)
+        partition = self._partitions.get(key)
+        if partition is None:
+            filters = {"where": where or None, "where_document": where_document or None}
+            ids = self.collection.get(**filters, include=[])["ids"]
+            partition = Partition(ids, total=self.collection.count())
+            # The NumPy backend scores a filtered selection in place; only Chroma needs the vectors here
+            if self.backend == "chroma" and 0 < len(ids) <= self._partitions.max_rows:
+                page = self.collection.get(**filters, include=["embeddings"])
+                partition = Partition(page["ids"], normalize_rows(np.asarray(page["embeddings"], dtype=np.float32)),
+                                      total=partition.total)
+            self._partitions.put(key, partition)
+        return partition
+
+    def _query_partition(self, partition: Partition, query_embeddings: np.ndarray, n_results: int) -> Dict[str, Any]:
+        """Exact search over a partition, returned in the shape (and distance space) of a Chroma query"""
+        found = partition.top_k(query_embeddings, n_results)
+        ids = [[partition.ids[i] for i in top.tolist()] for top, _ in found]
+        stored = self.get_documents(list({doc_id for row in ids for doc_id in row}))
+        to_distance = (lambda score: 2.0 - 2.0 * score) if self.space == "l2" else (lambda score: 1.0 - score)
+        return {
+            "ids": ids,
+            "documents": [[stored.get(doc_id, (None, None))[0] for doc_id in row] for row in ids],
+            "metadatas": [[stored.get(doc_id, (None, None))[1] for doc_id in row] for row in ids],
+            "distances": [[to_distance(score) for score in scores.tolist()] for _, scores in found],
+        }
+
+    def _query_post_filtered(self, partition: Partition, query_embeddings: np.ndarray,
+                             n_results: int) -> Dict[str, Any] | None:
+        """
+        Unfiltered search, over-fetched in proportion to the filter's selectivity, keeping the partition's hits
+
+        For a filter most documents pass this costs one ordinary ANN query, where Chroma's own filtered
+        search degrades badly. Returns None if some query keeps fewer than ``n_results`` hits.
+        """
+        fetch = min(partition.total, int(2 * n_results / partition.selectivity) + n_results)
+        # Texts are fetched only for the kept hits: Chroma's cost per returned document dominates the query
+        results = self.collection.query(query_embeddings=query_embeddings, n_results=fetch, include=["distances"])
+        allowed = partition.id_set
+        ids, distances = [], []
+        for row_ids, row_distances in zip(results["ids"], results["distances"]):
+            keep = [j for j, doc_id in enumerate(row_ids) if doc_id in allowed][:n_results]
+            if len(keep) < min(n_results, len(partition.ids)):
+                return None
+            ids.append([row_ids[j] for j in keep])
+            distances.append([row_distances[j] for j in keep])
+        stored = self.get_documents(list({doc_id for row in ids for doc_id in row}))
+        return {
+            "ids": ids,
+            "documents": [[stored.get(doc_id, (None, None))[0] for doc_id in row] for row in ids],
+            "metadatas": [[stored.get(doc_id, (None, None))[1] for doc_id in row] for row in ids],
+            "distances": distances,
+        }
+
+    def matching_ids(self, where: Dict[str, Any] | None = None,
+                     where_document: Dict[str, Any] | None = None) -> List[str]:
+        """Ids of the documents that pass the metadata / document filters (cached until the next write)"""
+        return self._partition(where, where_document).ids
+
+    def sparse_query(self, query_texts: List[str], n_results: int = 5, where: Dict[str, Any] | None = None,
+                     where_document: Dict[str, Any] | None = None) -> List[List[Tuple[str, float]]]:
+        """
+        BM25 search for one or more queries, optionally restricted to the documents passing the filters
+        
+        Returns:
+            Per query, up to ``n_results`` (id, BM25 score) pairs, best first
+        """
+        with span("vector.sparse_query", queries=len(query_texts), n_results=n_results,
+                  filtered=bool(where or where_document)) as query_span:
+            allowed = self.matching_ids(where, where_document) if where or where_document else None
+            with self._sparse_lock:
+                index = self.sparse_index
+                found = [index.search(text, n_results, allowed=allowed) for text in query_texts]
+            query_span.set(results=sum(map(len, found)))
+            return found
+
+    def get_documents(self, ids: List[str]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """Fetch stored text and metadata by id: {id: (document, metadata)}"""
+        if not ids:
+            return {}
+        with span("vector.get", backend=self.backend, ids=len(ids)):
+            result = self.collection.get(ids=list(ids), include=["documents", "metadatas"])
+        return {doc_id: (document, metadata)
+                for doc_id, document, metadata in zip(result["ids"], result["documents"], result["metadatas"])}
+
+    def delete_documents(self, ids: List[str], batch_size: int = 5000):
+        """
+        Delete documents by id
+        
+        Args:
+            ids: Ids of the documents to remove
+            batch_size: Maximum number of ids sent per delete call
+        """
+        for start in range(0, len(ids), batch_size):
+            self.collection.delete(ids=ids[start:start + batch_size])
+        if ids:
+            with self._sparse_lock:
+                self.sparse_index.delete(ids)
+            self._partitions.clear()
+            logger.info("Deleted %d documents from vector store", len(ids))
 
+    def reset(self):
+        """Drop every document in the collection, keeping its metadata; the index is rebuilt with ``self.hnsw``"""
+        metadata = self.collection.metadata
+        self.client.delete_collection(self.collection_name)
+        self.collection = self.client.get_or_create_collection(
+            name=self.collection_name, configuration=self.hnsw.to_configuration(), metadata=metadata
+        )
+        with self._sparse_lock:
+            if self._sparse_index is not None:
+                self._sparse_index.clear()
+        self._partitions.clear()
+        logger.info("Vector store collection '%s' reset", self.collection_name)
 
 
 class RAGRetriever:
     """Handles query-based retrieval from the vector store"""
     
-    def __init__(self, vector_store: VectorStore, embedding_manager: EmbeddingManager):
+    def __init__(self, vector_store: VectorStore, embedding_manager: EmbeddingManager | EmbeddingService):
         """
         Initialize the retriever
         
         Args:
             vector_store: Vector store containing document embeddings
-            embedding_manager: Manager for generating query embeddings
+            embedding_manager: Manager (or batching service) for generating query embeddings
         """
         self.vector_store = vector_store
         self.embedding_manager = embedding_manager
 
-    def retrieve(self, query: str, top_k: int = 5, score_threshold: float = 0.0) -> List[Dict[str, Any]]:
+    def retrieve(self, query: str, top_k: int = 5, score_threshold: float = 0.0,
+                 mode: str = "dense", where: Dict[str, Any] | None = None,
+                 where_document: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
         """
         Retrieve relevant documents for a query
         
         Args:
             query: The search query
             top_k: Number of top results to return
-            score_threshold: Minimum similarity score threshold
+            score_threshold: Minimum similarity score threshold (applies to dense matches)
+            mode: "dense" (embeddings), "sparse" (BM25) or "hybrid" (both, fused by reciprocal rank)
+            where: Metadata filter pushed down into the store, in Chroma syntax, e.g.
+                {"source_file": "waterdocument.pdf"} or
+                {"$and": [{"page": {"$gte": 10}}, {"page": {"$lte": 40}}]}
+            where_document: Document-text filter, e.g. {"$contains": "nitrate"}
             
         Returns:
             List of dictionaries containing retrieved documents and metadata
         """
-        print(f"Retrieving documents for query: '{query}'")
-        print(f"Top K: {top_k}, Score threshold: {score_threshold}")
+        logger.debug("Retrieving documents for query '%s' (top_k=%d, score_threshold=%s, mode=%s, where=%s, "
+                     "where_document=%s)", query, top_k, score_threshold, mode, where, where_document)
+        
+        return self.retrieve_many([query], top_k=top_k, score_threshold=score_threshold, mode=mode,
+                                  where=where, where_document=where_document)[0]
+
+    def retrieve_many(self, queries: List[str], top_k: int = 5, score_threshold: float = 0.0,
+                      mode: str = "dense", where: Dict[str, Any] | None = None,
+                      where_document: Dict[str, Any] | None = None) -> List[List[Dict[str, Any]]]:
+        """
+        Retrieve relevant documents for several queries at once
         
-        # Generate query embedding
-        query_embedding = self.embedding_manager.generate_embeddings([query])[0]
+        All queries are embedded in one batched forward pass and searched with a
+        single vector store call.
         
-        # Search in vector store
-        try:
-            results = self.vector_store.collection.query(
-                query_embeddings=[query_embedding.tolist()],
-                n_results=top_k
-            )
-            
-            # Process results
-            retrieved_docs = []
+        Args:
+            queries: The search queries
+            top_k: Number of top results to return per query
+            score_threshold: Minimum similarity score threshold (applies to dense matches)
+            mode: "dense", "sparse" or "hybrid" (see ``retrieve``)
+            where: Metadata filter applied to every query (see ``retrieve``)
+            where_document: Document-text filter applied to every query
             
-            if results['documents'] and results['documents'][0]:
-                documents = results['documents'][0]
-                metadatas = results['metadatas'][0]
-                distances = results['distances'][0]
-                ids = results['ids'][0]
-                
-                for i, (doc_id, document, metadata, distance) in enumerate(zip(ids, documents, metadatas, distances)):
-                    # Convert distance to similarity score (ChromaDB uses cosine distance)
-                    similarity_score = 1 - distance
-                    
-                    if similarity_score >= score_threshold:
-                        retrieved_docs.append({
-                            'id': doc_id,
-                            'content': document,
-                            'metadata': metadata,
-                            'similarity_score': similarity_score,
-                            'distance': distance,
-                            'rank': i + 1
-                        })
-                
-                print(f"Retrieved {len(retrieved_docs)} documents (after filtering)")
-            else:
-                print("No documents found")
+        Returns:
+            One list of retrieved documents per query, in the same shape as ``retrieve``
+        """
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}'; expected one of {RETRIEVAL_MODES}")
+        if not queries:
+            return []
+
+        with span("retrieve", mode=mode, queries=len(queries), top_k=top_k) as retrieve_span:
+            retrieved = self._retrieve_many(queries, top_k, score_threshold, mode, where, where_document)
+            retrieve_span.set(results=sum(map(len, retrieved)))
+        logger.debug("Retrieved %d documents for %d queries (after filtering)", sum(map(len, retrieved)), len(queries))
+        return retrieved
+
+    def _retrieve_many(self, queries: List[str], top_k: int, score_threshold: float, mode: str,
+                       where: Dict[str, Any] | None, where_document: Dict[str, Any] | None) -> List[List[Dict[str, Any]]]:
+        # Hybrid fuses deeper candidate lists so a chunk ranked low by one side can still surface
+        n_candidates = top_k if mode == "dense" else max(top_k * 4, 20)
+
+        dense = [[] for _ in queries]
+        if mode != "sparse":
+            # Generate query embeddings
+            query_embeddings = self.embedding_manager.generate_embeddings(list(queries))
             
+            # Search in vector store
+            try:
+                results = self.vector_store.query(query_embeddings, n_results=n_candidates, where=where,
+                                                  where_document=where_document)
+            except Exception as e:
+                logger.error("Error during retrieval: %s", e)
+                return [[] for _ in queries]
+            dense = [self._process_results(results, i, score_threshold) for i in range(len(queries))]
+
+        if mode == "dense":
+            retrieved = dense
+        else:
+            try:
+                sparse = self.vector_store.sparse_query(list(queries), n_results=n_candidates, where=where,
+                                                        where_document=where_document)
+            except Exception as e:
+                logger.error("Error during sparse retrieval: %s", e)
+                sparse = [[] for _ in queries]
+            retrieved = self._fuse(dense, sparse, top_k)
+        return retrieved
+
+    def _fuse(self, dense: List[List[Dict[str, Any]]], sparse: List[List[Tuple[str, float]]],
+              top_k: int) -> List[List[Dict[str, Any]]]:
+        """
+        Reciprocal-rank fusion of dense and BM25 rankings: score = sum of 1 / (RRF_K + rank)
+
+        With no dense ranking (sparse mode) this is simply the BM25 order.
+        """
+        # Dense hits already carry their text; fetch the BM25-only ones in a single call
+        known = {doc['id']: doc for docs in dense for doc in docs}
+        missing = {doc_id for hits in sparse for doc_id, _ in hits if doc_id not in known}
+        fetched = self.vector_store.get_documents(list(missing))
+
+        fused_results = []
+        for dense_docs, sparse_hits in zip(dense, sparse):
+            scores: Dict[str, float] = {}
+            bm25: Dict[str, float] = {}
+            for rank, doc in enumerate(dense_docs, start=1):
+                scores[doc['id']] = scores.get(doc['id'], 0.0) + 1.0 / (RRF_K + rank)
+            for rank, (doc_id, score) in enumerate(sparse_hits, start=1):
+                scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (RRF_K + rank)
+                bm25[doc_id] = score
+
+            ranked = sorted(scores, key=scores.get, reverse=True)
+            docs = []
+            for doc_id in ranked:
+                if doc_id in known:
+                    doc = dict(known[doc_id])
+                elif doc_id in fetched:
+                    document, metadata = fetched[doc_id]
+                    doc = {'id': doc_id, 'content': document, 'metadata': metadata,
+                           'similarity_score': None, 'distance': None}
+                else:
+                    continue  # indexed by BM25 but no longer in the collection
+                doc['bm25_score'] = bm25.get(doc_id)
+                doc['rrf_score'] = scores[doc_id]
+                doc['rank'] = len(docs) + 1
+                docs.append(doc)
+                if len(docs) == top_k:
+                    break
+            fused_results.append(docs)
+        return fused_results
+
+    def _process_results(self, results: Dict[str, Any], query_index: int, score_threshold: float) -> List[Dict[str, Any]]:
+        """Turn one query's slice of a vector store result into ranked result dicts"""
+        retrieved_docs = []
+        
+        if not results['documents'] or not results['documents'][query_index]:
             return retrieved_docs
+
+        space = self.vector_store.space
+        documents = results['documents'][query_index]
+        metadatas = results['metadatas'][query_index]
+        distances = results['distances'][query_index]
+        ids = results['ids'][query_index]
+        
+        for i, (doc_id, document, metadata, distance) in enumerate(zip(ids, documents, metadatas, distances)):
+            # Cosine similarity whatever distance space the collection uses
+            similarity_score = distance_to_similarity(distance, space)
             
-        except Exception as e:
-            print(f"Error during retrieval: {e}")
-            return []
+            if similarity_score >= score_threshold:
+                retrieved_docs.append({
+                    'id': doc_id,
+                    'content': document,
+                    'metadata': metadata,
+                    'similarity_score': similarity_score,
+                    'distance': distance,
+                    'rank': i + 1
+                })
+        
+        return retrieved_docs
+
+
+# ------------------ SHARED RESOURCE REGISTRY ------------------
+# Models and stores are expensive to build, so nothing is created at import time.
+# They are built on first use and shared process-wide: every agent (and every
+# Streamlit session) asking for the same model / persist directory / collection
+# gets the same instance instead of loading its own copy.
+_registry_lock = threading.RLock()
+_embedding_cache: EmbeddingCache | None = None
+# Keyed by cache namespace: model name, plus "@backend" for the ONNX backends
+_embedding_managers: Dict[str, EmbeddingManager] = {}
+_embedding_services: Dict[str, EmbeddingService] = {}
+_vector_stores: Dict[Tuple[str, str], Any] = {}
+_retrievers: Dict[Tuple[str, str, str], RAGRetriever] = {}
+_rerankers: Dict[str, CrossEncoderReranker] = {}
+# Keyed like _vector_stores: one ingestion lock per store, and the stores already ingested by this process
+_ingestion_locks: Dict[Tuple[str, str], threading.Lock] = {}
+_ingested: set = set()
+
+
+def _resolve_persist_directory(persist_directory) -> str:
+    return str(Path(persist_directory or DEFAULT_PERSIST_DIRECTORY).resolve())
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Return the process-wide embedding cache (in-memory LRU over data/embedding_cache.sqlite3)."""
+    global _embedding_cache
+    with _registry_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache()
+        return _embedding_cache
+
+
+def get_embedding_manager(model_name: str = DEFAULT_MODEL_NAME, backend: str | None = None) -> EmbeddingManager:
+    """
+    Return the shared EmbeddingManager for ``model_name``, loading the model on first use.
+
+    The backend defaults to AQUAINFO_EMBEDDING_BACKEND ("torch", "onnx" or "onnx-int8").
+    """
+    backend = backend or os.getenv("AQUAINFO_EMBEDDING_BACKEND", "torch")
+    key = model_name if backend == "torch" else f"{model_name}@{backend}"
+    with _registry_lock:
+        manager = _embedding_managers.get(key)
+        if manager is None:
+            manager = EmbeddingManager(model_name, cache=get_embedding_cache(), backend=backend)
+            _embedding_managers[key] = manager
+        return manager
+
+
+def get_embedding_service(model_name: str = DEFAULT_MODEL_NAME, backend: str | None = None) -> EmbeddingService:
+    """
+    Return the shared micro-batching EmbeddingService over ``get_embedding_manager(model_name, backend)``.
+
+    Query-time embedding goes through it, so concurrent sessions share batched forward passes.
+    The batching window defaults to AQUAINFO_EMBED_BATCH_WAIT_MS.
+    """
+    with _registry_lock:
+        manager = get_embedding_manager(model_name, backend)
+        service = _embedding_services.get(manager.cache_namespace)
+        if service is None:
+            service = EmbeddingService(manager, max_wait_ms=default_max_wait_ms())
+            _embedding_services[manager.cache_namespace] = service
+        return service
+
+
+def get_vector_store(collection_name: str = DEFAULT_COLLECTION_NAME, persist_directory=None):
+    """
+    Return the shared VectorStore for (persist directory, collection), opening it on first use.
+
+    With AQUAINFO_SHARDING set to "source", "region" or "hash" this is a ShardedVectorStore instead
+    (AQUAINFO_SHARDS hash buckets, default 8; AQUAINFO_ACTIVE_SHARDS limits the shards queried).
+    """
+    persist_dir = _resolve_persist_directory(persist_directory)
+    key = (persist_dir, collection_name)
+    with _registry_lock:
+        store = _vector_stores.get(key)
+        if store is None:
+            strategy = os.getenv("AQUAINFO_SHARDING", "none")
+            if strategy == "none":
+                store = VectorStore(collection_name=collection_name, persist_directory=persist_dir)
+            else:
+                from tools.sharded_store import DEFAULT_HASH_SHARDS, ShardedVectorStore
+
+                active = os.getenv("AQUAINFO_ACTIVE_SHARDS")
+                store = ShardedVectorStore(
+                    collection_name=collection_name, persist_directory=persist_dir, strategy=strategy,
+                    num_shards=int(os.getenv("AQUAINFO_SHARDS", DEFAULT_HASH_SHARDS)),
+                    active_shards=[name.strip() for name in active.split(",") if name.strip()] if active else None,
+                )
+            _vector_stores[key] = store
+        return store
+
+
+def get_retriever(
+    model_name: str = DEFAULT_MODEL_NAME,
+    collection_name: str = DEFAULT_COLLECTION_NAME,
+    persist_directory=None,
+) -> RAGRetriever:
+    """Return the shared RAGRetriever for (model, persist directory, collection)."""
+    persist_dir = _resolve_persist_directory(persist_directory)
+    key = (model_name, persist_dir, collection_name)
+    with _registry_lock:
+        retriever = _retrievers.get(key)
+        if retriever is None:
+            retriever = RAGRetriever(
+                get_vector_store(collection_name, persist_dir),
+                get_embedding_service(model_name),
+            )
+            _retrievers[key] = retriever
+        return retriever
+
+
+def ingest_once(ingest: Callable[[], Any], collection_name: str = DEFAULT_COLLECTION_NAME, persist_directory=None,
+                force: bool = False) -> bool:
+    """
+    Run ``ingest`` for (persist directory, collection) at most once per process.
+
+    Every CoordinatorAgent (one per Streamlit session) builds a RAG agent that syncs the PDFs
+    into the shared store and manifest. Holding the store's lock keeps two sessions from
+    resetting the store or saving the manifest over each other; later callers wait for the
+    first and then skip. A failed ingest is not marked done, so the next caller retries.
+
+    Args:
+        ingest: Does the ingestion against the shared store
+        collection_name: Collection being ingested into
+        persist_directory: Directory of the vector store
+        force: Run even if this store was already ingested (e.g. a requested rebuild)
+
+    Returns:
+        True if ``ingest`` ran, False if it was skipped
+    """
+    key = (_resolve_persist_directory(persist_directory), collection_name)
+    with _registry_lock:
+        lock = _ingestion_locks.setdefault(key, threading.Lock())
+    with lock:
+        if key in _ingested and not force:
+            return False
+        ingest()
+        _ingested.add(key)
+        return True
+
+
+def get_reranker(model_name: str = DEFAULT_RERANKER_MODEL) -> CrossEncoderReranker:
+    """Return the shared cross-encoder reranker for ``model_name``, loading it on first use."""
+    with _registry_lock:
+        reranker = _rerankers.get(model_name)
+        if reranker is None:
+            reranker = CrossEncoderReranker(model_name)
+            _rerankers[model_name] = reranker
+        return reranker
+
 
-rag_retriever=RAGRetriever(vectorstore,embedding_manager)
\ No newline at end of file
+def __getattr__(name: str):
+    """Keep the old module-level singletons importable, but build them lazily."""
+    if name == "embedding_manager":
+        return get_embedding_manager()
+    if name == "vectorstore":
+        return get_vector_store()
+    if name == "rag_retriever":
+        return get_retriever()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,211 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedAnswer:
+    """A final answer together with the intermediate outputs it was built from"""
+    query: str
+    answer: str
+    rag_output: str
+    web_output: str
+    reasoning: str
+    plan: object = None
+    variant: Hashable = None
+    corpus_version: Optional[str] = None
+    created: float = field(default_factory=time.time)
+    similarity: float = 1.0
+
+
+class SemanticAnswerCache:
+    """
+    Cache of final answers keyed by query meaning rather than query text
+
+    Query embeddings are kept unit-normalized in a fixed-capacity matrix, so a
+    lookup is one matrix-vector product over at most ``max_entries`` rows. A
+    lookup hits when the best cosine similarity reaches ``threshold`` and the
+    entry is neither older than ``ttl_seconds`` nor built against a different
+    corpus version. Queries that mean the same but ask for a differently shaped
+    answer (e.g. a 2 line vs a 10 line summary) carry different ``variant``
+    values and never share entries. The least recently used entry is evicted
+    when full.
+    """
+
+    def __init__(self, embedder, threshold: float = 0.92, ttl_seconds: float = 3600.0,
+                 max_entries: int = 512, version_fn: Optional[Callable[[], Optional[str]]] = None):
+        """
+        Initialize the cache
+
+        Args:
+            embedder: EmbeddingManager used to embed queries
+            threshold: Minimum cosine similarity for a paraphrase to count as a hit
+            ttl_seconds: Entries older than this are never served
+            max_entries: Capacity; the least recently used entry is evicted beyond it
+            version_fn: Returns the current corpus version; a change drops every entry
+        """
+        self.embedder = embedder
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.version_fn = version_fn
+
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._live = np.zeros(max_entries, dtype=bool)
+        self._created = np.zeros(max_entries, dtype=np.float64)
+        # slot -> entry, in least- to most-recently-used order
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _embed(self, query: str) -> np.ndarray:
+        vector = np.asarray(self.embedder.generate_embeddings([query])[0], dtype=np.float32)
+        return vector / (np.linalg.norm(vector) + 1e-12)
+
+    def _drop(self, slot: int):
+        """Remove one entry. Caller holds the lock."""
+        self._entries.pop(slot, None)
+        self._live[slot] = False
+        self._free.append(slot)
+
+    def _scores(self, vector: np.ndarray, variant: Hashable) -> np.ndarray:
+        """Similarity to every entry of the same variant, -inf elsewhere. Caller holds the lock."""
+        scores = self._matrix @ vector
+        scores[~self._live] = -np.inf
+        other = [slot for slot, entry in self._entries.items() if entry.variant != variant]
+        scores[other] = -np.inf
+        return scores
+
+    def _check_version(self) -> Optional[str]:
+        """Drop everything if the corpus changed since the entries were stored. Caller holds the lock."""
+        version = self.version_fn() if self.version_fn else None
+        if version != self._version:
+            if self._entries:
+                logger.info("Corpus version changed (%s -> %s); clearing answer cache", self._version, version)
+            for slot in list(self._entries):
+                self._drop(slot)
+            self._version = version
+        return version
+
+    def lookup(self, query: str, variant: Hashable = None) -> Optional[CachedAnswer]:
+        """
+        Return the cached answer for the most similar earlier query, or None
+
+        Args:
+            query: The new question
+            variant: Answer shape requested besides the meaning; only entries stored with an equal variant hit
+        """
+        vector = self._embed(query)
+        with self._lock:
+            self._check_version()
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            now = time.time()
+            for slot in np.flatnonzero(self._live & (now - self._created > self.ttl_seconds)):
+                self._drop(int(slot))
+
+            scores = self._scores(vector, variant)
+            slot = int(np.argmax(scores))
+            if scores[slot] < self.threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            return replace(self._entries[slot], similarity=float(scores[slot]))
+
+    def store(self, query: str, answer: str, rag_output: str, web_output: str, reasoning: str, plan=None,
+              variant: Hashable = None):
+        """Cache an answer under the query's embedding and ``variant`` (see ``lookup``)"""
+        vector = self._embed(query)
+        with self._lock:
+            version = self._check_version()
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+            # Re-asking the exact same question replaces its entry instead of adding a twin
+            if self._entries:
+                scores = self._scores(vector, variant)
+                best = int(np.argmax(scores))
+                if scores[best] >= 0.9999:
+                    self._drop(best)
+
+            if not self._free:
+                lru_slot = next(iter(self._entries))
+                self._drop(lru_slot)
+            slot = self._free.pop()
+            self._matrix[slot] = vector
+            self._live[slot] = True
+            entry = CachedAnswer(
+                query=query, answer=answer, rag_output=rag_output, web_output=web_output,
+                reasoning=reasoning, plan=plan, variant=variant, corpus_version=version,
+            )
+            self._created[slot] = entry.created
+            self._entries[slot] = entry
+
+    def invalidate(self, query: str, threshold: Optional[float] = None):
+        """Drop every entry a lookup for ``query`` could hit (e.g. after negative feedback)"""
+        vector = self._embed(query)
+        threshold = self.threshold if threshold is None else threshold
+        with self._lock:
+            if not self._entries:
+                return
+            scores = self._matrix @ vector
+            for slot in np.flatnonzero(self._live & (scores >= threshold)):
+                self._drop(int(slot))
+
+    def clear(self):
+        with self._lock:
+            for slot in list(self._entries):
+                self._drop(slot)
+
+
+_caches: Dict[Tuple[str, str], SemanticAnswerCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_answer_cache(embedder, corpus: str, threshold: float = 0.92, ttl_seconds: float = 3600.0,
+                     max_entries: int = 512,
+                     version_fn: Optional[Callable[[], Optional[str]]] = None) -> SemanticAnswerCache:
+    """
+    Return the process-wide answer cache for (embedding model, corpus), building it on first use.
+
+    Every Streamlit session builds its own CoordinatorAgent; sharing the cache lets a
+    paraphrase asked in one session be answered from another. The settings only
+    apply when the cache is created.
+
+    Args:
+        embedder: EmbeddingManager or EmbeddingService used to embed queries
+        corpus: Identifies the corpus answers are built from (e.g. persist directory and collection)
+        threshold: Minimum cosine similarity for a paraphrase to count as a hit
+        ttl_seconds: Entries older than this are never served
+        max_entries: Capacity of the cache
+        version_fn: Returns the current corpus version; a change drops every entry
+    """
+    key = (embedder.cache_namespace, corpus)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = SemanticAnswerCache(embedder, threshold=threshold, ttl_seconds=ttl_seconds,
+                                        max_entries=max_entries, version_fn=version_fn)
+            _caches[key] = cache
+        return cache
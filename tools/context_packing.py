@@ -0,0 +1,243 @@
+import logging
+import os
+import threading
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Same tokenizer langchain-mistralai uses to size Mistral requests
+MISTRAL_TOKENIZER = "mistralai/Mixtral-8x7B-v0.1"
+DEFAULT_CONTEXT_TOKEN_BUDGET = 3000
+
+# Largest prime below 2**32: with a, x < 2**32, a * x + b stays below 2**64, so the
+# uint64 arithmetic is the exact (a * x + b) mod p of a universal hash family
+_MINHASH_PRIME = 4294967291
+
+
+class TokenCounter:
+    """
+    Counts tokens with the Mistral tokenizer
+
+    The tokenizer is read from AQUAINFO_TOKENIZER_PATH (a tokenizer.json) or
+    from the local HuggingFace cache, never downloaded on the request path;
+    fetch it once with ``huggingface-cli download mistralai/Mixtral-8x7B-v0.1
+    tokenizer.json``. If it is not available, the embedding model's tokenizer
+    is used instead, and as a last resort a 4-characters-per-token estimate.
+    """
+
+    def __init__(self, fallback_tokenizer=None):
+        """
+        Args:
+            fallback_tokenizer: HuggingFace tokenizer to use when the Mistral one is unavailable
+        """
+        self.fallback_tokenizer = fallback_tokenizer
+        self.name = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Resolve the tokenizer now (call at startup); later calls are no-ops"""
+        with self._lock:
+            if self.name is not None:
+                return
+            try:
+                from tokenizers import Tokenizer
+
+                path = os.getenv("AQUAINFO_TOKENIZER_PATH")
+                if not path:
+                    from huggingface_hub import hf_hub_download
+
+                    path = hf_hub_download(MISTRAL_TOKENIZER, "tokenizer.json", local_files_only=True)
+                self._tokenizer = Tokenizer.from_file(path)
+                self.name = MISTRAL_TOKENIZER
+            except Exception as e:
+                if self.fallback_tokenizer is not None:
+                    self.name = getattr(self.fallback_tokenizer, "name_or_path", "embedding tokenizer")
+                else:
+                    self.name = "chars/4"
+                logger.warning("Mistral tokenizer unavailable (%s); counting tokens with %s", e, self.name)
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        self.load()
+        if not texts:
+            return []
+        if self._tokenizer is not None:
+            return [len(encoding.ids) for encoding in self._tokenizer.encode_batch(texts, add_special_tokens=False)]
+        if self.fallback_tokenizer is not None:
+            return [len(ids) for ids in self.fallback_tokenizer(texts, add_special_tokens=False, verbose=False)["input_ids"]]
+        return [max(1, len(text) // 4) for text in texts]
+
+    def count(self, text: str) -> int:
+        return self.count_many([text])[0]
+
+
+@dataclass
+class PackedContext:
+    """The assembled context and what packing did to get there"""
+    text: str
+    chunks: List[Dict[str, Any]] = field(default_factory=list)
+    tokens: int = 0
+    input_chunks: int = 0
+    input_tokens: int = 0
+    merged: int = 0
+    duplicates: int = 0
+    dropped: int = 0
+
+    def summary(self) -> str:
+        return (f"Packed {self.input_chunks} chunks ({self.input_tokens} tokens) into {len(self.chunks)} "
+                f"({self.tokens} tokens): {self.merged} merged, {self.duplicates} near-duplicates, "
+                f"{self.dropped} over budget")
+
+
+class ContextPacker:
+    """
+    Turns ranked retrieval results into a compact prompt context
+
+    1. Chunks from the same source file and page whose character ranges overlap
+       or touch (the splitter's 200-character overlap) are merged into one
+       passage, ranked by its best member.
+    2. Near-duplicate passages (MinHash estimate of word-shingle Jaccard
+       similarity) are dropped, keeping the better-ranked copy.
+    3. Passages are added in relevance order while they fit the token budget.
+    """
+
+    def __init__(self, token_counter: Optional[TokenCounter] = None, token_budget: int = DEFAULT_CONTEXT_TOKEN_BUDGET,
+                 dedup_threshold: float = 0.8, shingle_size: int = 5, num_perm: int = 64, separator: str = "\n\n"):
+        """
+        Initialize the packer
+
+        Args:
+            token_counter: Tokenizer wrapper used for the budget
+            token_budget: Maximum context tokens
+            dedup_threshold: Estimated Jaccard similarity above which a passage is a duplicate
+            shingle_size: Words per shingle
+            num_perm: MinHash permutations (estimate error ~ 1/sqrt(num_perm))
+            separator: Text placed between passages
+        """
+        self.token_counter = token_counter or TokenCounter()
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+        self.shingle_size = shingle_size
+        self.separator = separator
+
+        rng = np.random.default_rng(1)
+        self._perm_a = rng.integers(1, _MINHASH_PRIME, size=num_perm, dtype=np.uint64)
+        self._perm_b = rng.integers(0, _MINHASH_PRIME, size=num_perm, dtype=np.uint64)
+
+    # ------------------ MERGE ------------------
+    @staticmethod
+    def _merge_overlapping(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Merge chunks of the same page whose [start, end) ranges overlap or touch."""
+        passages = []
+        groups: Dict[tuple, List[tuple]] = {}
+        for order, doc in enumerate(results):
+            metadata = doc.get('metadata') or {}
+            start = metadata.get('start_index')
+            if start is None or start < 0:
+                passages.append({'content': doc['content'], 'order': order, 'members': [doc]})
+                continue
+            key = (metadata.get('source_file') or metadata.get('source'), metadata.get('page'))
+            groups.setdefault(key, []).append((int(start), order, doc))
+
+        for members in groups.values():
+            members.sort(key=lambda item: item[0])
+            current = None
+            for start, order, doc in members:
+                text = doc['content']
+                if current is not None and start <= current['end']:
+                    overlap = current['end'] - start
+                    if start + len(text) > current['end']:
+                        current['content'] += text[overlap:]
+                        current['end'] = start + len(text)
+                    current['order'] = min(current['order'], order)
+                    current['members'].append(doc)
+                    continue
+                current = {'content': text, 'order': order, 'end': start + len(text), 'members': [doc]}
+                passages.append(current)
+
+        passages.sort(key=lambda passage: passage['order'])
+        return passages
+
+    # ------------------ DEDUPLICATE ------------------
+    def _signature(self, text: str) -> np.ndarray:
+        words = text.lower().split()
+        n = self.shingle_size
+        shingles = [" ".join(words[i:i + n]) for i in range(max(1, len(words) - n + 1))]
+        hashes = np.array([zlib.crc32(s.encode("utf-8")) for s in shingles], dtype=np.uint64)
+        # (a * x + b) mod p for every permutation and shingle, minimum per permutation
+        values = (np.outer(self._perm_a, hashes) + self._perm_b[:, None]) % np.uint64(_MINHASH_PRIME)
+        return values.min(axis=1)
+
+    def _drop_near_duplicates(self, passages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        kept, signatures = [], []
+        for passage in passages:
+            signature = self._signature(passage['content'])
+            if any(np.mean(signature == other) >= self.dedup_threshold for other in signatures):
+                continue
+            kept.append(passage)
+            signatures.append(signature)
+        return kept
+
+    # ------------------ PACK ------------------
+    def pack(self, results: List[Dict[str, Any]]) -> PackedContext:
+        """
+        Assemble the prompt context from ranked retrieval results
+
+        Args:
+            results: RAGRetriever results, best first
+
+        Returns:
+            PackedContext with the context text and packing statistics
+        """
+        packed = PackedContext(text="", input_chunks=len(results))
+        if not results:
+            return packed
+
+        packed.input_tokens = sum(self.token_counter.count_many([doc['content'] for doc in results]))
+
+        passages = self._merge_overlapping(results)
+        packed.merged = len(results) - len(passages)
+
+        unique = self._drop_near_duplicates(passages)
+        packed.duplicates = len(passages) - len(unique)
+
+        separator_tokens = self.token_counter.count(self.separator) if self.separator.strip() else 0
+        lengths = self.token_counter.count_many([passage['content'] for passage in unique])
+        used = 0
+        for passage, tokens in zip(unique, lengths):
+            cost = tokens + (separator_tokens if packed.chunks else 0)
+            # Skip a passage that does not fit; a shorter, less relevant one still might
+            if used + cost > self.token_budget:
+                packed.dropped += 1
+                continue
+            used += cost
+            packed.chunks.append({
+                'content': passage['content'],
+                'ids': [doc.get('id') for doc in passage['members']],
+                'metadata': passage['members'][0].get('metadata'),
+                'tokens': tokens,
+            })
+
+        if not packed.chunks and unique:
+            # Even the best passage is over budget: keep a truncated prefix rather than no context
+            passage, tokens = unique[0], lengths[0]
+            text = passage['content']
+            while tokens > self.token_budget and text:
+                text = text[:int(len(text) * self.token_budget / tokens * 0.95)]
+                tokens = self.token_counter.count(text)
+            packed.dropped -= 1
+            used = tokens
+            packed.chunks.append({
+                'content': text,
+                'ids': [doc.get('id') for doc in passage['members']],
+                'metadata': passage['members'][0].get('metadata'),
+                'tokens': tokens,
+            })
+
+        packed.tokens = used
+        packed.text = self.separator.join(chunk['content'] for chunk in packed.chunks)
+        return packed
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+# Padded tokens per forward pass (batch size x longest sequence in the batch); 4096 was fastest on CPU
+DEFAULT_MAX_BATCH_TOKENS = 4096
+DEFAULT_MAX_BATCH_SIZE = 512
+OUTPUT_DTYPES = (np.float32, np.float16)
+
+
+@dataclass
+class EncodeStats:
+    """What one encode call cost"""
+    texts: int = 0
+    tokens: int = 0
+    padded_tokens: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    @property
+    def tokens_per_s(self) -> float:
+        return self.tokens / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def padding_efficiency(self) -> float:
+        """Share of the computed positions that were real tokens"""
+        return self.tokens / self.padded_tokens if self.padded_tokens else 1.0
+
+    def summary(self) -> str:
+        return (f"Embedded {self.texts} texts ({self.tokens} tokens) in {self.batches} batches, {self.seconds:.2f}s: "
+                f"{self.tokens_per_s:.0f} tokens/s, {self.padding_efficiency:.0%} of padded positions were tokens")
+
+
+def plan_buckets(lengths: np.ndarray, max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE) -> List[np.ndarray]:
+    """
+    Group texts of similar token length into batches under a padded-token cap
+
+    Texts are taken longest first, so each batch is padded to its first member
+    and the most memory-hungry batch runs first. A text longer than the cap
+    still gets a batch of its own.
+
+    Args:
+        lengths: Token count of every text
+        max_batch_tokens: Cap on batch size x longest sequence in the batch
+        max_batch_size: Cap on texts per batch
+
+    Returns:
+        Index arrays into ``lengths``, one per batch
+    """
+    order = np.argsort(-np.asarray(lengths), kind="stable")
+    buckets = []
+    start = 0
+    while start < len(order):
+        longest = max(int(lengths[order[start]]), 1)
+        size = max(1, min(max_batch_size, max_batch_tokens // longest))
+        buckets.append(order[start:start + size])
+        start += size
+    return buckets
+
+
+class LengthBucketedEncoder:
+    """
+    Encode scheduler for a SentenceTransformer (or OnnxSentenceEncoder)
+
+    Texts are tokenized once to measure them, sorted by token length and cut
+    into batches by a padded-token budget instead of a fixed batch size: many
+    short texts share one pass, long ones get smaller batches. Each batch's
+    vectors are written straight into their original rows of the output array.
+    """
+
+    def __init__(self, model, max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE):
+        """
+        Initialize the scheduler
+
+        Args:
+            model: Object with ``encode`` and ``get_sentence_embedding_dimension``
+            max_batch_tokens: Padded tokens per forward pass
+            max_batch_size: Texts per forward pass
+        """
+        self.model = model
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self._local = threading.local()
+
+    @property
+    def last_stats(self) -> EncodeStats:
+        """
+        EncodeStats of the calling thread's most recent ``encode``
+
+        Kept per thread: the embedding service worker and ingestion share one
+        encoder, and must not read each other's numbers.
+        """
+        stats = getattr(self._local, "stats", None)
+        return stats if stats is not None else EncodeStats()
+
+    @last_stats.setter
+    def last_stats(self, stats: EncodeStats):
+        self._local.stats = stats
+
+    def token_lengths(self, texts: List[str]) -> np.ndarray:
+        """Tokens per text after truncation, special tokens included"""
+        if hasattr(self.model, "token_lengths"):
+            return np.asarray(self.model.token_lengths(texts), dtype=np.int64)
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if tokenizer is None or not getattr(tokenizer, "is_fast", False):
+            # A pure-Python tokenizer costs about as much as the forward pass; estimate instead
+            return np.array([max(1, len(text) // 4) for text in texts], dtype=np.int64)
+        encoded = tokenizer(texts, truncation=True, max_length=self.model.max_seq_length, verbose=False)
+        return np.array([len(ids) for ids in encoded["input_ids"]], dtype=np.int64)
+
+    def encode(self, texts: List[str], out: Optional[np.ndarray] = None,
+               dtype=np.float32) -> np.ndarray:
+        """
+        Embed texts in length buckets
+
+        Args:
+            texts: Texts to embed
+            out: Preallocated (len(texts), dim) float32 or float16 array to fill
+            dtype: Output dtype when ``out`` is not given
+
+        Returns:
+            The embeddings, in input order (``out`` itself when given)
+        """
+        dimension = self.model.get_sentence_embedding_dimension()
+        if out is None:
+            out = np.empty((len(texts), dimension), dtype=dtype)
+        if out.shape != (len(texts), dimension):
+            raise ValueError(f"Output array has shape {out.shape}, expected {(len(texts), dimension)}")
+        if out.dtype not in OUTPUT_DTYPES:
+            raise ValueError(f"Output array must be float32 or float16, got {out.dtype}")
+
+        stats = EncodeStats(texts=len(texts))
+        if not texts:
+            self.last_stats = stats
+            return out
+
+        start = time.perf_counter()
+        lengths = self.token_lengths(texts)
+        for bucket in plan_buckets(lengths, self.max_batch_tokens, self.max_batch_size):
+            batch = [texts[i] for i in bucket]
+            vectors = self.model.encode(batch, batch_size=len(batch), show_progress_bar=False, convert_to_numpy=True)
+            out[bucket] = vectors
+            stats.batches += 1
+            stats.padded_tokens += len(bucket) * int(lengths[bucket[0]])
+        stats.tokens = int(lengths.sum())
+        stats.seconds = time.perf_counter() - start
+        self.last_stats = stats
+        return out
+
+
+def default_max_batch_tokens() -> int:
+    """Padded-token cap from AQUAINFO_EMBED_BATCH_TOKENS, if set"""
+    value = os.getenv("AQUAINFO_EMBED_BATCH_TOKENS")
+    return int(value) if value else DEFAULT_MAX_BATCH_TOKENS
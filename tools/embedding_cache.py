@@ -0,0 +1,236 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tools.tracing import span
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parent.parent / "data" / "embedding_cache.sqlite3"
+DEFAULT_MEMORY_BUDGET_BYTES = 64 * 1024 * 1024
+# ~150 MB of 384-dim float32 vectors; every new query text would otherwise be kept forever
+DEFAULT_MAX_DISK_ROWS = int(os.getenv("AQUAINFO_EMBEDDING_CACHE_ROWS", "100000"))
+# Pruning goes this far below the cap so it runs once per many inserts, not on every one
+PRUNE_TO_FRACTION = 0.9
+# Memory-tier hits are written back as disk last-used times in batches of this size
+TOUCH_FLUSH_ROWS = 256
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace; the tokenizer ignores it, so these variants embed identically."""
+    return " ".join(text.split())
+
+
+def text_hash(text: str) -> str:
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by (model, normalized-text hash)
+
+    Tier 1 is an in-memory LRU bounded by a byte budget. Tier 2 is a SQLite
+    table of float32 blobs that survives restarts, capped at ``max_disk_rows``:
+    each row records when it was last used, and once the cap is exceeded the
+    least recently used rows are pruned. Disk hits are promoted into memory.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, memory_budget_bytes: int = DEFAULT_MEMORY_BUDGET_BYTES,
+                 max_disk_rows: Optional[int] = DEFAULT_MAX_DISK_ROWS):
+        """
+        Initialize the cache
+
+        Args:
+            path: SQLite file for the persistent tier (None keeps the cache in memory only)
+            memory_budget_bytes: Maximum bytes of vectors held in the in-memory LRU
+            max_disk_rows: Maximum rows in the persistent tier (None or 0 for no limit;
+                AQUAINFO_EMBEDDING_CACHE_ROWS, default 100000)
+        """
+        self.path = Path(path) if path else None
+        self.memory_budget_bytes = memory_budget_bytes
+        self.max_disk_rows = max_disk_rows or None
+        self._memory: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        # Hits not yet written back as disk last_used times
+        self._touched: Dict[Tuple[str, str], float] = {}
+        self._disk_rows = 0
+
+        self._conn = None
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (model, text_hash)
+                ) WITHOUT ROWID
+            """)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")}
+            if "last_used" not in columns:
+                # Caches written before pruning existed; their rows count as least recently used
+                self._conn.execute("ALTER TABLE embeddings ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self._conn.commit()
+            self._disk_rows = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_rows": self._disk_rows,
+        }
+
+    def _remember(self, key: Tuple[str, str], vector: np.ndarray):
+        """Insert into the LRU and evict least-recently-used vectors over budget. Caller holds the lock."""
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= old.nbytes
+        self._memory[key] = vector
+        self._memory_bytes += vector.nbytes
+        while self._memory_bytes > self.memory_budget_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+
+    def get_many(self, model: str, hashes: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up vectors for pre-hashed texts
+
+        Returns:
+            One float32 vector per hash, or None on a miss
+        """
+        found: List[Optional[np.ndarray]] = [None] * len(hashes)
+        with self._lock:
+            disk_hits = self.disk_hits
+            missing: Dict[str, List[int]] = {}
+            for i, h in enumerate(hashes):
+                vector = self._memory.get((model, h))
+                if vector is not None:
+                    self._memory.move_to_end((model, h))
+                    if self._conn is not None:
+                        self._touched[(model, h)] = time.time()
+                    found[i] = vector
+                    self.memory_hits += 1
+                else:
+                    missing.setdefault(h, []).append(i)
+
+            if missing and self._conn is not None:
+                keys = list(missing)
+                with span("db.embedding_cache.get", keys=len(keys)) as db_span:
+                    # Stay well under SQLite's bound-parameter limit
+                    for start in range(0, len(keys), 500):
+                        batch = keys[start:start + 500]
+                        placeholders = ",".join("?" * len(batch))
+                        rows = self._conn.execute(
+                            f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                            [model, *batch],
+                        ).fetchall()
+                        for h, blob in rows:
+                            vector = np.frombuffer(blob, dtype=np.float32)
+                            self._remember((model, h), vector)
+                            self._touched[(model, h)] = time.time()
+                            for i in missing.pop(h):
+                                found[i] = vector
+                                self.disk_hits += 1
+                    db_span.set(cache_hits=self.disk_hits - disk_hits)
+
+            # Disk reads write their last-used times right away; memory hits in batches
+            if self._conn is not None and (self.disk_hits > disk_hits or len(self._touched) >= TOUCH_FLUSH_ROWS):
+                self._flush_touched()
+                self._conn.commit()
+
+            self.misses += sum(len(positions) for positions in missing.values())
+        return found
+
+    def put_many(self, model: str, hashes: List[str], vectors: np.ndarray):
+        """Store vectors in both tiers, pruning the disk tier once it exceeds ``max_disk_rows``"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            for h, vector in zip(hashes, vectors):
+                self._remember((model, h), vector.copy())
+            if self._conn is not None:
+                now = time.time()
+                with span("db.embedding_cache.put", rows=len(hashes)):
+                    self._flush_touched()
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                        [(model, h, vector.tobytes(), now) for h, vector in zip(hashes, vectors)],
+                    )
+                    # Replacements are over-counted; pruning recounts
+                    self._disk_rows += len(hashes)
+                    if self.max_disk_rows and self._disk_rows > self.max_disk_rows:
+                        self._prune(int(self.max_disk_rows * PRUNE_TO_FRACTION))
+                    self._conn.commit()
+
+    def _flush_touched(self):
+        """Write pending last-used times to disk. Caller holds the lock and commits."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(used, model, h) for (model, h), used in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _prune(self, max_rows: int) -> int:
+        """Delete the least recently used disk rows beyond ``max_rows``. Caller holds the lock and commits."""
+        self._disk_rows = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._disk_rows - max_rows
+        if excess <= 0:
+            return 0
+        with span("db.embedding_cache.prune", rows=excess):
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE (model, text_hash) IN "
+                "(SELECT model, text_hash FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+        self._disk_rows = max_rows
+        return excess
+
+    def prune(self, max_rows: Optional[int] = None) -> int:
+        """
+        Shrink the disk tier to its least recently used ``max_rows`` rows
+
+        Args:
+            max_rows: Rows to keep (default ``max_disk_rows``)
+
+        Returns:
+            Number of rows deleted
+        """
+        max_rows = self.max_disk_rows if max_rows is None else max_rows
+        with self._lock:
+            if self._conn is None or max_rows is None:
+                return 0
+            self._flush_touched()
+            deleted = self._prune(max_rows)
+            self._conn.commit()
+            return deleted
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._flush_touched()
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
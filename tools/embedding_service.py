@@ -0,0 +1,158 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np
+
+from tools.tracing import span
+
+DEFAULT_MAX_WAIT_MS = 2.0
+DEFAULT_MAX_BATCH_TEXTS = 64
+
+
+@dataclass
+class _Request:
+    texts: List[str]
+    future: Future = field(default_factory=Future)
+
+
+class EmbeddingService:
+    """
+    Micro-batching front end for one shared EmbeddingManager
+
+    Callers on any thread (every Streamlit session runs in its own) put their
+    texts on a queue. A single worker thread takes the first waiting request,
+    gathers whatever else arrives within ``max_wait_ms`` (requests that queued
+    up during the previous forward pass are taken at once), embeds them in one
+    ``generate_embeddings`` call and resolves each caller's future with its own
+    rows. Concurrent users share one model and one forward pass instead of
+    contending for the CPU with N single-item passes.
+    """
+
+    def __init__(self, manager, max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                 max_batch_texts: int = DEFAULT_MAX_BATCH_TEXTS):
+        """
+        Start the service
+
+        Args:
+            manager: EmbeddingManager that does the encoding
+            max_wait_ms: How long the first request of a batch waits for company
+            max_batch_texts: Stop gathering once a batch holds this many texts
+        """
+        self.manager = manager
+        self.max_wait_ms = max_wait_ms
+        self.max_batch_texts = max_batch_texts
+        self.requests = 0
+        self.batches = 0
+        self.batched_texts = 0
+        self._last_batch_requests = 0
+        self._queue: "queue.Queue[_Request | None]" = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="embedding-service", daemon=True)
+        self._worker.start()
+
+    # The attributes query-side consumers read from an EmbeddingManager
+    @property
+    def model(self):
+        return self.manager.model
+
+    @property
+    def model_name(self) -> str:
+        return self.manager.model_name
+
+    @property
+    def cache_namespace(self) -> str:
+        return self.manager.cache_namespace
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queue texts for embedding; the future resolves to a (len(texts), dim) float32 array"""
+        if self._closed:
+            raise RuntimeError("EmbeddingService is closed")
+        request = _Request(list(texts))
+        self._queue.put(request)
+        return request.future
+
+    def generate_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Blocking ``submit``; drop-in for EmbeddingManager.generate_embeddings"""
+        if not texts:
+            return self.manager.generate_embeddings([])
+        # Queue wait plus the shared forward pass, which is traced as "embed" on the worker thread
+        with span("embed.request", texts=len(texts)):
+            return self.submit(texts).result()
+
+    encode = generate_embeddings
+
+    def _gather(self, first: _Request) -> List[_Request]:
+        batch = [first]
+        size = len(first.texts)
+        # A lone caller is not made to wait: the window only opens under concurrent load
+        concurrent = self._last_batch_requests > 1 or not self._queue.empty()
+        deadline = time.perf_counter() + (self.max_wait_ms / 1000.0 if concurrent else 0.0)
+        while size < self.max_batch_texts:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)  # let the run loop see the shutdown after this batch
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._gather(first)
+            try:
+                self._embed_batch(batch)
+            except BaseException as e:
+                # Whatever goes wrong, the one shared worker must survive it
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _embed_batch(self, batch: List[_Request]):
+        # Futures cancelled by their caller while queued are dropped before encoding
+        batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        texts = [text for request in batch for text in request.texts]
+        vectors = self.manager.generate_embeddings(texts)
+
+        self._last_batch_requests = len(batch)
+        self.requests += len(batch)
+        self.batches += 1
+        self.batched_texts += len(texts)
+        offset = 0
+        for request in batch:
+            request.future.set_result(vectors[offset:offset + len(request.texts)])
+            offset += len(request.texts)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts_per_batch": self.batched_texts / self.batches if self.batches else 0.0,
+            "requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+        }
+
+    def close(self):
+        """Finish the queued requests and stop the worker"""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._worker.join()
+
+
+def default_max_wait_ms() -> float:
+    """Batching window from AQUAINFO_EMBED_BATCH_WAIT_MS, if set"""
+    value = os.getenv("AQUAINFO_EMBED_BATCH_WAIT_MS")
+    return float(value) if value else DEFAULT_MAX_WAIT_MS
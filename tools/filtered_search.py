@@ -0,0 +1,87 @@
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Filtered partitions kept per store, and the largest one whose vectors are held in memory
+DEFAULT_MAX_PARTITIONS = 16
+DEFAULT_MAX_PARTITION_ROWS = 20000
+
+
+def filter_key(where: Optional[Dict[str, Any]], where_document: Optional[Dict[str, Any]]) -> str:
+    """Canonical cache key of a (where, where_document) pair"""
+    return json.dumps([where or None, where_document or None], sort_keys=True, default=str)
+
+
+@dataclass
+class Partition:
+    """The documents passing one filter: their ids and, for small partitions, their unit-length vectors"""
+    ids: List[str]
+    matrix: Optional[np.ndarray] = None
+    total: int = 0
+    _id_set: Optional[frozenset] = None
+
+    @property
+    def selectivity(self) -> float:
+        """Share of the store's documents in the partition"""
+        return len(self.ids) / self.total if self.total else 1.0
+
+    @property
+    def id_set(self) -> frozenset:
+        if self._id_set is None:
+            self._id_set = frozenset(self.ids)
+        return self._id_set
+
+    def top_k(self, queries: np.ndarray, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Exact cosine top-k over the partition: per query, (row indices, scores) best first"""
+        scores = self.matrix @ np.asarray(queries, dtype=np.float32).T
+        k = min(k, len(self.ids))
+        found = []
+        for column in range(scores.shape[1]):
+            column_scores = scores[:, column]
+            top = np.argpartition(-column_scores, k - 1)[:k] if k < len(self.ids) else np.arange(len(self.ids))
+            top = top[np.argsort(-column_scores[top], kind="stable")]
+            found.append((top, column_scores[top]))
+        return found
+
+
+class PartitionCache:
+    """
+    LRU of filter partitions for one store
+
+    Analysts repeat the same filter ("only waterdocument.pdf") across a
+    session, so the matching ids, and for partitions of up to ``max_rows``
+    documents their vectors, are resolved once and reused until the store is
+    written to.
+    """
+
+    def __init__(self, max_partitions: int = DEFAULT_MAX_PARTITIONS,
+                 max_rows: int = DEFAULT_MAX_PARTITION_ROWS):
+        self.max_partitions = max_partitions
+        self.max_rows = max_rows
+        self._partitions: "OrderedDict[str, Partition]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Partition]:
+        with self._lock:
+            partition = self._partitions.get(key)
+            if partition is not None:
+                self._partitions.move_to_end(key)
+            return partition
+
+    def put(self, key: str, partition: Partition):
+        with self._lock:
+            self._partitions[key] = partition
+            self._partitions.move_to_end(key)
+            while len(self._partitions) > self.max_partitions:
+                self._partitions.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
+
+    def __len__(self) -> int:
+        return len(self._partitions)
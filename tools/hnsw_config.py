@@ -0,0 +1,68 @@
+import os
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, List
+
+HNSW_SPACES = ("cosine", "ip", "l2")
+# Fixed when the index is built; changing one of these means rebuilding the collection
+BUILD_PARAMETERS = ("space", "max_neighbors", "ef_construction")
+
+
+@dataclass(frozen=True)
+class HNSWConfig:
+    """
+    HNSW parameters of a Chroma collection
+
+    ``max_neighbors`` is HNSW's M (graph degree). ``ef_construction`` and
+    ``ef_search`` are the candidate-list sizes used while building and
+    querying: higher means better recall and slower builds / queries.
+    ``batch_size`` and ``sync_threshold`` control how many new vectors Chroma
+    buffers before adding them to the graph and persisting it.
+    """
+    space: str = "cosine"
+    max_neighbors: int = 16
+    ef_construction: int = 100
+    ef_search: int = 100
+    batch_size: int = 100
+    sync_threshold: int = 1000
+
+    def __post_init__(self):
+        if self.space not in HNSW_SPACES:
+            raise ValueError(f"Unknown HNSW space '{self.space}'; expected one of {HNSW_SPACES}")
+
+    @classmethod
+    def from_env(cls) -> "HNSWConfig":
+        """Defaults overridden by AQUAINFO_HNSW_SPACE, _M, _EF_CONSTRUCTION, _EF_SEARCH, _BATCH_SIZE, _SYNC_THRESHOLD"""
+        names = {"space": "SPACE", "max_neighbors": "M", "ef_construction": "EF_CONSTRUCTION",
+                 "ef_search": "EF_SEARCH", "batch_size": "BATCH_SIZE", "sync_threshold": "SYNC_THRESHOLD"}
+        values = {}
+        for f in fields(cls):
+            value = os.getenv(f"AQUAINFO_HNSW_{names[f.name]}")
+            if value:
+                values[f.name] = value if f.name == "space" else int(value)
+        return cls(**values)
+
+    def to_configuration(self) -> Dict[str, Any]:
+        """Chroma ``configuration`` argument for creating a collection"""
+        return {"hnsw": asdict(self)}
+
+    def runtime_update(self) -> Dict[str, Any]:
+        """Chroma ``configuration`` argument for ``collection.modify`` (the parameters that can change in place)"""
+        return {"hnsw": {name: value for name, value in asdict(self).items() if name not in BUILD_PARAMETERS}}
+
+    def build_mismatches(self, current: Dict[str, Any]) -> List[str]:
+        """Build-time parameters on which an existing collection's HNSW configuration differs"""
+        return [name for name in BUILD_PARAMETERS if current.get(name) != getattr(self, name)]
+
+
+def distance_to_similarity(distance: float, space: str) -> float:
+    """
+    Convert a Chroma distance into a cosine similarity
+
+    Chroma returns 1 - cos for "cosine", 1 - dot for "ip" and the squared
+    Euclidean distance for "l2". With unit-length embeddings (EmbeddingManager
+    normalizes them) dot == cos and ||a - b||^2 == 2 - 2 cos, so every space
+    maps back to the same score.
+    """
+    if space == "l2":
+        return 1.0 - distance / 2.0
+    return 1.0 - distance
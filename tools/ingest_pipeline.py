@@ -0,0 +1,240 @@
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterator, List, Tuple
+
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_classic.text_splitter import RecursiveCharacterTextSplitter
+
+logger = logging.getLogger(__name__)
+
+
+def load_pdf_pages(path: str) -> Tuple[List[Any], float]:
+    """
+    Parse one PDF into page documents
+
+    Module-level so it can be shipped to a worker process.
+
+    Returns:
+        (pages, seconds spent parsing)
+    """
+    start = time.perf_counter()
+    pages = PyPDFLoader(path).load()
+    for page in pages:
+        page.metadata['source_file'] = Path(path).name
+        page.metadata['file_type'] = 'pdf'
+    return pages, time.perf_counter() - start
+
+
+def iter_parsed_pdfs(items: List[Any], workers: int, path_of: Callable[[Any], Path] = Path) -> Iterator[Tuple[Any, Any, float]]:
+    """
+    Parse PDFs in parallel and yield them as they finish
+
+    At most ``2 * workers`` files are in flight, so parsed pages never pile up
+    faster than the consumer can split and embed them.
+
+    Args:
+        items: Files to parse (paths, or any objects ``path_of`` maps to a path)
+        workers: Number of worker processes; 1 parses inline
+        path_of: Maps an item to its PDF path
+
+    Yields:
+        (item, pages or the exception raised while parsing, parse seconds)
+    """
+    if workers <= 1 or len(items) <= 1:
+        for item in items:
+            try:
+                pages, seconds = load_pdf_pages(str(path_of(item)))
+                yield item, pages, seconds
+            except Exception as e:
+                yield item, e, 0.0
+        return
+
+    # spawn: forking a process that already holds torch / Chroma threads is not safe
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        queue = iter(items)
+        in_flight = {}
+
+        def submit_next():
+            item = next(queue, None)
+            if item is not None:
+                in_flight[pool.submit(load_pdf_pages, str(path_of(item)))] = item
+
+        for _ in range(2 * workers):
+            submit_next()
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = in_flight.pop(future)
+                submit_next()
+                try:
+                    pages, seconds = future.result()
+                    yield item, pages, seconds
+                except Exception as e:
+                    yield item, e, 0.0
+
+
+@dataclass
+class PipelineStats:
+    """Counters and per-stage busy time for one ingestion run"""
+    workers: int = 1
+    files: int = 0
+    failed_files: int = 0
+    pages: int = 0
+    chunks: int = 0
+    vectors: int = 0
+    embed_tokens: int = 0
+    parse_s: float = 0.0
+    split_s: float = 0.0
+    embed_s: float = 0.0
+    write_s: float = 0.0
+    wall_s: float = 0.0
+
+    @staticmethod
+    def _rate(count: int, seconds: float) -> float:
+        return count / seconds if seconds > 0 else 0.0
+
+    @property
+    def pages_per_s(self) -> float:
+        # Parse time is summed over workers that ran concurrently
+        return self._rate(self.pages, self.parse_s / max(self.workers, 1))
+
+    @property
+    def chunks_per_s(self) -> float:
+        return self._rate(self.chunks, self.split_s)
+
+    @property
+    def vectors_per_s(self) -> float:
+        return self._rate(self.vectors, self.embed_s + self.write_s)
+
+    @property
+    def embed_tokens_per_s(self) -> float:
+        return self._rate(self.embed_tokens, self.embed_s)
+
+    def report(self) -> str:
+        return (
+            f"Ingested {self.files} PDFs ({self.failed_files} failed) in {self.wall_s:.1f}s with {self.workers} workers\n"
+            f"  parse: {self.pages} pages   {self.pages_per_s:8.1f} pages/s\n"
+            f"  split: {self.chunks} chunks  {self.chunks_per_s:8.1f} chunks/s\n"
+            f"  embed+write: {self.vectors} vectors {self.vectors_per_s:8.1f} vectors/s "
+            f"(embed {self.embed_s:.1f}s, write {self.write_s:.1f}s)\n"
+            f"  embed: {self.embed_tokens} tokens {self.embed_tokens_per_s:8.1f} tokens/s"
+        )
+
+
+class IngestionPipeline:
+    """
+    Staged, bounded-memory PDF ingestion
+
+    A process pool parses PDFs in parallel, pages are split as each file
+    arrives, and chunks are embedded and written to the vector store in
+    fixed-size batches. Memory is bounded by the in-flight files plus one
+    batch, not by the corpus size.
+    """
+
+    def __init__(self, embedder, vstore, batch_size: int = 256, workers: int | None = None,
+                 chunk_size: int = 1000, chunk_overlap: int = 200):
+        """
+        Initialize the pipeline
+
+        Args:
+            embedder: EmbeddingManager used for the chunks
+            vstore: VectorStore the chunks are written to
+            batch_size: Chunks per embed/write batch
+            workers: Parser processes (defaults to the CPU count)
+            chunk_size: Splitter chunk size in characters
+            chunk_overlap: Splitter overlap in characters
+        """
+        self.embedder = embedder
+        self.vstore = vstore
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len,
+            separators=["\n\n", "\n", " ", ""], add_start_index=True
+        )
+
+    def run(self, items: List[Any], make_ids: Callable[[Any, List[Any]], List[str]],
+            on_file_done: Callable[[Any, List[str]], None] | None = None,
+            on_file_failed: Callable[[Any, Exception], None] | None = None,
+            path_of: Callable[[Any], Path] = Path) -> PipelineStats:
+        """
+        Ingest files into the vector store
+
+        Args:
+            items: Files to ingest (paths, or objects ``path_of`` maps to a path)
+            make_ids: Builds the chunk ids for a file's chunks
+            on_file_done: Called once every chunk of a file has been written
+            on_file_failed: Called when a file could not be parsed
+            path_of: Maps an item to its PDF path
+
+        Returns:
+            PipelineStats for the run
+        """
+        stats = PipelineStats(workers=min(self.workers, max(len(items), 1)))
+        started = time.perf_counter()
+
+        batch_chunks: List[Any] = []
+        batch_ids: List[str] = []
+        batch_id_set = set()
+        # Files whose chunks are all in the current batch or earlier ones; done after the next flush
+        pending_files: List[Tuple[Any, List[str]]] = []
+
+        def flush():
+            if batch_chunks:
+                t0 = time.perf_counter()
+                embeddings = self.embedder.generate_embeddings([chunk.page_content for chunk in batch_chunks])
+                t1 = time.perf_counter()
+                # Per-thread stats: query embeddings on the embedding service worker do not leak in
+                stats.embed_tokens += self.embedder.last_encode_stats.tokens
+                self.vstore.add_documents(batch_chunks, embeddings, ids=batch_ids)
+                stats.embed_s += t1 - t0
+                stats.write_s += time.perf_counter() - t1
+                stats.vectors += len(batch_chunks)
+                batch_chunks.clear()
+                batch_ids.clear()
+                batch_id_set.clear()
+            for item, ids in pending_files:
+                if on_file_done:
+                    on_file_done(item, ids)
+            pending_files.clear()
+
+        for item, pages, parse_s in iter_parsed_pdfs(items, stats.workers, path_of):
+            if isinstance(pages, Exception):
+                stats.failed_files += 1
+                logger.error("Error loading %s: %s", path_of(item).name, pages)
+                if on_file_failed:
+                    on_file_failed(item, pages)
+                continue
+
+            stats.files += 1
+            stats.pages += len(pages)
+            stats.parse_s += parse_s
+
+            t0 = time.perf_counter()
+            chunks = self.text_splitter.split_documents(pages)
+            ids = make_ids(item, chunks)
+            stats.split_s += time.perf_counter() - t0
+            stats.chunks += len(chunks)
+            del pages
+
+            for chunk, chunk_id in zip(chunks, ids):
+                # Byte-identical PDFs produce the same ids; a single upsert must not repeat one
+                if chunk_id in batch_id_set:
+                    continue
+                batch_id_set.add(chunk_id)
+                batch_chunks.append(chunk)
+                batch_ids.append(chunk_id)
+                if len(batch_chunks) >= self.batch_size:
+                    flush()
+            pending_files.append((item, ids))
+
+        flush()
+        stats.wall_s = time.perf_counter() - started
+        return stats
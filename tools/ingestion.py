@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Any, Tuple
+
+# manifest path -> (mtime_ns, version) for IngestionManifest.read_version
+_version_cache: Dict[Path, Tuple[int, str]] = {}
+
+
+def file_sha256(path, block_size: int = 1 << 20) -> str:
+    """Hash a file's bytes in blocks so large PDFs are never fully loaded into memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_chunk_id(file_hash: str, page: int, offset: int) -> str:
+    """Deterministic chunk id: the same bytes always produce the same ids, so re-ingest upserts."""
+    return f"{file_hash[:16]}_p{page}_o{offset}"
+
+
+def make_content_chunk_id(metadata: Dict[str, Any], text: str) -> str:
+    """Deterministic id for a chunk whose file hash is unknown: its source, position and content."""
+    source = metadata.get('source_file') or metadata.get('source') or ""
+    key = "\x1f".join([str(source), str(metadata.get('page', "")), str(metadata.get('start_index', "")), text])
+    return "c_" + hashlib.blake2b(key.encode("utf-8"), digest_size=12).hexdigest()
+
+
+@dataclass
+class PendingFile:
+    """A PDF that needs to be (re)parsed and embedded."""
+    relpath: str
+    path: Path
+    file_hash: str
+    mtime: float
+    size: int
+
+
+@dataclass
+class IngestionPlan:
+    """What an incremental ingest run has to do."""
+    to_ingest: List[PendingFile] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.to_ingest and not self.removed
+
+
+class IngestionManifest:
+    """
+    Per-file record of what has been embedded into a collection.
+
+    Each entry stores the file's content hash, mtime, size and the ids of its
+    chunks. Files whose size and mtime are unchanged are not even re-hashed; files
+    whose hash is unchanged are not re-parsed.
+    """
+
+    def __init__(self, persist_directory, collection_name: str):
+        self.path = Path(persist_directory) / f"{collection_name}.manifest.json"
+        self.exists = self.path.exists()
+        self.files: Dict[str, Dict[str, Any]] = {}
+        if self.exists:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+
+    @property
+    def version(self) -> str:
+        """Content-derived corpus version; changes whenever any file is added, changed or removed."""
+        digest = hashlib.sha256()
+        for relpath in sorted(self.files):
+            digest.update(f"{relpath}\0{self.files[relpath]['hash']}\n".encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    @staticmethod
+    def read_version(persist_directory, collection_name: str) -> str | None:
+        """
+        Version last saved for a collection, without loading the manifest into an instance
+
+        The file is only re-read when its mtime changes, so this is cheap enough
+        to call on every query. Returns None when no manifest exists.
+        """
+        path = Path(persist_directory) / f"{collection_name}.manifest.json"
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached = _version_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                version = json.load(f).get("version")
+        except (OSError, ValueError):
+            return None
+        _version_cache[path] = (mtime, version)
+        return version
+
+    def clear(self):
+        self.files = {}
+
+    def plan(self, pdf_files: List[Path], root: Path) -> IngestionPlan:
+        """Compare the files on disk with the manifest."""
+        plan = IngestionPlan()
+        seen = set()
+
+        for pdf_file in pdf_files:
+            relpath = pdf_file.relative_to(root).as_posix()
+            seen.add(relpath)
+            stat = pdf_file.stat()
+            entry = self.files.get(relpath)
+
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                plan.unchanged += 1
+                continue
+
+            file_hash = file_sha256(pdf_file)
+            if entry and entry["hash"] == file_hash:
+                # Touched but not modified: refresh the stat fields only
+                entry["mtime"] = stat.st_mtime
+                entry["size"] = stat.st_size
+                plan.unchanged += 1
+                continue
+
+            plan.to_ingest.append(PendingFile(relpath, pdf_file, file_hash, stat.st_mtime, stat.st_size))
+
+        plan.removed = [relpath for relpath in self.files if relpath not in seen]
+        return plan
+
+    def stale_chunk_ids(self, relpaths: List[str]) -> List[str]:
+        """
+        Chunk ids owned by ``relpaths`` that no other file still references.
+
+        Byte-identical copies of a PDF share chunk ids, so removing one copy must
+        not delete the chunks the other copy still needs.
+        """
+        relpaths = set(relpaths)
+        still_used = set()
+        for relpath, entry in self.files.items():
+            if relpath not in relpaths:
+                still_used.update(entry["chunk_ids"])
+
+        stale = []
+        for relpath in relpaths:
+            entry = self.files.get(relpath)
+            if entry:
+                stale.extend(cid for cid in entry["chunk_ids"] if cid not in still_used)
+        return stale
+
+    def record(self, pending: PendingFile, chunk_ids: List[str]):
+        self.files[pending.relpath] = {
+            "hash": pending.file_hash,
+            "mtime": pending.mtime,
+            "size": pending.size,
+            "chunk_ids": chunk_ids,
+        }
+
+    def forget(self, relpath: str):
+        self.files.pop(relpath, None)
+
+    def save(self):
+        """Write atomically so an interrupted ingest never leaves a half-written manifest."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "files": self.files}, f)
+        os.replace(tmp_path, self.path)
+        self.exists = True
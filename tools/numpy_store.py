@@ -0,0 +1,657 @@
+"""
+Embedded, pure-NumPy vector collection
+
+A drop-in for the part of the ChromaDB client / collection API that
+VectorStore uses. Each collection is a directory holding:
+
+  - embeddings-<n>.npy: unit-length float32 (or float16) vectors, memory-mapped;
+    rows are appended in place and the file doubles in capacity when full
+  - segment-<n>.npz: one per write, columnar: ids, documents (a UTF-8 blob
+    plus offsets) and one typed column per metadata key
+  - state.json: row count, capacity and the list of live files; rewriting it
+    is the commit point of every write
+
+Queries are exact: one matrix product against every stored vector, then
+``argpartition`` for the top k. ``where`` filters become boolean masks over
+cached metadata columns; equality filters on the source keys first narrow
+the rows through per-value posting lists, so only those rows are scored.
+"""
+
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from tools.filtered_search import DEFAULT_MAX_PARTITIONS, filter_key
+
+NUMPY_DTYPES = ("float32", "float16")
+MAX_BATCH_SIZE = 100_000
+# Segments are merged (and deleted rows dropped) once a collection has this many
+COMPACT_AFTER_SEGMENTS = 32
+# Metadata keys with per-value posting lists (equality / $in filters on them skip the full scan)
+POSTING_KEYS = ("source_file", "source", "file_type")
+# float16 rows are scored in blocks so only one block is ever widened to float32
+SCORE_BLOCK_ROWS = 65536
+# Unlocked scoring passes a query makes before it scores while holding the lock
+QUERY_ATTEMPTS = 3
+
+_COMPARISONS = {
+    "$gt": np.greater, "$gte": np.greater_equal, "$lt": np.less, "$lte": np.less_equal,
+}
+
+
+# ------------------ COLUMN ENCODING ------------------
+def _pack_strings(values: Sequence[str]) -> Dict[str, np.ndarray]:
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return {"blob": np.frombuffer(b"".join(encoded), dtype=np.uint8), "offsets": offsets}
+
+
+def _unpack_strings(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    data = blob.tobytes()
+    bounds = offsets.tolist()
+    return [data[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(len(bounds) - 1)]
+
+
+def _column_kind(values: List[Any]) -> str:
+    present = [v for v in values if v is not None]
+    if all(isinstance(v, bool) for v in present):
+        return "bool"
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        return "int"
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return "float"
+    if all(isinstance(v, str) for v in present):
+        return "str"
+    return "json"
+
+
+def _encode_segment(rows: np.ndarray, ids: List[str], documents: List[Optional[str]],
+                    metadatas: List[Optional[Dict[str, Any]]]) -> Dict[str, np.ndarray]:
+    arrays = {"rows": rows.astype(np.int64)}
+    for prefix, values in (("ids", ids), ("documents", [d or "" for d in documents])):
+        for name, array in _pack_strings(values).items():
+            arrays[f"{prefix}_{name}"] = array
+    arrays["has_document"] = np.array([d is not None for d in documents], dtype=bool)
+
+    keys = sorted({key for metadata in metadatas if metadata for key in metadata})
+    arrays["meta_keys"] = np.array(keys, dtype=str)
+    kinds = []
+    for i, key in enumerate(keys):
+        values = [metadata.get(key) if metadata else None for metadata in metadatas]
+        kind = _column_kind(values)
+        kinds.append(kind)
+        arrays[f"meta{i}_present"] = np.array([v is not None for v in values], dtype=bool)
+        if kind in ("str", "json"):
+            text = [("" if v is None else v if kind == "str" else json.dumps(v)) for v in values]
+            for name, array in _pack_strings(text).items():
+                arrays[f"meta{i}_{name}"] = array
+        else:
+            dtype = {"bool": bool, "int": np.int64, "float": np.float64}[kind]
+            arrays[f"meta{i}_values"] = np.array([0 if v is None else v for v in values], dtype=dtype)
+    arrays["meta_kinds"] = np.array(kinds, dtype=str)
+    return arrays
+
+
+def _decode_segment(arrays) -> tuple:
+    ids = _unpack_strings(arrays["ids_blob"], arrays["ids_offsets"])
+    documents = _unpack_strings(arrays["documents_blob"], arrays["documents_offsets"])
+    documents = [d if has else None for d, has in zip(documents, arrays["has_document"].tolist())]
+    metadatas: List[Dict[str, Any]] = [{} for _ in ids]
+    for i, (key, kind) in enumerate(zip(arrays["meta_keys"].tolist(), arrays["meta_kinds"].tolist())):
+        if kind in ("str", "json"):
+            values = _unpack_strings(arrays[f"meta{i}_blob"], arrays[f"meta{i}_offsets"])
+            if kind == "json":
+                values = [json.loads(v) if v else None for v in values]
+        else:
+            values = arrays[f"meta{i}_values"].tolist()
+        for metadata, present, value in zip(metadatas, arrays[f"meta{i}_present"].tolist(), values):
+            if present:
+                metadata[key] = value
+    return arrays["rows"], ids, documents, [m or None for m in metadatas]
+
+
+# ------------------ COLLECTION ------------------
+class NumpyCollection:
+    """One collection: memory-mapped vectors plus columnar text / metadata segments"""
+
+    def __init__(self, directory: Path, name: str, metadata: Optional[Dict[str, Any]] = None,
+                 dtype: str = "float32"):
+        if dtype not in NUMPY_DTYPES:
+            raise ValueError(f"Unsupported vector dtype '{dtype}'; expected one of {NUMPY_DTYPES}")
+        self.name = name
+        self.directory = Path(directory)
+        self.configuration: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self._columns: Dict[str, np.ndarray] = {}
+        self._numeric_columns: Dict[str, np.ndarray] = {}
+        self._postings: Dict[str, Dict[Any, np.ndarray]] = {}
+        self._selections: Dict[str, np.ndarray] = {}
+        # Bumped whenever a row stops holding the chunk it held (delete, compaction)
+        self._layout_version = 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        state_path = self.directory / "state.json"
+        if state_path.exists():
+            with open(state_path, "r", encoding="utf-8") as f:
+                self._state = json.load(f)
+        else:
+            self._state = {"dtype": dtype, "dim": None, "count": 0, "capacity": 0, "generation": 0,
+                           "embeddings": None, "segments": [], "metadata": metadata or {}}
+            self._save_state()
+        self.metadata = self._state["metadata"]
+        self._load()
+
+    # ------------------ PERSISTENCE ------------------
+    def _save_state(self):
+        tmp = self.directory / "state.json.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._state, f)
+        os.replace(tmp, self.directory / "state.json")
+
+    def _next_name(self, stem: str, suffix: str) -> str:
+        self._state["generation"] += 1
+        return f"{stem}-{self._state['generation']}{suffix}"
+
+    def _load(self):
+        count = self._state["count"]
+        self._embeddings = None
+        if self._state["embeddings"]:
+            self._embeddings = np.load(self.directory / self._state["embeddings"], mmap_mode="r+")
+        capacity = self._state["capacity"]
+        self._ids: List[Optional[str]] = [None] * capacity
+        self._documents: List[Optional[str]] = [None] * capacity
+        self._metadatas: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self._live = np.zeros(capacity, dtype=bool)
+        self._row_of: Dict[str, int] = {}
+
+        for segment in self._state["segments"]:
+            with np.load(self.directory / segment["file"]) as arrays:
+                if segment["kind"] == "delete":
+                    self._forget(_unpack_strings(arrays["ids_blob"], arrays["ids_offsets"]))
+                    continue
+                rows, ids, documents, metadatas = _decode_segment(arrays)
+            for row, doc_id, document, metadata in zip(rows.tolist(), ids, documents, metadatas):
+                self._set_row(row, doc_id, document, metadata)
+        self._count = count
+
+        # Files a crashed write left behind are not referenced by the state
+        referenced = {segment["file"] for segment in self._state["segments"]} | {self._state["embeddings"], "state.json"}
+        for path in self.directory.iterdir():
+            if path.name not in referenced:
+                path.unlink()
+
+    def _set_row(self, row: int, doc_id: str, document: Optional[str], metadata: Optional[Dict[str, Any]]):
+        self._ids[row] = doc_id
+        self._documents[row] = document
+        self._metadatas[row] = metadata
+        self._live[row] = True
+        self._row_of[doc_id] = row
+
+    def _forget(self, ids: List[str]) -> List[str]:
+        removed = []
+        for doc_id in ids:
+            row = self._row_of.pop(doc_id, None)
+            if row is not None:
+                self._live[row] = False
+                self._ids[row] = self._documents[row] = self._metadatas[row] = None
+                removed.append(doc_id)
+        if removed:
+            self._layout_version += 1
+        return removed
+
+    def _write_segment(self, kind: str, arrays: Dict[str, np.ndarray]):
+        name = self._next_name("segment", ".npz")
+        with open(self.directory / name, "wb") as f:
+            np.savez(f, **arrays)
+        self._state["segments"].append({"file": name, "kind": kind})
+
+    def _ensure_capacity(self, rows: int, dim: int):
+        if self._state["dim"] is None:
+            self._state["dim"] = dim
+        elif dim != self._state["dim"]:
+            raise ValueError(f"Embedding dimension {dim} does not match the collection ({self._state['dim']})")
+        if rows <= self._state["capacity"]:
+            return
+        capacity = max(1024, 2 * rows)
+        name = self._next_name("embeddings", ".npy")
+        grown = np.lib.format.open_memmap(self.directory / name, mode="w+", dtype=self._state["dtype"],
+                                          shape=(capacity, dim))
+        if self._embeddings is not None:
+            grown[:self._count] = self._embeddings[:self._count]
+        grown.flush()
+        old = self._state["embeddings"]
+        self._embeddings = grown
+        self._state["embeddings"] = name
+        self._state["capacity"] = capacity
+        extra = capacity - len(self._ids)
+        self._ids.extend([None] * extra)
+        self._documents.extend([None] * extra)
+        self._metadatas.extend([None] * extra)
+        self._live = np.concatenate([self._live, np.zeros(extra, dtype=bool)])
+        self._save_state()
+        if old:
+            (self.directory / old).unlink(missing_ok=True)
+
+    def _compact(self):
+        """Rewrite live rows into one embeddings file and one segment"""
+        rows = np.flatnonzero(self._live[:self._count])
+        vectors = np.asarray(self._embeddings[rows]) if self._embeddings is not None else None
+        ids = [self._ids[r] for r in rows.tolist()]
+        documents = [self._documents[r] for r in rows.tolist()]
+        metadatas = [self._metadatas[r] for r in rows.tolist()]
+        old_files = [segment["file"] for segment in self._state["segments"]] + [self._state["embeddings"]]
+
+        self._layout_version += 1
+        self._embeddings = None
+        self._state.update(count=0, capacity=0, embeddings=None, segments=[])
+        self._ids, self._documents, self._metadatas = [], [], []
+        self._live = np.zeros(0, dtype=bool)
+        self._row_of = {}
+        self._count = 0
+        if len(ids):
+            self._append(ids, vectors, documents, metadatas)
+        else:
+            self._save_state()
+        for name in old_files:
+            if name:
+                (self.directory / name).unlink(missing_ok=True)
+
+    # ------------------ WRITES ------------------
+    @staticmethod
+    def _as_vectors(embeddings) -> np.ndarray:
+        vectors = np.array(embeddings, dtype=np.float32, ndmin=2)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _append(self, ids: List[str], vectors: np.ndarray, documents: List[Optional[str]],
+                metadatas: List[Optional[Dict[str, Any]]]):
+        rows = np.empty(len(ids), dtype=np.int64)
+        next_row = self._count
+        for i, doc_id in enumerate(ids):
+            row = self._row_of.get(doc_id)
+            if row is None:
+                row, next_row = next_row, next_row + 1
+            rows[i] = row
+        self._ensure_capacity(next_row, vectors.shape[1])
+
+        self._embeddings[rows] = vectors
+        self._embeddings.flush()
+        self._write_segment("rows", _encode_segment(rows, ids, documents, metadatas))
+        for row, doc_id, document, metadata in zip(rows.tolist(), ids, documents, metadatas):
+            self._set_row(row, doc_id, document, metadata)
+        self._count = next_row
+        self._state["count"] = next_row
+        self._save_state()
+        self._invalidate()
+
+    def upsert(self, ids: List[str], embeddings=None, metadatas=None, documents=None, **_):
+        """Insert rows, replacing any with the same id"""
+        if embeddings is None:
+            raise ValueError("The NumPy backend needs embeddings with every write")
+        ids = list(ids)
+        if len(set(ids)) != len(ids):
+            raise ValueError("Duplicate ids in one write")
+        vectors = self._as_vectors(embeddings)
+        if len(vectors) != len(ids):
+            raise ValueError("Number of embeddings must match number of ids")
+        documents = list(documents) if documents is not None else [None] * len(ids)
+        metadatas = [dict(m) if m else None for m in metadatas] if metadatas is not None else [None] * len(ids)
+        with self._lock:
+            self._append(ids, vectors, documents, metadatas)
+            if len(self._state["segments"]) > COMPACT_AFTER_SEGMENTS:
+                self._compact()
+
+    def add(self, ids: List[str], embeddings=None, metadatas=None, documents=None, **_):
+        """Insert rows; ids that already exist are skipped (as Chroma does)"""
+        with self._lock:
+            keep = [i for i, doc_id in enumerate(ids) if doc_id not in self._row_of]
+        if len(keep) == len(ids):
+            return self.upsert(ids, embeddings, metadatas, documents)
+        pick = lambda values: None if values is None else [values[i] for i in keep]
+        if keep:
+            self.upsert(pick(list(ids)), np.asarray(embeddings)[keep], pick(metadatas), pick(documents))
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None, **_):
+        """Remove rows by id and / or metadata filter"""
+        with self._lock:
+            if where is not None:
+                matched = [self._ids[r] for r in self._select(where, None).tolist()]
+                ids = matched if ids is None else list(set(ids).intersection(matched))
+            removed = self._forget(list(ids or []))
+            if not removed:
+                return
+            self._write_segment("delete", {f"ids_{k}": v for k, v in _pack_strings(removed).items()})
+            self._save_state()
+            self._invalidate()
+            deleted = self._count - int(self._live[:self._count].sum())
+            if len(self._state["segments"]) > COMPACT_AFTER_SEGMENTS or deleted > max(1024, self._count // 4):
+                self._compact()
+
+    # ------------------ FILTERS ------------------
+    # Filters are evaluated over a set of candidate rows. An equality / $in clause on a
+    # posting key narrows the candidates to that value's rows first, so a query restricted
+    # to one source document only touches (and scores) that document's rows.
+    def _invalidate(self):
+        self._columns.clear()
+        self._numeric_columns.clear()
+        self._postings.clear()
+        self._selections.clear()
+
+    def _column(self, key: str) -> np.ndarray:
+        column = self._columns.get(key)
+        if column is None:
+            column = np.empty(self._count, dtype=object)
+            column[:] = [m.get(key) if m else None for m in self._metadatas[:self._count]]
+            self._columns[key] = column
+        return column
+
+    def _numeric_column(self, key: str) -> np.ndarray:
+        column = self._numeric_columns.get(key)
+        if column is None:
+            column = np.array([v if isinstance(v, (int, float)) and not isinstance(v, bool) else np.nan
+                               for v in self._column(key)], dtype=np.float64)
+            self._numeric_columns[key] = column
+        return column
+
+    def _posting(self, key: str) -> Dict[Any, np.ndarray]:
+        """Rows (ascending) holding each value of ``key``"""
+        postings = self._postings.get(key)
+        if postings is None:
+            grouped: Dict[Any, List[int]] = {}
+            for row, value in enumerate(self._column(key).tolist()):
+                if value is not None:
+                    grouped.setdefault(value, []).append(row)
+            postings = {value: np.array(rows, dtype=np.int64) for value, rows in grouped.items()}
+            self._postings[key] = postings
+        return postings
+
+    def _posting_rows(self, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Candidate rows from the posting lists of ``where``'s equality clauses; None means every row"""
+        if not where:
+            return None
+        clauses = [{key: condition} for key, condition in where.items() if key != "$and"]
+        clauses.extend(where.get("$and", []))
+        candidates = None
+        for clause in clauses:
+            if len(clause) != 1:
+                continue
+            (key, condition), = clause.items()
+            if key not in POSTING_KEYS:
+                continue
+            if not isinstance(condition, dict):
+                values = [condition]
+            elif list(condition) == ["$eq"]:
+                values = [condition["$eq"]]
+            elif list(condition) == ["$in"]:
+                values = list(condition["$in"])
+            else:
+                continue
+            postings = self._posting(key)
+            parts = [postings[v] for v in values if v in postings]
+            rows = np.unique(np.concatenate(parts)) if len(parts) > 1 else (parts[0] if parts else np.zeros(0, np.int64))
+            candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+        return candidates
+
+    def _condition(self, key: str, condition, rows: Optional[np.ndarray]) -> np.ndarray:
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        pick = (lambda column: column) if rows is None else (lambda column: column[rows])
+        size = self._count if rows is None else len(rows)
+        mask = np.ones(size, dtype=bool)
+        for operator, value in condition.items():
+            if operator in _COMPARISONS:
+                with np.errstate(invalid="ignore"):
+                    mask &= _COMPARISONS[operator](pick(self._numeric_column(key)), value)
+            elif operator in ("$eq", "$ne"):
+                equal = pick(self._column(key)) == value
+                mask &= equal if operator == "$eq" else ~equal
+            elif operator in ("$in", "$nin"):
+                column = pick(self._column(key))
+                found = np.zeros(size, dtype=bool)
+                for item in value:
+                    found |= column == item
+                mask &= found if operator == "$in" else ~found
+            else:
+                raise ValueError(f"Unsupported where operator '{operator}'")
+        return mask
+
+    def _where_mask(self, where: Dict[str, Any], rows: Optional[np.ndarray]) -> np.ndarray:
+        size = self._count if rows is None else len(rows)
+        mask = np.ones(size, dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self._where_mask(clause, rows)
+            elif key == "$or":
+                any_mask = np.zeros(size, dtype=bool)
+                for clause in condition:
+                    any_mask |= self._where_mask(clause, rows)
+                mask &= any_mask
+            else:
+                mask &= self._condition(key, condition, rows)
+        return mask
+
+    def _document_mask(self, where_document: Dict[str, Any], rows: Optional[np.ndarray]) -> np.ndarray:
+        rows_list = range(self._count) if rows is None else rows.tolist()
+        mask = np.ones(len(rows_list), dtype=bool)
+        for operator, value in where_document.items():
+            if operator in ("$and", "$or"):
+                parts = [self._document_mask(clause, rows) for clause in value]
+                mask &= np.logical_and.reduce(parts) if operator == "$and" else np.logical_or.reduce(parts)
+            elif operator in ("$contains", "$not_contains"):
+                found = np.fromiter((value in (self._documents[r] or "") for r in rows_list), dtype=bool,
+                                    count=len(rows_list))
+                mask &= found if operator == "$contains" else ~found
+            else:
+                raise ValueError(f"Unsupported where_document operator '{operator}'")
+        return mask
+
+    def _select(self, where, where_document) -> np.ndarray:
+        """Live rows (ascending) that pass both filters; remembered until the next write"""
+        key = filter_key(where, where_document)
+        rows = self._selections.get(key)
+        if rows is None:
+            rows = self._evaluate(where, where_document)
+            if len(self._selections) >= DEFAULT_MAX_PARTITIONS:
+                self._selections.pop(next(iter(self._selections)))
+            self._selections[key] = rows
+        return rows
+
+    def _evaluate(self, where, where_document) -> np.ndarray:
+        rows = self._posting_rows(where)
+        if rows is None:
+            rows = np.flatnonzero(self._live[:self._count])
+        else:
+            rows = rows[self._live[rows]]
+        if where:
+            rows = rows[self._where_mask(where, rows)]
+        if where_document:
+            rows = rows[self._document_mask(where_document, rows)]
+        return rows
+
+    # ------------------ READS ------------------
+    @property
+    def dtype(self) -> str:
+        """Storage dtype of the vectors (fixed when the collection is created)"""
+        return self._state["dtype"]
+
+    def count(self) -> int:
+        return len(self._row_of)
+
+    def _rows_result(self, rows: List[int], include) -> Dict[str, Any]:
+        return {
+            "ids": [self._ids[r] for r in rows],
+            "embeddings": (np.asarray(self._embeddings[rows], dtype=np.float32)
+                           if "embeddings" in include and self._embeddings is not None else None),
+            "documents": [self._documents[r] for r in rows] if "documents" in include else None,
+            "metadatas": ([dict(self._metadatas[r]) if self._metadatas[r] else None for r in rows]
+                          if "metadatas" in include else None),
+            "included": list(include),
+        }
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            where_document: Optional[Dict[str, Any]] = None,
+            include: Sequence[str] = ("metadatas", "documents"), **_) -> Dict[str, Any]:
+        """Rows by id and / or filter, in insertion order"""
+        with self._lock:
+            if ids is not None:
+                rows = [self._row_of[doc_id] for doc_id in ids if doc_id in self._row_of]
+                if where or where_document:
+                    allowed = set(self._select(where, where_document).tolist())
+                    rows = [r for r in rows if r in allowed]
+            else:
+                rows = self._select(where, where_document).tolist()
+            start = offset or 0
+            rows = rows[start:start + limit if limit is not None else None]
+            return self._rows_result(rows, include)
+
+    @staticmethod
+    def _score(matrix: np.ndarray, rows: Optional[np.ndarray], queries: np.ndarray) -> np.ndarray:
+        """(len(rows), n_queries) cosine scores; float16 rows are widened one block at a time"""
+        if rows is None and matrix.dtype == np.float32:
+            return matrix @ queries.T
+        size = len(matrix) if rows is None else len(rows)
+        scores = np.empty((size, len(queries)), dtype=np.float32)
+        for start in range(0, size, SCORE_BLOCK_ROWS):
+            stop = min(start + SCORE_BLOCK_ROWS, size)
+            block = matrix[start:stop] if rows is None else matrix[rows[start:stop]]
+            scores[start:stop] = np.asarray(block, dtype=np.float32) @ queries.T
+        return scores
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int, allowed: Optional[np.ndarray], candidates: int) -> np.ndarray:
+        """Indices of the k best scores, best first, among ``allowed`` (a boolean mask) if given"""
+        size = len(scores)
+        fetch = k if allowed is None else min(size, 2 * k * size // max(candidates, 1) + k)
+        top = np.argpartition(-scores, fetch - 1)[:fetch] if fetch < size else np.arange(size)
+        if allowed is not None:
+            top = top[allowed[top]]
+            if len(top) < k:
+                # Unlucky over-fetch: rank the selected rows in full
+                top = np.flatnonzero(allowed)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return top[:k]
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[Dict[str, Any]] = None,
+              where_document: Optional[Dict[str, Any]] = None,
+              include: Sequence[str] = ("metadatas", "documents", "distances"), **_) -> Dict[str, Any]:
+        """Exact cosine top-k for each query, in the shape of a Chroma QueryResult"""
+        queries = self._as_vectors(query_embeddings)
+        for _ in range(QUERY_ATTEMPTS - 1):
+            result = self._query(queries, n_results, where, where_document, include)
+            if result is not None:
+                return result
+        # Writers keep renumbering rows under us: score while holding the lock
+        with self._lock:
+            return self._query(queries, n_results, where, where_document, include)
+
+    def _query(self, queries: np.ndarray, n_results: int, where, where_document,
+               include: Sequence[str]) -> Optional[Dict[str, Any]]:
+        """
+        One query attempt; scoring runs outside the lock so writers are not blocked
+
+        Returns None if a delete or compaction changed the row layout in the
+        meantime, since the scored row numbers may then belong to other chunks.
+        """
+        with self._lock:
+            layout = self._layout_version
+            count = self._count
+            matrix = self._embeddings[:count] if self._embeddings is not None else None
+            live = self._live[:count]
+            if where or where_document:
+                rows = self._select(where, where_document)
+            else:
+                # Unfiltered: score every row and mask the deleted ones rather than gathering the live ones
+                rows = None if live.all() else np.flatnonzero(live)
+
+        keys = ("ids", "embeddings", "documents", "metadatas", "distances")
+        result: Dict[str, Any] = {key: [] for key in keys}
+        candidates = count if rows is None else len(rows)
+        if matrix is None or candidates == 0:
+            for _ in range(len(queries)):
+                for key in keys:
+                    result[key].append([])
+        else:
+            # A selection covering most rows is cheaper to score in full than to gather: take an
+            # over-fetched top-k of every row and keep the selected ones
+            allowed = None
+            if rows is not None and len(rows) > count // 2:
+                allowed = np.zeros(count, dtype=bool)
+                allowed[rows] = True
+                rows = None
+            scores = self._score(matrix, rows, queries)
+            k = min(n_results, candidates)
+            tops = []
+            for column in range(len(queries)):
+                column_scores = scores[:, column]
+                top = self._top_k(column_scores, k, allowed, candidates)
+                tops.append(top if rows is None else rows[top])
+                result["distances"].append((1.0 - column_scores[top]).tolist())
+            with self._lock:
+                if self._layout_version != layout:
+                    return None
+                found = [self._rows_result(top.tolist(), include) for top in tops]
+            for key in ("ids", "embeddings", "documents", "metadatas"):
+                result[key] = [f[key] for f in found]
+
+        for key in ("embeddings", "documents", "metadatas", "distances"):
+            if key not in include:
+                result[key] = None
+        result["included"] = list(include)
+        return result
+
+
+# ------------------ CLIENT ------------------
+class NumpyClient:
+    """Chroma-client-shaped factory for NumpyCollections under one directory"""
+
+    def __init__(self, path, dtype: str = "float32"):
+        self.path = Path(path)
+        self.dtype = dtype
+        self._collections: Dict[str, NumpyCollection] = {}
+        self._lock = threading.Lock()
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def _directory(self, name: str) -> Path:
+        return self.path / f"{name}.numpy"
+
+    def get_max_batch_size(self) -> int:
+        return MAX_BATCH_SIZE
+
+    def get_collection(self, name: str) -> NumpyCollection:
+        with self._lock:
+            if name not in self._collections:
+                if not (self._directory(name) / "state.json").exists():
+                    raise ValueError(f"Collection {name} does not exist")
+                self._collections[name] = NumpyCollection(self._directory(name), name)
+            return self._collections[name]
+
+    def create_collection(self, name: str, configuration=None, metadata=None, **_) -> NumpyCollection:
+        with self._lock:
+            if (self._directory(name) / "state.json").exists():
+                raise ValueError(f"Collection {name} already exists")
+            collection = NumpyCollection(self._directory(name), name, metadata=metadata, dtype=self.dtype)
+            self._collections[name] = collection
+            return collection
+
+    def get_or_create_collection(self, name: str, configuration=None, metadata=None, **_) -> NumpyCollection:
+        try:
+            return self.get_collection(name)
+        except ValueError:
+            return self.create_collection(name, metadata=metadata)
+
+    def delete_collection(self, name: str):
+        with self._lock:
+            self._collections.pop(name, None)
+            shutil.rmtree(self._directory(name), ignore_errors=True)
+
+    def list_collections(self) -> List[NumpyCollection]:
+        names = sorted(p.name[:-len(".numpy")] for p in self.path.glob("*.numpy") if (p / "state.json").exists())
+        return [self.get_collection(name) for name in names]
@@ -0,0 +1,215 @@
+"""
+ONNX Runtime backend for sentence embeddings.
+
+The SentenceTransformer is exported once (torch is only needed for that
+step) to data/onnx_models/<model>/, optionally with a dynamically
+int8-quantized copy. Later loads need only onnxruntime and tokenizers, so
+they skip the torch import entirely. Inputs use dynamic batch and sequence
+axes: each batch is padded only to its own longest text.
+
+Export and quantization need the ``onnx`` package; inference does not.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ONNX_BACKENDS = ("onnx", "onnx-int8")
+DEFAULT_ONNX_DIRECTORY = Path(__file__).resolve().parent.parent / "data" / "onnx_models"
+INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+
+def onnx_model_directory(model_name: str, root=DEFAULT_ONNX_DIRECTORY) -> Path:
+    """Export directory for a model name or local path"""
+    return Path(root) / re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name.strip("/"))
+
+
+def export_onnx(model_name: str, out_dir: Path, quantize: bool = True, opset: int = 17) -> Path:
+    """
+    Export a SentenceTransformer's transformer to ONNX
+
+    Writes model.onnx (and model.int8.onnx when ``quantize``), the tokenizer
+    and pooling.json describing pooling / normalization.
+
+    Returns:
+        The export directory
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    logger.info("Exporting %s to ONNX in %s ...", model_name, out_dir)
+    st = SentenceTransformer(model_name, device="cpu")
+    transformer = st[0].auto_model.eval()
+    tokenizer = st.tokenizer
+
+    legacy_modes = {"pooling_mode_cls_token": "cls", "pooling_mode_max_tokens": "max",
+                    "pooling_mode_mean_tokens": "mean"}
+    pooling_mode = "mean"
+    normalize = False
+    for module in list(st)[1:]:
+        config = module.get_config_dict() if hasattr(module, "get_config_dict") else {}
+        if "pooling_mode" in config:
+            pooling_mode = config["pooling_mode"]
+        else:
+            pooling_mode = next((mode for key, mode in legacy_modes.items() if config.get(key)), pooling_mode)
+        if type(module).__name__ == "Normalize":
+            normalize = True
+    if pooling_mode not in ("mean", "cls", "max"):
+        raise ValueError(f"Pooling mode '{pooling_mode}' of {model_name} is not supported by the ONNX backend")
+
+    class _LastHiddenState(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask,
+                              token_type_ids=token_type_ids).last_hidden_state
+
+    # Sample inputs of different lengths so padding is part of the traced graph
+    sample = tokenizer(["an example sentence for tracing", "short"], padding=True, return_tensors="pt")
+    if "token_type_ids" not in sample:
+        sample["token_type_ids"] = torch.zeros_like(sample["input_ids"])
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in (*INPUT_NAMES, "last_hidden_state")}
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            _LastHiddenState(transformer), tuple(sample[name] for name in INPUT_NAMES), str(out_dir / "model.onnx"),
+            input_names=list(INPUT_NAMES), output_names=["last_hidden_state"], dynamic_axes=dynamic_axes,
+            opset_version=opset, dynamo=False,
+        )
+    tokenizer.save_pretrained(str(out_dir))
+    with open(out_dir / "pooling.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "pooling_mode": pooling_mode,
+            "normalize": normalize,
+            "max_seq_length": st.max_seq_length,
+            "dimension": st.get_sentence_embedding_dimension(),
+        }, f, indent=2)
+
+    if quantize:
+        quantize_onnx(out_dir)
+    return out_dir
+
+
+def quantize_onnx(out_dir: Path) -> Path:
+    """Dynamic int8 weight quantization of model.onnx -> model.int8.onnx"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    target = out_dir / "model.int8.onnx"
+    quantize_dynamic(str(out_dir / "model.onnx"), str(target), weight_type=QuantType.QInt8)
+    return target
+
+
+class OnnxSentenceEncoder:
+    """
+    Drop-in replacement for the parts of SentenceTransformer that EmbeddingManager uses
+
+    Runs the exported transformer with onnxruntime and applies the same pooling
+    and normalization as the original model.
+    """
+
+    def __init__(self, model_name: str, quantized: bool = False, threads: Optional[int] = None,
+                 root=DEFAULT_ONNX_DIRECTORY, batch_size: int = 32):
+        """
+        Load (exporting first if needed) an ONNX encoder
+
+        Args:
+            model_name: SentenceTransformer name or path
+            quantized: Use the int8-quantized graph
+            threads: onnxruntime intra-op threads (default: onnxruntime's choice)
+            root: Directory holding exported models
+            batch_size: Texts per forward pass
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        self.quantized = quantized
+        self.batch_size = batch_size
+        self.model_dir = onnx_model_directory(model_name, root)
+
+        graph = self.model_dir / ("model.int8.onnx" if quantized else "model.onnx")
+        if not (self.model_dir / "model.onnx").exists():
+            export_onnx(model_name, self.model_dir, quantize=quantized)
+        elif quantized and not graph.exists():
+            quantize_onnx(self.model_dir)
+
+        with open(self.model_dir / "pooling.json", "r", encoding="utf-8") as f:
+            self.pooling = json.load(f)
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(graph), sess_options=options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+        self._tokenizer = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=self.pooling["max_seq_length"])
+        # Pad each batch to its own longest sequence (dynamic shapes)
+        pad_token = "[PAD]"
+        config_path = self.model_dir / "tokenizer_config.json"
+        if config_path.exists():
+            with open(config_path, "r", encoding="utf-8") as f:
+                pad_token = json.load(f).get("pad_token") or pad_token
+        pad_token = pad_token["content"] if isinstance(pad_token, dict) else pad_token
+        self._tokenizer.enable_padding(pad_id=self._tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token)
+        self._lock = threading.Lock()
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.pooling["dimension"]
+
+    def token_lengths(self, texts: List[str]) -> List[int]:
+        """Tokens per text after truncation, special tokens included"""
+        with self._lock:
+            encodings = self._tokenizer.encode_batch(texts)
+        return [sum(e.attention_mask) for e in encodings]
+
+    def _forward(self, texts: List[str]) -> np.ndarray:
+        with self._lock:
+            encodings = self._tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask,
+                 "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64)}
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self._input_names})[0]
+
+        mode = self.pooling["pooling_mode"]
+        if mode == "cls":
+            pooled = hidden[:, 0]
+        elif mode == "max":
+            pooled = np.where(attention_mask[..., None] > 0, hidden, -np.inf).max(axis=1)
+        else:
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.pooling["normalize"]:
+            pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.astype(np.float32, copy=False)
+
+    def encode(self, texts: List[str], batch_size: Optional[int] = None, show_progress_bar: bool = False,
+               **_) -> np.ndarray:
+        """Embed texts; same return shape as SentenceTransformer.encode"""
+        if isinstance(texts, str):
+            return self._forward([texts])[0]
+        batch_size = batch_size or self.batch_size
+        dimension = self.get_sentence_embedding_dimension()
+        if not texts:
+            return np.zeros((0, dimension), dtype=np.float32)
+        return np.vstack([self._forward(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)])
+
+
+def default_threads() -> Optional[int]:
+    """Thread count from AQUAINFO_ONNX_THREADS, if set"""
+    value = os.getenv("AQUAINFO_ONNX_THREADS")
+    return int(value) if value else None
@@ -0,0 +1,301 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from tools.tracing import span
+
+# Union of the columns used by the coordinator (aqualens.db) and the
+# introspection agent (memory.db); older tables are migrated by adding columns.
+COLUMNS = {
+    "reflection": "TEXT",
+    "created_at": "TEXT",
+    "query": "TEXT",
+    "answer": "TEXT",
+    "feedback": "TEXT",
+    "score": "INTEGER",
+}
+
+# Constant SQL text: sqlite3 keeps a per-connection cache of prepared
+# statements keyed by the SQL string, so these are compiled once per thread.
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS reflections (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        reflection TEXT,
+        created_at TEXT,
+        query TEXT,
+        answer TEXT,
+        feedback TEXT,
+        score INTEGER
+    )
+"""
+# id is the rowid (already the primary index); created_at gets its own index
+CREATE_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_reflections_created_at ON reflections (created_at)"
+# Reflection vectors live in their own table, one float32 blob per reflection
+CREATE_EMBEDDINGS_SQL = """
+    CREATE TABLE IF NOT EXISTS reflection_embeddings (
+        reflection_id INTEGER PRIMARY KEY REFERENCES reflections (id),
+        model TEXT NOT NULL,
+        vector BLOB NOT NULL
+    )
+"""
+INSERT_SQL = """
+    INSERT INTO reflections (reflection, created_at, query, answer, feedback, score)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+INSERT_EMBEDDING_SQL = "INSERT OR REPLACE INTO reflection_embeddings (reflection_id, model, vector) VALUES (?, ?, ?)"
+RECENT_SQL = "SELECT reflection FROM reflections ORDER BY id DESC LIMIT ?"
+LOAD_INDEX_SQL = """
+    SELECT r.id, r.created_at, e.vector FROM reflections r
+    JOIN reflection_embeddings e ON e.reflection_id = r.id
+    WHERE e.model = ? ORDER BY r.id
+"""
+UNEMBEDDED_SQL = """
+    SELECT r.id, r.reflection FROM reflections r
+    LEFT JOIN reflection_embeddings e ON e.reflection_id = r.id AND e.model = ?
+    WHERE e.reflection_id IS NULL AND r.reflection IS NOT NULL
+"""
+
+
+def _timestamp(created_at: Optional[str]) -> float:
+    """Epoch seconds for an ISO timestamp; NaN when missing (older introspection rows have none)."""
+    try:
+        return datetime.fromisoformat(created_at).timestamp()
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+class ReflectionStore:
+    """
+    SQLite reflection memory shared by the coordinator and the introspection agent.
+
+    Each thread reuses one connection in WAL mode (readers never block the
+    writer), writes are serialized in-process, and the last N reflections
+    are cached in memory until the next insert.
+
+    With an embedding manager attached, every reflection is embedded once at
+    insert time and ``relevant`` ranks reflections by similarity to the query,
+    decayed by age, using an in-memory matrix of the stored vectors.
+    """
+
+    def __init__(self, db_path, embedder=None, recent_cache_size: int = 20):
+        """
+        Initialize the store
+
+        Args:
+            db_path: SQLite database file
+            embedder: Optional EmbeddingManager used for relevance ranking
+            recent_cache_size: How many of the newest reflections to keep in memory
+        """
+        self.db_path = str(db_path)
+        self.embedder = embedder
+        self.recent_cache_size = recent_cache_size
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._recent: Optional[List[str]] = None
+
+        # Vector index: row i of _matrix is reflection _ids[i] (unit-normalized)
+        self._index_lock = threading.Lock()
+        self._ids: Optional[np.ndarray] = None
+        self._created: Optional[np.ndarray] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._size = 0
+        self._relevant_cache: "OrderedDict[tuple, List[str]]" = OrderedDict()
+
+        self._init_schema()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connection()
+        with self._write_lock, conn:
+            conn.execute(CREATE_TABLE_SQL)
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(reflections)")}
+            for column, column_type in COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE reflections ADD COLUMN {column} {column_type}")
+            conn.execute(CREATE_INDEX_SQL)
+            conn.execute(CREATE_EMBEDDINGS_SQL)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.asarray(self.embedder.generate_embeddings(texts), dtype=np.float32)
+        return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+    def add(self, reflection: str, query: str = None, answer: str = None,
+            feedback: str = None, score: int = None) -> int:
+        """
+        Insert a reflection (and its embedding, when an embedder is attached)
+
+        Returns:
+            The new row id
+        """
+        # Embed before taking the write lock so the forward pass never blocks other writers
+        vector = self._embed([reflection])[0] if self.embedder is not None and reflection else None
+        created_at = datetime.now().isoformat()
+
+        conn = self._connection()
+        with span("db.reflections.add"), self._write_lock, conn:
+            cur = conn.execute(INSERT_SQL, (reflection, created_at, query, answer, feedback, score))
+            reflection_id = cur.lastrowid
+            if vector is not None:
+                conn.execute(INSERT_EMBEDDING_SQL, (reflection_id, self.embedder.cache_namespace, vector.tobytes()))
+
+        with self._cache_lock:
+            self._recent = None
+            self._relevant_cache.clear()
+        if vector is not None:
+            with self._index_lock:
+                # A concurrent first load may already have picked this row up from the database
+                if self._matrix is not None and reflection_id not in self._ids[:self._size]:
+                    self._append(np.array([reflection_id]), np.array([_timestamp(created_at)]), vector[None, :])
+        return reflection_id
+
+    def recent(self, n: int = 3) -> List[str]:
+        """Newest ``n`` reflections, newest first (served from memory after the first read)."""
+        with self._cache_lock:
+            if self._recent is None or n > self.recent_cache_size:
+                with span("db.reflections.recent"):
+                    rows = self._connection().execute(RECENT_SQL, (max(n, self.recent_cache_size),)).fetchall()
+                self._recent = [r[0] for r in rows]
+            return self._recent[:n]
+
+    # ------------------ VECTOR INDEX ------------------
+    def _append(self, ids: np.ndarray, created: np.ndarray, vectors: np.ndarray):
+        """Append rows to the in-memory index, growing capacity geometrically. Caller holds the index lock."""
+        needed = self._size + len(ids)
+        if needed > len(self._ids):
+            capacity = max(needed, 2 * len(self._ids), 64)
+            self._ids = np.resize(self._ids, capacity)
+            self._created = np.resize(self._created, capacity)
+            matrix = np.zeros((capacity, vectors.shape[1]), dtype=np.float32)
+            if self._size:
+                matrix[:self._size] = self._matrix[:self._size]
+            self._matrix = matrix
+        self._ids[self._size:needed] = ids
+        self._created[self._size:needed] = created
+        self._matrix[self._size:needed] = vectors
+        self._size = needed
+
+    def _ensure_index(self):
+        """Load stored vectors and embed any reflections that have none yet. Caller holds the index lock."""
+        if self._matrix is not None:
+            return
+        namespace = self.embedder.cache_namespace
+        conn = self._connection()
+
+        # Backfill reflections written before embeddings existed (or by a different model)
+        missing = conn.execute(UNEMBEDDED_SQL, (namespace,)).fetchall()
+        for start in range(0, len(missing), 256):
+            batch = missing[start:start + 256]
+            vectors = self._embed([text for _, text in batch])
+            with self._write_lock, conn:
+                conn.executemany(
+                    INSERT_EMBEDDING_SQL,
+                    [(rid, namespace, vec.tobytes()) for (rid, _), vec in zip(batch, vectors)]
+                )
+
+        with span("db.reflections.load_index") as db_span:
+            rows = conn.execute(LOAD_INDEX_SQL, (namespace,)).fetchall()
+            db_span.set(rows=len(rows))
+        self._size = 0
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._created = np.zeros(0, dtype=np.float64)
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        if rows:
+            vectors = np.vstack([np.frombuffer(blob, dtype=np.float32) for _, _, blob in rows])
+            self._append(
+                np.array([rid for rid, _, _ in rows], dtype=np.int64),
+                np.array([_timestamp(created) for _, created, _ in rows], dtype=np.float64),
+                vectors,
+            )
+
+    def relevant(self, query: str, k: int = 3, half_life_days: float = 30.0,
+                 min_similarity: float = 0.3, recency_floor: float = 0.5) -> List[str]:
+        """
+        Reflections most relevant to ``query``
+
+        Score = cosine similarity x recency weight, where the weight decays from
+        1 towards ``recency_floor`` with the given half-life, so an old but highly
+        relevant reflection can still beat a new, loosely related one.
+
+        Args:
+            query: The user query
+            k: Maximum number of reflections to return
+            half_life_days: Age at which the recency bonus has halved
+            min_similarity: Reflections less similar than this are never returned
+            recency_floor: Weight of a very old reflection (and of rows without a timestamp)
+
+        Returns:
+            Up to ``k`` reflection texts, best first
+        """
+        if self.embedder is None:
+            return self.recent(k)
+
+        key = (query, k, half_life_days, min_similarity, recency_floor)
+        with self._cache_lock:
+            if key in self._relevant_cache:
+                self._relevant_cache.move_to_end(key)
+                return self._relevant_cache[key]
+
+        query_vector = self._embed([query])[0]
+        with self._index_lock:
+            self._ensure_index()
+            size = self._size
+            if size == 0:
+                return []
+            similarities = self._matrix[:size] @ query_vector
+            age_days = (time.time() - self._created[:size]) / 86400.0
+            decay = np.where(np.isnan(age_days), 0.0, 0.5 ** (np.maximum(age_days, 0.0) / half_life_days))
+            scores = similarities * (recency_floor + (1.0 - recency_floor) * decay)
+            scores[similarities < min_similarity] = -np.inf
+            ids = self._ids[:size]
+
+        top = min(k, size)
+        candidates = np.argpartition(-scores, top - 1)[:top]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        chosen = [int(ids[i]) for i in candidates if np.isfinite(scores[i])]
+
+        texts = []
+        if chosen:
+            placeholders = ",".join("?" * len(chosen))
+            with span("db.reflections.get", ids=len(chosen)):
+                rows = dict(self._connection().execute(
+                    f"SELECT id, reflection FROM reflections WHERE id IN ({placeholders})", chosen
+                ).fetchall())
+            texts = [rows[rid] for rid in chosen if rid in rows]
+
+        with self._cache_lock:
+            self._relevant_cache[key] = texts
+            while len(self._relevant_cache) > 64:
+                self._relevant_cache.popitem(last=False)
+        return texts
+
+
+_stores: Dict[str, ReflectionStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_reflection_store(db_path, embedder=None) -> ReflectionStore:
+    """Return the process-wide ReflectionStore for ``db_path``, attaching ``embedder`` if given."""
+    key = str(Path(db_path).resolve())
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = ReflectionStore(key, embedder=embedder)
+            _stores[key] = store
+        elif embedder is not None and store.embedder is None:
+            store.embedder = embedder
+        return store
@@ -0,0 +1,135 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from tools.tracing import span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+# Pairs in the timed calibration pass that seeds the per-pair cost estimate
+CALIBRATION_PAIRS = 16
+
+
+class CrossEncoderReranker:
+    """
+    Re-scores retrieved chunks with a cross-encoder that reads query and chunk together
+
+    Pairs are scored in batches on the CPU. With a latency budget the candidate
+    list is cut to what the measured per-pair cost allows before scoring starts,
+    and scoring stops early if a batch runs over; unscored candidates keep their
+    retrieval order behind the scored ones.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANKER_MODEL, batch_size: int = 64,
+                 max_length: int = 256, latency_budget_ms: Optional[float] = None):
+        """
+        Initialize the reranker
+
+        Args:
+            model_name: HuggingFace cross-encoder (ms-marco MiniLM is ~22M parameters)
+            batch_size: Pairs per forward pass; 64 scores a top-50 list in one pass
+            max_length: Token limit per (query, chunk) pair
+            latency_budget_ms: Default budget for ``rerank`` (None = unlimited)
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.latency_budget_ms = latency_budget_ms
+        self.model = None
+        # Exponential moving average of the cost of one pair, learned from real calls
+        self.ms_per_pair: Optional[float] = None
+        self.last_scored = 0
+        self._lock = threading.Lock()
+        self._load_model()
+
+    def _load_model(self):
+        """Load the cross-encoder"""
+        try:
+            from sentence_transformers import CrossEncoder
+
+            logger.info("Loading cross-encoder: %s", self.model_name)
+            self.model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+            # Warm-up pass: the first call pays one-off setup, so it is not timed
+            self._predict("warm up", ["warm up passage " * 16] * 8)
+            self._calibrate()
+        except Exception as e:
+            logger.error("Error loading cross-encoder %s: %s", self.model_name, e)
+            raise
+
+    def _calibrate(self):
+        """Seed ``ms_per_pair`` from a timed pass over chunk-sized passages that fill ``max_length``"""
+        passage = "Nitrate levels in groundwater exceed the guideline near agricultural land. " * 24
+        self.ms_per_pair = None
+        self.score("what are safe nitrate levels in drinking water", [passage] * min(self.batch_size, CALIBRATION_PAIRS))
+
+    def _observe(self, pairs: int, seconds: float):
+        cost = seconds * 1000.0 / max(pairs, 1)
+        self.ms_per_pair = cost if self.ms_per_pair is None else 0.8 * self.ms_per_pair + 0.2 * cost
+
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        """Cross-encoder relevance scores for (query, text) pairs, higher is better"""
+        if not texts:
+            return np.zeros(0, dtype=np.float32)
+        start = time.perf_counter()
+        scores = self._predict(query, texts)
+        self._observe(len(texts), time.perf_counter() - start)
+        return scores
+
+    def _predict(self, query: str, texts: List[str]) -> np.ndarray:
+        with self._lock:
+            scores = self.model.predict(
+                [(query, text) for text in texts], batch_size=self.batch_size, show_progress_bar=False
+            )
+        return np.asarray(scores, dtype=np.float32)
+
+    def rerank(self, query: str, candidates: List[Dict[str, Any]], top_k: int = 5,
+               latency_budget_ms: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Re-order retrieval results by cross-encoder score
+
+        Args:
+            query: The search query
+            candidates: Results from RAGRetriever, best first
+            top_k: Number of results to keep
+            latency_budget_ms: Overrides the default budget for this call
+
+        Returns:
+            The best ``top_k`` candidates, each with a 'rerank_score' (None if the
+            budget ran out before it was scored) and an updated 'rank'
+        """
+        budget = self.latency_budget_ms if latency_budget_ms is None else latency_budget_ms
+        if not candidates:
+            return []
+
+        limit = len(candidates)
+        if budget is not None and self.ms_per_pair:
+            # Never shrink below top_k: the budget trims the tail, it does not starve the prompt
+            limit = min(limit, max(top_k, int(budget / self.ms_per_pair)))
+
+        with span("rerank", candidates=len(candidates), limit=limit) as rerank_span:
+            start = time.perf_counter()
+            scores: List[float] = []
+            for offset in range(0, limit, self.batch_size):
+                batch = candidates[offset:min(offset + self.batch_size, limit)]
+                scores.extend(self.score(query, [doc['content'] for doc in batch]).tolist())
+                if budget is not None and (time.perf_counter() - start) * 1000.0 >= budget:
+                    break
+            rerank_span.set(scored=len(scores))
+
+        self.last_scored = len(scores)
+        order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        order += list(range(len(scores), len(candidates)))
+
+        reranked = []
+        for i in order[:top_k]:
+            doc = dict(candidates[i])
+            doc['retrieval_rank'] = doc.get('rank', i + 1)
+            doc['rerank_score'] = scores[i] if i < len(scores) else None
+            doc['rank'] = len(reranked) + 1
+            reranked.append(doc)
+        return reranked
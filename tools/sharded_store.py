@@ -0,0 +1,299 @@
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from tools.hnsw_config import distance_to_similarity
+from tools.RAG_tool import DEFAULT_COLLECTION_NAME, DEFAULT_PERSIST_DIRECTORY, VectorStore, WriteStats
+
+logger = logging.getLogger(__name__)
+
+SHARDING_STRATEGIES = ("source", "region", "hash")
+DEFAULT_HASH_SHARDS = 8
+DEFAULT_FAN_OUT_WORKERS = 8
+
+
+def shard_slug(value: str) -> str:
+    """A value as a shard key: letters, digits, '-' and '_' only (it becomes part of a collection name)"""
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "-", value).strip("-_")
+    return slug or "default"
+
+
+def default_region_of(metadata: Dict[str, Any]) -> str:
+    """Region of a chunk: its ``region`` metadata, else the name of the folder holding the PDF"""
+    if metadata.get("region"):
+        return str(metadata["region"])
+    source = metadata.get("source")
+    return Path(source).parent.name if source else "default"
+
+
+class ShardedVectorStore:
+    """
+    A corpus split across several VectorStores ("shards")
+
+    Chunks are routed to a shard by source PDF, by region or by a hash of the
+    source, so all chunks of one PDF stay together. Each shard is a separate
+    collection in its own persist directory, with its own BM25 index, listed in
+    ``<persist_directory>/<collection_name>.shards.json``.
+
+    Shards are loaded on first use and can be unloaded. Queries fan out over
+    the loaded shards (or an explicit subset) on a thread pool, and the sorted
+    per-shard hits are merged with a heap, so memory and query latency follow
+    the active shards rather than the whole corpus.
+
+    Offers the same interface as VectorStore for RAGRetriever and ingestion.
+    """
+
+    def __init__(self, collection_name: str = DEFAULT_COLLECTION_NAME, persist_directory: str | None = None,
+                 strategy: str = "hash", num_shards: int = DEFAULT_HASH_SHARDS,
+                 shard_directories: Dict[str, str] | None = None,
+                 region_of: Callable[[Dict[str, Any]], str] = default_region_of,
+                 active_shards: Iterable[str] | None = None, max_workers: int | None = None,
+                 backend: str | None = None):
+        """
+        Open (or create) the sharded store
+
+        Args:
+            collection_name: Base collection name; shard collections are "<name>__<shard>"
+            persist_directory: Directory holding the shard registry (and, by default, the shards)
+            strategy: "source" (one shard per PDF), "region" (per ``region_of``) or "hash" (``num_shards`` buckets)
+            num_shards: Number of buckets for the "hash" strategy
+            shard_directories: Persist directory per shard name; others go to <persist_directory>/shards/<shard>
+            region_of: Maps chunk metadata to a region for the "region" strategy
+            active_shards: Shards queried by default (None: every known shard, each loaded on first use)
+            max_workers: Threads for fan-out queries (default DEFAULT_FAN_OUT_WORKERS; started as needed)
+            backend: VectorStore backend of every shard ("chroma" or "numpy")
+        """
+        if strategy not in SHARDING_STRATEGIES:
+            raise ValueError(f"Unknown sharding strategy '{strategy}'; expected one of {SHARDING_STRATEGIES}")
+        self.collection_name = collection_name
+        self.persist_directory = Path(persist_directory) if persist_directory else DEFAULT_PERSIST_DIRECTORY
+        self.strategy = strategy
+        self.num_shards = num_shards
+        self.region_of = region_of
+        self.backend = backend
+        self._directories = {name: str(path) for name, path in (shard_directories or {}).items()}
+        self._shards: Dict[str, VectorStore] = {}
+        self._lock = threading.RLock()
+        self._registry_path = self.persist_directory / f"{collection_name}.shards.json"
+        self._load_registry()
+        self.active_shards = set(active_shards) if active_shards is not None else None
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or DEFAULT_FAN_OUT_WORKERS,
+                                        thread_name_prefix="shard-search")
+        logger.info("Sharded vector store: %d shards (%s) under %s", len(self.shard_names), self.strategy,
+                    self.persist_directory)
+
+    # ------------------ SHARD REGISTRY ------------------
+    def _load_registry(self):
+        if not self._registry_path.exists():
+            return
+        with open(self._registry_path, "r", encoding="utf-8") as f:
+            registry = json.load(f)
+        if registry["strategy"] != self.strategy or (
+                self.strategy == "hash" and registry.get("num_shards") != self.num_shards):
+            raise ValueError(f"'{self.collection_name}' is sharded by {registry['strategy']} "
+                             f"({registry.get('num_shards')} buckets); re-ingest to change the sharding")
+        for name, directory in registry["shards"].items():
+            self._directories.setdefault(name, directory)
+
+    def _save_registry(self):
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
+        tmp = self._registry_path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"strategy": self.strategy, "num_shards": self.num_shards,
+                       "shards": dict(sorted(self._directories.items()))}, f, indent=2)
+        os.replace(tmp, self._registry_path)
+
+    @property
+    def shard_names(self) -> List[str]:
+        """Every shard known to the registry, loaded or not"""
+        return sorted(self._directories)
+
+    @property
+    def loaded_shards(self) -> List[str]:
+        return sorted(self._shards)
+
+    def shard_for(self, metadata: Dict[str, Any]) -> str:
+        """Name of the shard a chunk with this metadata belongs to"""
+        if self.strategy == "region":
+            return shard_slug(self.region_of(metadata))
+        source = str(metadata.get("source_file") or metadata.get("source") or "")
+        if self.strategy == "source":
+            return shard_slug(Path(source).stem) if source else "default"
+        bucket = int.from_bytes(hashlib.blake2b(source.encode("utf-8"), digest_size=4).digest(), "big")
+        return f"h{bucket % self.num_shards:02d}"
+
+    def load_shard(self, name: str) -> VectorStore:
+        """Open a shard (creating it if new) and keep it loaded"""
+        with self._lock:
+            store = self._shards.get(name)
+            if store is None:
+                if name not in self._directories:
+                    self._directories[name] = str(self.persist_directory / "shards" / name)
+                    self._save_registry()
+                store = VectorStore(collection_name=f"{self.collection_name}__{name}",
+                                    persist_directory=self._directories[name], backend=self.backend)
+                self._shards[name] = store
+            return store
+
+    def unload_shard(self, name: str):
+        """Release a loaded shard; it is reopened from disk when next needed"""
+        with self._lock:
+            store = self._shards.pop(name, None)
+        if store is not None:
+            store.save_sparse_index()
+
+    def _targets(self, shards: Iterable[str] | None, where: Dict[str, Any] | None = None) -> List[str]:
+        """Shards a read goes to: the requested ones, else the active ones, narrowed by a source filter"""
+        if shards is None:
+            shards = self.active_shards if self.active_shards is not None else self.shard_names
+        names = [name for name in shards if name in self._directories]
+        if self.strategy in ("source", "hash") and where and isinstance(where.get("source_file"), str):
+            wanted = self.shard_for({"source_file": where["source_file"]})
+            names = [name for name in names if name == wanted]
+        return names
+
+    def _fan_out(self, names: List[str], call: Callable[[VectorStore], Any]) -> List[Any]:
+        """``call`` on each shard, in parallel when there are several"""
+        stores = [self.load_shard(name) for name in names]
+        if len(stores) <= 1:
+            return [call(store) for store in stores]
+        return list(self._pool.map(call, stores))
+
+    # ------------------ WRITES ------------------
+    def add_documents(self, documents: List[Any], embeddings: np.ndarray, ids: List[str] | None = None,
+                      batch_size: int | None = None) -> WriteStats:
+        """Route documents to their shards and add them there (see VectorStore.add_documents)"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        groups: Dict[str, List[int]] = {}
+        for i, doc in enumerate(documents):
+            groups.setdefault(self.shard_for(doc.metadata), []).append(i)
+
+        total = WriteStats()
+        for name, rows in groups.items():
+            stats = self.load_shard(name).add_documents(
+                [documents[i] for i in rows], embeddings[rows],
+                ids=[ids[i] for i in rows] if ids is not None else None, batch_size=batch_size,
+            )
+            total.rows += stats.rows
+            total.batches += stats.batches
+            total.seconds += stats.seconds
+        return total
+
+    def delete_documents(self, ids: List[str], batch_size: int = 5000):
+        """Delete documents by id from every shard (ids do not say which shard holds them)"""
+        if ids:
+            for name in self.shard_names:
+                store = self.load_shard(name)
+                present = list(store.get_documents(ids))
+                if present:
+                    store.delete_documents(present, batch_size=batch_size)
+
+    def save_sparse_index(self):
+        for store in list(self._shards.values()):
+            store.save_sparse_index()
+
+    def reset(self):
+        """Drop every document in every shard"""
+        for name in self.shard_names:
+            self.load_shard(name).reset()
+
+    # ------------------ READS ------------------
+    @property
+    def space(self) -> str:
+        """Merged results carry cosine distances whatever the shards' spaces"""
+        return "cosine"
+
+    def count(self, shards: Iterable[str] | None = None) -> int:
+        return sum(self._fan_out(self._targets(shards), lambda store: store.count()))
+
+    def query(self, query_embeddings: np.ndarray, n_results: int = 5, where: Dict[str, Any] | None = None,
+              where_document: Dict[str, Any] | None = None, shards: Iterable[str] | None = None) -> Dict[str, Any]:
+        """
+        Top-k search on every target shard in parallel, merged into one Chroma-shaped result
+
+        Args:
+            query_embeddings: Array of shape (n_queries, embedding_dim)
+            n_results: Number of neighbours per query
+            where: Metadata filter (a source_file equality also skips the shards that cannot match)
+            where_document: Document filter
+            shards: Shards to search (default: the active shards)
+        """
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        names = self._targets(shards, where)
+        # Shards return ids and distances only; texts are fetched for the merged top-k alone
+        results = self._fan_out(names, lambda store: (store.space, store.query(
+            query_embeddings, n_results=n_results, where=where, where_document=where_document,
+            include=["distances"])))
+
+        ranked_per_query = []
+        for q in range(len(query_embeddings)):
+            # Each shard's hits are already best-first: merge the sorted lists and stop at n_results
+            ranked = [[(1.0 - distance_to_similarity(distance, space), doc_id, shard)
+                       for doc_id, distance in zip(result["ids"][q], result["distances"][q])]
+                      if result["ids"] and result["ids"][q] else []
+                      for shard, (space, result) in enumerate(results)]
+            ranked_per_query.append(list(itertools.islice(heapq.merge(*ranked, key=lambda hit: hit[0]), n_results)))
+
+        wanted: Dict[int, set] = {}
+        for best in ranked_per_query:
+            for _, doc_id, shard in best:
+                wanted.setdefault(shard, set()).add(doc_id)
+        stored: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        for part in self._fan_out_stores([(self.load_shard(names[shard]), list(ids)) for shard, ids in wanted.items()]):
+            stored.update(part)
+
+        return {
+            "ids": [[doc_id for _, doc_id, _ in best] for best in ranked_per_query],
+            "documents": [[stored.get(doc_id, (None, None))[0] for _, doc_id, _ in best] for best in ranked_per_query],
+            "metadatas": [[stored.get(doc_id, (None, None))[1] for _, doc_id, _ in best] for best in ranked_per_query],
+            "distances": [[distance for distance, _, _ in best] for best in ranked_per_query],
+        }
+
+    def _fan_out_stores(self, calls: List[Tuple[VectorStore, List[str]]]) -> List[Dict[str, Tuple[str, Dict[str, Any]]]]:
+        """``get_documents`` on several loaded shards, in parallel when there are several"""
+        if len(calls) <= 1:
+            return [store.get_documents(ids) for store, ids in calls]
+        return list(self._pool.map(lambda call: call[0].get_documents(call[1]), calls))
+
+    def sparse_query(self, query_texts: List[str], n_results: int = 5, where: Dict[str, Any] | None = None,
+                     where_document: Dict[str, Any] | None = None,
+                     shards: Iterable[str] | None = None) -> List[List[Tuple[str, float]]]:
+        """
+        BM25 search on every target shard, merged by score
+
+        Each shard scores with its own document frequencies, so scores are
+        comparable across shards only approximately.
+        """
+        results = self._fan_out(self._targets(shards, where), lambda store: store.sparse_query(
+            query_texts, n_results=n_results, where=where, where_document=where_document))
+        return [heapq.nlargest(n_results, (hit for shard in results for hit in shard[q]), key=lambda hit: hit[1])
+                for q in range(len(query_texts))]
+
+    def get_documents(self, ids: List[str]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """Fetch stored text and metadata by id from the loaded shards"""
+        found: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        if ids:
+            for part in self._fan_out(self._targets(None), lambda store: store.get_documents(ids)):
+                found.update(part)
+        return found
+
+    def matching_ids(self, where: Dict[str, Any] | None = None,
+                     where_document: Dict[str, Any] | None = None) -> List[str]:
+        return [doc_id for part in self._fan_out(self._targets(None, where),
+                                                 lambda store: store.matching_ids(where, where_document))
+                for doc_id in part]
+
+    def close(self):
+        """Persist pending BM25 changes and stop the fan-out threads"""
+        self.save_sparse_index()
+        self._pool.shutdown(wait=True)
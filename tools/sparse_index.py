@@ -0,0 +1,235 @@
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# Keep tokens such as "e.coli", "mg/l", "o.reg.169/03" and "pm2.5" whole;
+# punctuation inside a token is only kept between alphanumerics.
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[./\-][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens; compound tokens are also indexed by their parts."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in re.split(r"[./\-]", token) if part)
+    return tokens
+
+
+class SparseIndex:
+    """
+    BM25 inverted index with array-backed postings
+
+    Postings are stored in CSR form: ``term_offsets[t]:term_offsets[t + 1]``
+    slices ``posting_docs`` / ``posting_tfs`` for term ``t``. Per-posting BM25
+    weights are precomputed, so a query is one slice per query term plus a
+    ``bincount`` over the matching documents.
+
+    Additions and deletions are buffered and folded into the arrays on the
+    next query or save.
+    """
+
+    def __init__(self, path=None, k1: float = 1.2, b: float = 0.75):
+        """
+        Initialize the index
+
+        Args:
+            path: .npz file the index is persisted to (None keeps it in memory)
+            k1: BM25 term-frequency saturation
+            b: BM25 length normalization
+        """
+        self.path = Path(path) if path else None
+        self.k1 = k1
+        self.b = b
+
+        self.vocab: Dict[str, int] = {}
+        self.doc_ids: List[str] = []
+        self.doc_lens = np.zeros(0, dtype=np.int32)
+        self.term_offsets = np.zeros(1, dtype=np.int64)
+        self.posting_docs = np.zeros(0, dtype=np.int32)
+        self.posting_tfs = np.zeros(0, dtype=np.uint16)
+
+        self._doc_index: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._pending: List[Tuple[str, Counter]] = []
+        self._weights = np.zeros(0, dtype=np.float32)
+        self._idf = np.zeros(0, dtype=np.float32)
+        self._allowed_source = None
+        self._allowed_docs = np.zeros(0, dtype=np.int64)
+        self.dirty = False
+
+        if self.path and self.path.exists():
+            self._load()
+
+    def __len__(self) -> int:
+        return int(self._alive.sum()) + len(self._pending)
+
+    # ------------------ UPDATES ------------------
+    def add(self, ids: List[str], texts: List[str]):
+        """Index documents; an id that is already indexed is replaced"""
+        self.delete(ids)
+        self._pending.extend((doc_id, Counter(tokenize(text))) for doc_id, text in zip(ids, texts))
+        self.dirty = True
+
+    def delete(self, ids: List[str]):
+        ids = set(ids)
+        if self._pending and any(doc_id in ids for doc_id, _ in self._pending):
+            self._pending = [(doc_id, counts) for doc_id, counts in self._pending if doc_id not in ids]
+            self.dirty = True
+        for doc_id in ids:
+            index = self._doc_index.pop(doc_id, None)
+            if index is not None:
+                self._alive[index] = False
+                self.dirty = True
+
+    def clear(self):
+        self.vocab = {}
+        self.doc_ids = []
+        self.doc_lens = np.zeros(0, dtype=np.int32)
+        self.term_offsets = np.zeros(1, dtype=np.int64)
+        self.posting_docs = np.zeros(0, dtype=np.int32)
+        self.posting_tfs = np.zeros(0, dtype=np.uint16)
+        self._pending = []
+        self._finish_load()
+        self.dirty = True
+
+    def _compact(self):
+        """Fold pending additions into the CSR arrays and drop deleted documents."""
+        if not self._pending and self._alive.all():
+            return
+
+        # Existing postings as (term, doc, tf) triples
+        terms = np.repeat(np.arange(len(self.term_offsets) - 1, dtype=np.int64), np.diff(self.term_offsets))
+        docs = self.posting_docs.astype(np.int64)
+        tfs = self.posting_tfs
+
+        keep = self._alive[docs] if len(docs) else np.zeros(0, dtype=bool)
+        terms, docs, tfs = terms[keep], docs[keep], tfs[keep]
+        remap = np.cumsum(self._alive) - 1
+        docs = remap[docs] if len(docs) else docs
+        doc_ids = [doc_id for doc_id, alive in zip(self.doc_ids, self._alive) if alive]
+        doc_lens = [self.doc_lens[self._alive]]
+
+        # New documents
+        new_terms, new_docs, new_tfs, new_lens = [], [], [], []
+        base = len(doc_ids)
+        for offset, (doc_id, counts) in enumerate(self._pending):
+            doc_ids.append(doc_id)
+            new_lens.append(sum(counts.values()))
+            for token, tf in counts.items():
+                term = self.vocab.setdefault(token, len(self.vocab))
+                new_terms.append(term)
+                new_docs.append(base + offset)
+                new_tfs.append(min(tf, np.iinfo(np.uint16).max))
+
+        terms = np.concatenate([terms, np.asarray(new_terms, dtype=np.int64)])
+        docs = np.concatenate([docs, np.asarray(new_docs, dtype=np.int64)])
+        tfs = np.concatenate([tfs, np.asarray(new_tfs, dtype=np.uint16)])
+        doc_lens.append(np.asarray(new_lens, dtype=np.int32))
+
+        order = np.lexsort((docs, terms))
+        self.posting_docs = docs[order].astype(np.int32)
+        self.posting_tfs = tfs[order]
+        self.term_offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(self.vocab)), out=self.term_offsets[1:])
+        self.doc_ids = doc_ids
+        self.doc_lens = np.concatenate(doc_lens).astype(np.int32)
+        self._pending = []
+        self._finish_load()
+
+    def _finish_load(self):
+        """Rebuild the derived state (id lookup, idf, per-posting weights) from the arrays."""
+        self._doc_index = {doc_id: i for i, doc_id in enumerate(self.doc_ids)}
+        self._allowed_source = None
+        self._alive = np.ones(len(self.doc_ids), dtype=bool)
+
+        n_docs = len(self.doc_ids)
+        df = np.diff(self.term_offsets).astype(np.float32)
+        self._idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        avg_len = float(self.doc_lens.mean()) if n_docs else 0.0
+        tf = self.posting_tfs.astype(np.float32)
+        lens = self.doc_lens[self.posting_docs].astype(np.float32) if len(tf) else tf
+        norm = self.k1 * (1.0 - self.b + self.b * lens / max(avg_len, 1e-9))
+        self._weights = (tf * (self.k1 + 1.0) / (tf + norm)).astype(np.float32)
+
+    # ------------------ PERSISTENCE ------------------
+    def save(self):
+        """Compact and write the index atomically"""
+        self._compact()
+        if self.path is None:
+            self.dirty = False
+            return
+        vocab = np.empty(len(self.vocab), dtype=object)
+        for token, term in self.vocab.items():
+            vocab[term] = token
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp.npz")
+        np.savez(
+            tmp_path,
+            vocab=vocab.astype(str) if len(vocab) else np.zeros(0, dtype="<U1"),
+            doc_ids=np.asarray(self.doc_ids, dtype=str) if self.doc_ids else np.zeros(0, dtype="<U1"),
+            doc_lens=self.doc_lens,
+            term_offsets=self.term_offsets,
+            posting_docs=self.posting_docs,
+            posting_tfs=self.posting_tfs,
+        )
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def _load(self):
+        with np.load(self.path, allow_pickle=False) as data:
+            self.vocab = {str(token): term for term, token in enumerate(data["vocab"])}
+            self.doc_ids = [str(doc_id) for doc_id in data["doc_ids"]]
+            self.doc_lens = data["doc_lens"]
+            self.term_offsets = data["term_offsets"]
+            self.posting_docs = data["posting_docs"]
+            self.posting_tfs = data["posting_tfs"]
+        self._finish_load()
+
+    # ------------------ SEARCH ------------------
+    def search(self, query: str, top_k: int = 10, allowed: Iterable[str] | None = None) -> List[Tuple[str, float]]:
+        """
+        Best BM25 matches for ``query``
+
+        Args:
+            query: Query text
+            top_k: Number of matches to return
+            allowed: If given, only these document ids can match (e.g. the ids passing a metadata filter)
+
+        Returns:
+            Up to ``top_k`` (doc id, score) pairs, best first; documents that
+            share no term with the query are never returned
+        """
+        self._compact()
+        terms = [self.vocab[token] for token in set(tokenize(query)) if token in self.vocab]
+        if not terms or not self.doc_ids:
+            return []
+
+        docs = np.concatenate([self.posting_docs[self.term_offsets[t]:self.term_offsets[t + 1]] for t in terms])
+        weights = np.concatenate([
+            self._weights[self.term_offsets[t]:self.term_offsets[t + 1]] * self._idf[t] for t in terms
+        ])
+        scores = np.bincount(docs, weights=weights, minlength=len(self.doc_ids))
+        if allowed is not None:
+            # The same id list (a cached filter) is usually passed again; translate it once
+            if self._allowed_source is not allowed:
+                self._allowed_source = allowed
+                self._allowed_docs = np.fromiter(
+                    (self._doc_index[doc_id] for doc_id in allowed if doc_id in self._doc_index), dtype=np.int64
+                )
+            keep = self._allowed_docs
+            restricted = np.zeros_like(scores)
+            restricted[keep] = scores[keep]
+            scores = restricted
+
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        matched = matched[np.argsort(-scores[matched])]
+        return [(self.doc_ids[i], float(scores[i])) for i in matched]
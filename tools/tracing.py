@@ -0,0 +1,377 @@
+"""
+Per-stage tracing spans and the logging setup.
+
+Code wraps a stage in ``with span("vector.query", backend="chroma") as s:``
+and adds what it learns with ``s.set(results=5)``. Finished spans carry their
+duration, parent and attributes (token counts, cache hits, result sizes) and
+go to every configured exporter:
+  - InMemoryExporter: keeps the latest spans; ``summary()`` totals them per stage
+  - JsonlExporter: appends one JSON object per span to a file
+  - PrometheusExporter: duration histograms and attribute totals per stage in
+    the Prometheus text format, optionally served over HTTP
+
+AQUAINFO_TRACING lists the exporters to start with ("memory", "jsonl",
+"prometheus"); AQUAINFO_TRACE_FILE is the JSONL path and
+AQUAINFO_PROMETHEUS_PORT serves ``/metrics``. With no exporter configured
+``span`` returns a shared no-op, so tracing costs one function call.
+
+Parent spans follow contextvars, so they carry across ``await`` and into
+``agents.executor.run_blocking`` threads.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+TRACING_EXPORTERS = ("memory", "jsonl", "prometheus")
+DEFAULT_TRACE_PATH = Path(__file__).resolve().parent.parent / "data" / "traces.jsonl"
+DEFAULT_MAX_SPANS = 10000
+# Upper bounds (seconds) of the Prometheus duration histogram; LLM calls take seconds, cache lookups microseconds
+DEFAULT_DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+def configure_logging(level: Optional[str] = None):
+    """
+    Send the package's log records to stderr (for entry points, not library code)
+
+    Args:
+        level: Level name; defaults to AQUAINFO_LOG_LEVEL, then INFO
+    """
+    level = (level or os.getenv("AQUAINFO_LOG_LEVEL", "INFO")).upper()
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+
+
+@dataclass
+class Span:
+    """One timed stage"""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start_time: float = 0.0
+    duration_s: float = 0.0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_ms": self.duration_s * 1000,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Stand-in returned while tracing is disabled"""
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("aquainfo_span", default=None)
+
+
+class _ActiveSpan:
+    """Context manager that times a Span, makes it the current parent and exports it on exit"""
+    __slots__ = ("tracer", "span", "_t0", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        parent = _current_span.get()
+        self.tracer = tracer
+        self.span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent is not None else uuid.uuid4().hex,
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent is not None else None,
+            attributes=attributes,
+        )
+
+    def __enter__(self) -> Span:
+        self.span.start_time = time.time()
+        self._token = _current_span.set(self.span)
+        self._t0 = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.duration_s = time.perf_counter() - self._t0
+        if exc_type is not None:
+            self.span.error = f"{exc_type.__name__}: {exc}"
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # A span held open across generator yields may end in another context
+            pass
+        self.tracer.export(self.span)
+        return False
+
+
+class Tracer:
+    """Hands out spans and sends finished ones to its exporters"""
+
+    def __init__(self, exporters: Sequence[Any] = ()):
+        """
+        Args:
+            exporters: Objects with ``export(span)``; tracing is disabled while there are none
+        """
+        self.exporters: List[Any] = list(exporters)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters)
+
+    def span(self, name: str, **attributes):
+        """Context manager timing the stage ``name``; yields the Span (or a no-op when disabled)"""
+        if not self.exporters:
+            return NOOP_SPAN
+        return _ActiveSpan(self, name, attributes)
+
+    def export(self, span: Span):
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                logger.warning("Span exporter %s failed: %s", type(exporter).__name__, e)
+
+    def add_exporter(self, exporter):
+        self.exporters = [*self.exporters, exporter]
+
+    def remove_exporter(self, exporter):
+        self.exporters = [e for e in self.exporters if e is not exporter]
+
+    def find(self, exporter_type):
+        """The first exporter of ``exporter_type``, or None"""
+        return next((e for e in self.exporters if isinstance(e, exporter_type)), None)
+
+
+# ------------------ EXPORTERS ------------------
+class InMemoryExporter:
+    """Keeps the latest ``max_spans`` spans"""
+
+    def __init__(self, max_spans: int = DEFAULT_MAX_SPANS):
+        self._spans: Deque[Span] = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self, name: Optional[str] = None, trace_id: Optional[str] = None) -> List[Span]:
+        with self._lock:
+            return [s for s in self._spans
+                    if (name is None or s.name == name) and (trace_id is None or s.trace_id == trace_id)]
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per stage: count, total and mean / p95 / max milliseconds, slowest total first"""
+        durations: Dict[str, List[float]] = {}
+        for span in self.spans():
+            durations.setdefault(span.name, []).append(span.duration_s * 1000)
+        rows = {}
+        for name, values in durations.items():
+            values.sort()
+            rows[name] = {
+                "count": len(values),
+                "total_ms": sum(values),
+                "mean_ms": sum(values) / len(values),
+                "p95_ms": values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))],
+                "max_ms": values[-1],
+            }
+        return dict(sorted(rows.items(), key=lambda item: -item[1]["total_ms"]))
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+
+class JsonlExporter:
+    """Appends every span to a JSON Lines file"""
+
+    def __init__(self, path=DEFAULT_TRACE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class PrometheusExporter:
+    """
+    Aggregates spans into Prometheus metrics
+
+    Per stage: a duration histogram, an error counter and the running total of
+    every numeric attribute (tokens, cache hits, results). ``render()`` returns
+    the text exposition format and ``serve(port)`` answers scrapes of /metrics.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_DURATION_BUCKETS, prefix: str = "aquainfo"):
+        self.buckets = tuple(sorted(buckets))
+        self.prefix = prefix
+        self._counts: Dict[str, List[int]] = {}
+        self._sums: Dict[str, float] = {}
+        self._errors: Dict[str, int] = {}
+        self._attributes: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def export(self, span: Span):
+        with self._lock:
+            counts = self._counts.setdefault(span.name, [0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if span.duration_s <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            self._sums[span.name] = self._sums.get(span.name, 0.0) + span.duration_s
+            if span.error:
+                self._errors[span.name] = self._errors.get(span.name, 0) + 1
+            for key, value in span.attributes.items():
+                if isinstance(value, (int, float)):
+                    metric = (span.name, key)
+                    self._attributes[metric] = self._attributes.get(metric, 0.0) + float(value)
+
+    @staticmethod
+    def _label(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    def render(self) -> str:
+        duration = f"{self.prefix}_span_duration_seconds"
+        errors = f"{self.prefix}_span_errors_total"
+        attributes = f"{self.prefix}_span_attribute_total"
+        lines = [f"# HELP {duration} Duration of traced stages", f"# TYPE {duration} histogram"]
+        with self._lock:
+            for name, counts in sorted(self._counts.items()):
+                label = f'span="{self._label(name)}"'
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f'{duration}_bucket{{{label},le="{bound}"}} {count}')
+                lines.append(f'{duration}_bucket{{{label},le="+Inf"}} {counts[-1]}')
+                lines.append(f"{duration}_sum{{{label}}} {self._sums[name]}")
+                lines.append(f"{duration}_count{{{label}}} {counts[-1]}")
+            lines += [f"# HELP {errors} Traced stages that raised", f"# TYPE {errors} counter"]
+            for name, count in sorted(self._errors.items()):
+                lines.append(f'{errors}{{span="{self._label(name)}"}} {count}')
+            lines += [f"# HELP {attributes} Sum of numeric span attributes (tokens, cache hits, results)",
+                      f"# TYPE {attributes} counter"]
+            for (name, key), total in sorted(self._attributes.items()):
+                lines.append(f'{attributes}{{span="{self._label(name)}",attribute="{self._label(key)}"}} {total}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "0.0.0.0"):
+        """Answer Prometheus scrapes on http://host:port/metrics from a daemon thread"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("metrics scrape: " + format, *args)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="aquainfo-metrics", daemon=True).start()
+        logger.info("Serving Prometheus metrics on http://%s:%d/metrics", host, port)
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+
+# ------------------ REGISTRY ------------------
+def make_exporter(kind: str):
+    """Build an exporter by name ("memory", "jsonl" or "prometheus") from the AQUAINFO_* settings"""
+    if kind == "memory":
+        return InMemoryExporter()
+    if kind == "jsonl":
+        return JsonlExporter(os.getenv("AQUAINFO_TRACE_FILE") or DEFAULT_TRACE_PATH)
+    if kind == "prometheus":
+        exporter = PrometheusExporter()
+        port = os.getenv("AQUAINFO_PROMETHEUS_PORT")
+        if port:
+            exporter.serve(int(port))
+        return exporter
+    raise ValueError(f"Unknown tracing exporter '{kind}'; expected one of {TRACING_EXPORTERS}")
+
+
+def _exporters_from_env() -> List[Any]:
+    kinds = [kind.strip().lower() for kind in os.getenv("AQUAINFO_TRACING", "").split(",") if kind.strip()]
+    return [make_exporter(kind) for kind in kinds if kind not in ("0", "off", "none")]
+
+
+_tracer = Tracer(_exporters_from_env())
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer (exporters from AQUAINFO_TRACING)."""
+    return _tracer
+
+
+def configure_tracing(exporters: Sequence[Any]) -> Tracer:
+    """Replace the process-wide tracer's exporters; an empty sequence disables tracing."""
+    _tracer.exporters = list(exporters)
+    return _tracer
+
+
+def span(name: str, **attributes):
+    """``get_tracer().span(name, **attributes)``"""
+    return _tracer.span(name, **attributes)
+
+
+def current_span() -> Optional[Span]:
+    """The innermost open span in this context, or None"""
+    return _current_span.get()
+
+
+def llm_usage(response: Any) -> Dict[str, int]:
+    """Prompt / completion token counts of an LLM response (langchain message or Mistral SDK), when reported"""
+    usage = getattr(response, "usage_metadata", None)
+    if isinstance(usage, dict):
+        return {"prompt_tokens": usage.get("input_tokens", 0), "completion_tokens": usage.get("output_tokens", 0)}
+    usage = getattr(response, "usage", None)
+    if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+        return {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens or 0}
+    return {}
@@ -0,0 +1,155 @@
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from tools.tracing import span
+
+DEFAULT_WEB_CACHE_PATH = Path(__file__).resolve().parent.parent / "data" / "web_search_cache.sqlite3"
+DEFAULT_WEB_CACHE_TTL_SECONDS = 15 * 60
+
+
+def search_cache_key(params: Dict[str, Any]) -> str:
+    """
+    Cache key for a search request: the normalized (q, num, hl, gl) parameters
+
+    The query is lower-cased and whitespace-collapsed, so trivially different
+    spellings of the same question share an entry. The API key is never part
+    of the key.
+    """
+    normalized = {
+        "q": " ".join(str(params.get("q", "")).lower().split()),
+        "num": int(params.get("num", 10)),
+        "hl": str(params.get("hl", "")).lower(),
+        "gl": str(params.get("gl", "")).lower(),
+    }
+    return json.dumps(normalized, sort_keys=True)
+
+
+class WebSearchCache:
+    """
+    Disk-backed TTL cache for search responses with in-flight request coalescing
+
+    Responses are stored as JSON in SQLite so they survive restarts and are
+    shared by every session in the process. When several threads ask for the
+    same key at once, only the first one calls upstream; the others wait for
+    its result.
+    """
+
+    def __init__(self, path=DEFAULT_WEB_CACHE_PATH, ttl_seconds: float = DEFAULT_WEB_CACHE_TTL_SECONDS):
+        """
+        Initialize the cache
+
+        Args:
+            path: SQLite file (None keeps entries in memory only)
+            ttl_seconds: Entries older than this are fetched again
+        """
+        self.path = Path(path) if path else None
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path) if self.path else ":memory:", check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS search_responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Fresh cached response for ``key``, or None. Caller holds the lock."""
+        with span("db.web_cache.get"):
+            row = self._conn.execute(
+                "SELECT response, created FROM search_responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl_seconds:
+            return None
+        return json.loads(row[0])
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Fresh cached response for ``key``, or None"""
+        with self._lock:
+            return self._get(key)
+
+    def put(self, key: str, response: Dict[str, Any]):
+        with self._lock, span("db.web_cache.put"):
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_responses (key, response, created) VALUES (?, ?, ?)",
+                (key, json.dumps(response), time.time()),
+            )
+            self._conn.commit()
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Dict[str, Any]],
+                     cacheable: Callable[[Dict[str, Any]], bool] = lambda response: True) -> Dict[str, Any]:
+        """
+        Return the cached response for ``key``, fetching it at most once across concurrent callers
+
+        Args:
+            key: Cache key (see ``search_cache_key``)
+            fetch: Performs the upstream request
+            cacheable: Decides whether a response may be stored (errors should not be)
+
+        Returns:
+            The response; exceptions raised by ``fetch`` propagate to every waiting caller
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                # Checked under the lock: a leader stores its response before leaving _in_flight
+                response = self._get(key)
+                if response is not None:
+                    self.hits += 1
+                    return response
+                future = Future()
+                self._in_flight[key] = future
+                self.misses += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            return future.result()
+
+        try:
+            response = fetch()
+            if cacheable(response):
+                self.put(key, response)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM search_responses")
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """Delete expired rows; returns how many were removed"""
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM search_responses WHERE created < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._conn.commit()
+            return cur.rowcount
@@ -1,16 +1,26 @@
-
 """
 REAL Web Search Tool using SerpAPI (Google Search API).
 
 This tool performs real Google web searches using SERPAPI_API_KEY
 from the .env file. It returns live results (title, snippet, url).
-No fake database, no fallback, no example.com.
+
+Responses are cached on disk with a TTL and concurrent identical requests
+share one upstream call. For offline development and tests set
+AQUAINFO_WEB_BACKEND=fixture to answer from a JSON fixture file instead.
 """
 
-from typing import List, Dict
+from typing import Any, List, Dict
+import json
+import logging
 import os
+import threading
+import time
+from pathlib import Path
 from dotenv import load_dotenv
 
+from tools.tracing import span
+from tools.web_cache import DEFAULT_WEB_CACHE_TTL_SECONDS, WebSearchCache, search_cache_key
+
 try:
     from serpapi import GoogleSearch
 except ImportError as exc:  # pragma: no cover - dependency hint
@@ -18,49 +28,145 @@ except ImportError as exc:  # pragma: no cover - dependency hint
     _serpapi_import_error = exc
 
 
-class WebSearchTool:
-    def __init__(self) -> None:
-        load_dotenv()
-        api_key = os.getenv("SERPAPI_API_KEY")
+DEFAULT_FIXTURE_PATH = Path(__file__).resolve().parent.parent / "data" / "fixtures" / "web_search.json"
 
-        if not api_key:
-            raise ValueError("ERROR: SERPAPI_API_KEY not found in .env file")
+logger = logging.getLogger(__name__)
 
+
+class SerpApiBackend:
+    """Live Google results through SerpAPI"""
+
+    def __init__(self, api_key: str) -> None:
         if GoogleSearch is None:
             raise ImportError(
                 "serpapi package is required. Install with `pip install serpapi`. "
                 f"Original error: {_serpapi_import_error}"
             )
-
         self.api_key = api_key
 
+    def fetch(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        logger.debug("Using SerpAPI for a live web search")
+        return GoogleSearch({**params, "api_key": self.api_key}).get_dict()
+
+
+class FixtureBackend:
+    """
+    Offline stand-in for SerpAPI that answers from a JSON file
+
+    The file maps lower-cased queries to SerpAPI-shaped responses; a
+    "default" entry answers everything else. ``latency_s`` simulates the
+    network round trip and ``calls`` counts upstream requests, so caching and
+    coalescing can be observed without network access.
+    """
+
+    def __init__(self, path=DEFAULT_FIXTURE_PATH, latency_s: float = 0.0) -> None:
+        with open(path, "r", encoding="utf-8") as f:
+            self.fixtures: Dict[str, Dict[str, Any]] = {
+                " ".join(key.lower().split()): value for key, value in json.load(f).items()
+            }
+        self.latency_s = latency_s
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        query = " ".join(str(params.get("q", "")).lower().split())
+        return self.fixtures.get(query) or self.fixtures.get("default", {"organic_results": []})
+
+
+_cache_lock = threading.Lock()
+_shared_cache: WebSearchCache | None = None
+
+
+def get_web_search_cache() -> WebSearchCache:
+    """Return the process-wide search cache (data/web_search_cache.sqlite3), so sessions coalesce."""
+    global _shared_cache
+    with _cache_lock:
+        if _shared_cache is None:
+            ttl = float(os.getenv("AQUAINFO_WEB_CACHE_TTL", DEFAULT_WEB_CACHE_TTL_SECONDS))
+            _shared_cache = WebSearchCache(ttl_seconds=ttl)
+        return _shared_cache
+
+
+class WebSearchTool:
+    def __init__(self, backend=None, cache: WebSearchCache | None = None, use_cache: bool = True) -> None:
+        """
+        Args:
+            backend: Object with ``fetch(params) -> dict``; defaults to SerpAPI,
+                or FixtureBackend when AQUAINFO_WEB_BACKEND=fixture
+            cache: Search cache; defaults to the shared on-disk cache
+            use_cache: Set False to always call the backend
+        """
+        load_dotenv()
+
+        if backend is None:
+            if os.getenv("AQUAINFO_WEB_BACKEND", "serpapi").lower() == "fixture":
+                backend = FixtureBackend(os.getenv("AQUAINFO_WEB_FIXTURES") or DEFAULT_FIXTURE_PATH)
+            else:
+                api_key = os.getenv("SERPAPI_API_KEY")
+
+                if not api_key:
+                    raise ValueError("ERROR: SERPAPI_API_KEY not found in .env file")
+
+                backend = SerpApiBackend(api_key)
+
+        self.backend = backend
+        self.cache = (cache or get_web_search_cache()) if use_cache else None
+
+    def _fetch(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        with span("web.fetch", backend=type(self.backend).__name__) as fetch_span:
+            response = self.backend.fetch(params)
+            fetch_span.set(error="error" in response)
+        if "error" in response:
+            return response
+        # Only the organic results are used; keep cache rows small
+        return {"organic_results": response.get("organic_results", [])}
+
+    @staticmethod
+    def _cacheable(response: Dict[str, Any]) -> bool:
+        # SerpAPI reports quota and upstream failures in an "error" field; never cache those
+        return "error" not in response
+
     def search(self, query: str, max_results: int = 3) -> List[Dict[str, str]]:
         """
-        Perform a real Google search using SerpAPI.
+        Perform a Google search, served from the cache when a fresh response exists.
         Returns list of results with title, snippet, url.
         """
-        print("DEBUG: Using SerpAPI for REAL web search")
-
         params = {
             "engine": "google",
             "q": query,
-            "api_key": self.api_key,
             "num": max_results,
             "hl": "en",
             "gl": "ca"
         }
 
-        search = GoogleSearch(params)
-        response = search.get_dict()
-        organic = response.get("organic_results", [])
+        with span("web.search", max_results=max_results) as search_span:
+            if self.cache is None:
+                response = self._fetch(params)
+                search_span.set(cache_hit=False)
+            else:
+                fetched = []
+
+                def fetch():
+                    fetched.append(True)
+                    return self._fetch(params)
+
+                response = self.cache.get_or_fetch(search_cache_key(params), fetch, cacheable=self._cacheable)
+                # Coalesced callers waited on another caller's fetch; only the fetching one counts as a miss
+                search_span.set(cache_hit=not fetched)
+            organic = response.get("organic_results", [])
 
-        results: List[Dict[str, str]] = []
+            results: List[Dict[str, str]] = []
 
-        for item in organic[:max_results]:
-            results.append({
-                "title": item.get("title", "No title"),
-                "snippet": item.get("snippet", "") or "",
-                "url": item.get("link", "") or "",
-            })
+            for item in organic[:max_results]:
+                results.append({
+                    "title": item.get("title", "No title"),
+                    "snippet": item.get("snippet", "") or "",
+                    "url": item.get("link", "") or "",
+                })
 
-        return results
+            search_span.set(results=len(results))
+            return results